@@ -6,12 +6,17 @@ representation that can be fed to LLM prompts or stored in step history.  The
 implementation mirrors the heuristics used inside the upstream project to
 identify interactive elements while keeping the output intentionally compact so
 that it fits within model context limits.
+
+:class:`ElementCatalogCache` carries entries over between steps: a node whose
+fingerprint (backend node id, XPath, text and key attributes) is unchanged
+reuses its entry and rendered line, so building a catalog costs little more
+than fingerprinting the selector map.
 """
 
 from __future__ import annotations
 
 from collections import Counter
-from dataclasses import dataclass
+from dataclasses import dataclass, field, replace
 from typing import Iterable
 
 from browser_use.dom.views import EnhancedDOMTreeNode
@@ -29,6 +34,7 @@ KEY_ATTRIBUTES: tuple[str, ...] = (
     "placeholder",
     "value",
 )
+_KEY_ATTRIBUTE_SET = frozenset(KEY_ATTRIBUTES)
 
 
 def _trim(value: str, *, limit: int = 80) -> str:
@@ -42,7 +48,11 @@ def _trim(value: str, *, limit: int = 80) -> str:
 
 @dataclass(slots=True)
 class ElementCatalogEntry:
-    """Human readable representation of an interactive DOM node."""
+    """Human readable representation of an interactive DOM node.
+
+    Entries are treated as immutable once rendered: :meth:`to_text` memoises
+    everything after the index.
+    """
 
     index: int
     tag: str
@@ -51,6 +61,7 @@ class ElementCatalogEntry:
     frame_id: str | None
     xpath: str
     is_visible: bool | None
+    _tail: str | None = field(default=None, repr=False, compare=False)
 
     @classmethod
     def from_node(cls, index: int, node: EnhancedDOMTreeNode) -> "ElementCatalogEntry":
@@ -76,7 +87,12 @@ class ElementCatalogEntry:
         )
 
     def to_text(self) -> str:
-        bits: list[str] = [f"[{self.index:02d}] <{self.tag}>"]
+        if self._tail is None:
+            self._tail = self._render_tail()
+        return f"[{self.index:02d}] <{self.tag}>{self._tail}"
+
+    def _render_tail(self) -> str:
+        bits: list[str] = [""]
         if self.frame_id:
             bits.append(f"frame={self.frame_id[-4:]}")
         if self.is_visible is False:
@@ -96,36 +112,117 @@ class ElementCatalogEntry:
 
 @dataclass(slots=True)
 class ElementCatalogSnapshot:
-    """Snapshot of the current catalog with metadata useful for debugging."""
+    """Snapshot of the current catalog with metadata useful for debugging.
+
+    ``text`` and ``metadata`` are computed on first access and memoised.
+    """
 
     entries: list[ElementCatalogEntry]
+    _text: str | None = field(default=None, repr=False, compare=False)
+    _metadata: dict[str, object] | None = field(default=None, repr=False, compare=False)
 
     @property
     def text(self) -> str:
-        if not self.entries:
-            return ""
-        return "\n".join(entry.to_text() for entry in self.entries)
+        if self._text is None:
+            self._text = "\n".join(entry.to_text() for entry in self.entries)
+        return self._text
 
     @property
     def metadata(self) -> dict[str, object]:
-        counter = Counter(entry.tag for entry in self.entries)
-        return {
-            "total": len(self.entries),
-            "tags": dict(counter),
-        }
+        if self._metadata is None:
+            counter = Counter(entry.tag for entry in self.entries)
+            self._metadata = {
+                "total": len(self.entries),
+                "tags": dict(counter),
+            }
+        return self._metadata
+
+
+def _fingerprint(node: EnhancedDOMTreeNode) -> tuple:
+    """Everything :meth:`ElementCatalogEntry.from_node` reads from *node*."""
+
+    ax_node = node.ax_node
+    return (
+        getattr(node, "backend_node_id", None),
+        node.frame_id,
+        node.xpath,
+        node.tag_name,
+        node.node_value,
+        getattr(ax_node, "name", None) if ax_node else None,
+        getattr(node, "is_visible", None),
+        tuple(
+            (key, value)
+            for key, value in (node.attributes or {}).items()
+            if key in _KEY_ATTRIBUTE_SET and value
+        ),
+    )
+
+
+class ElementCatalogCache:
+    """Catalog entries reused across steps, keyed by node fingerprint.
+
+    Only the entries of the latest :meth:`build` are kept, so the cache holds
+    one page's worth of entries.  ``hits`` and ``misses`` count reused and
+    rebuilt entries.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[tuple, ElementCatalogEntry] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def build(
+        self,
+        selector_map: dict[int, EnhancedDOMTreeNode] | None,
+    ) -> ElementCatalogSnapshot:
+        """Like :func:`build_element_catalog`, reusing unchanged entries."""
+
+        if not selector_map:
+            self._entries = {}
+            return ElementCatalogSnapshot(entries=[])
+
+        previous = self._entries
+        current: dict[tuple, ElementCatalogEntry] = {}
+        entries: list[ElementCatalogEntry] = []
+        for index in sorted(selector_map):
+            node = selector_map.get(index)
+            if node is None:
+                continue
+            try:
+                key = _fingerprint(node)
+                entry = current.get(key) or previous.get(key)
+                if entry is None:
+                    entry = ElementCatalogEntry.from_node(index, node)
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    if entry.index != index:
+                        # The rendered tail does not depend on the index.
+                        entry = replace(entry, index=index)
+            except AttributeError:  # pragma: no cover - defensive
+                continue
+            current[key] = entry
+            entries.append(entry)
+
+        self._entries = current
+        return ElementCatalogSnapshot(entries=entries)
 
 
 def build_element_catalog(
     selector_map: dict[int, EnhancedDOMTreeNode] | None,
+    cache: ElementCatalogCache | None = None,
 ) -> ElementCatalogSnapshot:
     """Build a deterministic catalog from *selector_map*.
 
     The selector map is produced by ``browser_use`` and contains interactive
     elements indexed in the order presented to the model.  The catalog mirrors
     this order so indices remain stable between the text representation and
-    subsequent actions.
+    subsequent actions.  With a *cache*, entries of nodes unchanged since the
+    previous step are reused.
     """
 
+    if cache is not None:
+        return cache.build(selector_map)
     if not selector_map:
         return ElementCatalogSnapshot(entries=[])
 
@@ -151,6 +248,7 @@ def enumerate_catalog_entries(
 
 
 __all__ = [
+    "ElementCatalogCache",
     "ElementCatalogEntry",
     "ElementCatalogSnapshot",
     "build_element_catalog",
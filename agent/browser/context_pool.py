@@ -0,0 +1,304 @@
+"""Pool of isolated browser contexts on the shared Chromium.
+
+Each slot is a CDP browser context (its own cookies and storage) holding one
+``about:blank`` page.  Sessions lease a slot, drive its page and hand it back;
+released contexts are disposed so the next session always starts clean.  The
+number of live contexts is capped and excess sessions wait in FIFO order.
+
+Isolation is partial.  Only the leased page lives in the context: tabs the
+agent opens with browser-use's new-tab action are created without a
+``browserContextId`` and land in the default context, where they share cookies
+with other sessions and outlive the lease.  Pop-ups opened from the leased page
+do stay in its context.  The automation server's ``PAGE`` is not leased either
+and keeps driving the default context.
+
+Pools are bound to the asyncio loop that first uses them, which in practice is
+the ``BrowserUseManager`` loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict
+
+from cdp_use.client import CDPClient
+
+log = logging.getLogger(__name__)
+
+_POOL_SIZE = max(1, int(os.getenv("BROWSER_CONTEXT_POOL_SIZE", "4")))
+# Idle contexts kept pre-created so a new session does not pay for creation.
+_POOL_WARM = max(0, int(os.getenv("BROWSER_CONTEXT_POOL_WARM", "1")))
+# Seconds a session waits for a free context; 0 waits indefinitely.
+_ACQUIRE_TIMEOUT = max(0.0, float(os.getenv("BROWSER_CONTEXT_POOL_TIMEOUT", "120")))
+
+_CAPACITY = object()
+
+
+class BrowserContextPoolTimeout(TimeoutError):
+    """Raised when no browser context became free within the wait timeout."""
+
+
+@dataclass
+class BrowserContextLease:
+    endpoint: str
+    browser_context_id: str
+    target_id: str
+    created_at: float = field(default_factory=time.time)
+
+
+class BrowserContextPool:
+    def __init__(
+        self,
+        endpoint: str,
+        *,
+        size: int | None = None,
+        warm: int | None = None,
+        acquire_timeout: float | None = None,
+        client_factory: Callable[[str], Any] = CDPClient,
+    ) -> None:
+        self.endpoint = endpoint
+        self._size = max(1, size if size is not None else _POOL_SIZE)
+        self._warm = min(self._size, max(0, warm if warm is not None else _POOL_WARM))
+        self._acquire_timeout = (
+            _ACQUIRE_TIMEOUT if acquire_timeout is None else max(0.0, acquire_timeout)
+        )
+        self._client_factory = client_factory
+        self._client: Any = None
+        self._client_lock: asyncio.Lock | None = None
+        self._idle: deque[BrowserContextLease] = deque()
+        self._leased: Dict[str, BrowserContextLease] = {}
+        self._pending = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._closed = False
+
+    # -- public API -----------------------------------------------------
+
+    async def acquire(self, timeout: float | None = None) -> BrowserContextLease:
+        """Lease a clean browser context, waiting while the pool is full."""
+
+        if self._closed:
+            raise RuntimeError("browser context pool is closed")
+
+        if not self._waiters:
+            if self._idle:
+                return self._lease(self._idle.popleft())
+            if self._live_count() < self._size:
+                return await self._create_leased()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        wait_for = self._acquire_timeout if timeout is None else max(0.0, timeout)
+        try:
+            result = await asyncio.wait_for(waiter, wait_for or None)
+        except asyncio.TimeoutError:
+            raise BrowserContextPoolTimeout(
+                f"no browser context became free within {wait_for:.1f}s"
+            ) from None
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # Capacity was handed to us just as we gave up; pass it on.
+                self._hand_off(waiter.result())
+            raise
+        finally:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+
+        if result is _CAPACITY:
+            return await self._create_leased(reserved=True)
+        return self._lease(result)
+
+    async def release(self, lease: BrowserContextLease) -> None:
+        """Dispose *lease*'s context and free its slot for the next session."""
+
+        if self._leased.pop(lease.target_id, None) is None:
+            return
+        await self._dispose(lease)
+        if self._closed:
+            return
+        if self._waiters:
+            self._free_slot()
+        else:
+            await self.warm()
+
+    async def warm(self) -> None:
+        """Pre-create idle contexts up to the configured warm count."""
+
+        while (
+            not self._closed
+            and len(self._idle) + self._pending < self._warm
+            and self._live_count() < self._size
+        ):
+            self._pending += 1
+            try:
+                lease = await self._create_context()
+            except Exception as exc:
+                log.warning("Failed to pre-create browser context on %s: %s", self.endpoint, exc)
+                return
+            finally:
+                self._pending -= 1
+            self._hand_off(lease)
+
+    async def close(self) -> None:
+        self._closed = True
+        for waiter in list(self._waiters):
+            if not waiter.done():
+                waiter.set_exception(RuntimeError("browser context pool is closed"))
+        idle = list(self._idle)
+        self._idle.clear()
+        for lease in idle:
+            await self._dispose(lease)
+        client, self._client = self._client, None
+        if client is not None:
+            try:
+                await client.stop()
+            except Exception as exc:  # pragma: no cover - best effort
+                log.debug("Error closing CDP client for %s: %s", self.endpoint, exc)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "endpoint": self.endpoint,
+            "size": self._size,
+            "warm": self._warm,
+            "idle": len(self._idle),
+            "leased": len(self._leased),
+            "pending": self._pending,
+            "waiting": sum(1 for waiter in self._waiters if not waiter.done()),
+        }
+
+    # -- internals ------------------------------------------------------
+
+    def _live_count(self) -> int:
+        return len(self._idle) + len(self._leased) + self._pending
+
+    def _lease(self, lease: BrowserContextLease) -> BrowserContextLease:
+        self._leased[lease.target_id] = lease
+        return lease
+
+    def _hand_off(self, item: Any) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(item)
+                return
+        if item is _CAPACITY:
+            # Nobody claimed the reserved slot.
+            self._pending -= 1
+        else:
+            self._idle.append(item)
+
+    def _free_slot(self) -> None:
+        if self._waiters:
+            # Reserve the slot so a newcomer cannot take it before the
+            # woken waiter gets to create its context.
+            self._pending += 1
+            self._hand_off(_CAPACITY)
+
+    async def _create_leased(self, *, reserved: bool = False) -> BrowserContextLease:
+        if not reserved:
+            self._pending += 1
+        try:
+            lease = await self._create_context()
+        except BaseException:
+            self._pending -= 1
+            self._free_slot()
+            raise
+        self._pending -= 1
+        return self._lease(lease)
+
+    async def _get_client(self) -> Any:
+        if self._client_lock is None:
+            self._client_lock = asyncio.Lock()
+        async with self._client_lock:
+            if self._client is None:
+                client = self._client_factory(self.endpoint)
+                await client.start()
+                self._client = client
+            return self._client
+
+    async def _reset_client(self) -> None:
+        client, self._client = self._client, None
+        if client is not None:
+            try:
+                await client.stop()
+            except Exception:  # pragma: no cover - best effort
+                pass
+
+    async def _create_context(self) -> BrowserContextLease:
+        client = await self._get_client()
+        try:
+            context = await client.send.Target.createBrowserContext(params={})
+            context_id = context["browserContextId"]
+            target = await client.send.Target.createTarget(
+                params={"url": "about:blank", "browserContextId": context_id}
+            )
+        except Exception:
+            await self._reset_client()
+            raise
+        log.debug("Created browser context %s on %s", context_id, self.endpoint)
+        return BrowserContextLease(
+            endpoint=self.endpoint,
+            browser_context_id=context_id,
+            target_id=target["targetId"],
+        )
+
+    async def _dispose(self, lease: BrowserContextLease) -> None:
+        try:
+            client = await self._get_client()
+            await client.send.Target.disposeBrowserContext(
+                params={"browserContextId": lease.browser_context_id}
+            )
+        except Exception as exc:
+            log.warning(
+                "Failed to dispose browser context %s on %s: %s",
+                lease.browser_context_id,
+                self.endpoint,
+                exc,
+            )
+            await self._reset_client()
+
+
+_pools: Dict[str, BrowserContextPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_browser_context_pool(endpoint: str) -> BrowserContextPool:
+    """Return the shared pool for *endpoint*, creating it on first use."""
+
+    with _pools_lock:
+        pool = _pools.get(endpoint)
+        if pool is None or pool._closed:
+            pool = BrowserContextPool(endpoint)
+            _pools[endpoint] = pool
+        return pool
+
+
+def browser_context_pool_stats() -> list[Dict[str, Any]]:
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [pool.stats() for pool in pools]
+
+
+async def close_browser_context_pools() -> None:
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        await pool.close()
+
+
+__all__ = [
+    "BrowserContextLease",
+    "BrowserContextPool",
+    "BrowserContextPoolTimeout",
+    "browser_context_pool_stats",
+    "close_browser_context_pools",
+    "get_browser_context_pool",
+]
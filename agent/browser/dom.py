@@ -1,24 +1,45 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+import os
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional
+
+from agent.utils.shared_browser import env_flag
+
+from .dom_diff import added_elements, diff_trees, render_diff
+from .dom_render import budget_chars, render_lines, render_text
+
+# Dirty subtrees beyond this make an incremental snapshot fall back to a
+# full one; patching that many roots is no cheaper than re-serialising.
+_MAX_DIRTY_ROOTS = max(1, int(os.getenv("DOM_SNAPSHOT_MAX_DIRTY", "50")))
+
+# Helpers shared by the full and incremental snapshot scripts.
+_SNAPSHOT_FUNCTIONS = """
+  // Single pass over the tree: every element's computed style and bounding
+  // rect is read once, XPaths are extended from the parent's path instead of
+  // being rebuilt from the root, and the rects of bounds-propagating
+  // ancestors travel down the recursion instead of being re-walked.
 
-DOM_SNAPSHOT_SCRIPT = """
-(() => {
   // Tags that provide no visual value and should be excluded entirely
   const excludedTags = new Set(['script', 'style', 'head', 'meta', 'link', 'title', 'noscript']);
-  
+
   // Tags that should propagate their bounds to children (for merging)
   const boundsPropagateTags = new Set(['button', 'a', 'label', 'summary']);
-  
+
   // Interactive elements that should remain separate even if inside propagation bounds
   const independentInteractiveTags = new Set(['input', 'select', 'textarea', 'button', 'a']);
-  
+
   // Relevant attributes to keep (others will be filtered out)
   const relevantAttributes = new Set(['title', 'type', 'name', 'role', 'value', 'placeholder', 'alt', 'aria-label', 'aria-describedby', 'aria-expanded', 'aria-hidden', 'aria-selected', 'aria-checked', 'id', 'class', 'href', 'src']);
 
+  const interactiveTags = new Set(['a', 'button', 'input', 'select', 'textarea', 'option', 'summary']);
+  const interactiveRoles = new Set(['button', 'link', 'textbox', 'checkbox', 'radio', 'menuitem', 'tab', 'switch', 'combobox']);
+  const scrollOverflow = new Set(['scroll', 'auto']);
+  const positionedTypes = new Set(['absolute', 'fixed', 'sticky']);
+  const propagateMargin = 5;
+
+  // Full indexed XPath; only used for the root of a (partial) snapshot.
   function computeXPath(el) {
-    if (el === document.body) return '/html/body';
     let xpath = '';
     while (el && el.nodeType === Node.ELEMENT_NODE) {
       let index = 1;
@@ -33,108 +54,65 @@ DOM_SNAPSHOT_SCRIPT = """
     return xpath;
   }
 
-  function isVisible(el) {
-    if (!(el instanceof Element)) return false;
-    const style = window.getComputedStyle(el);
-    if (style.visibility === 'hidden' || style.display === 'none') return false;
-    const rect = el.getBoundingClientRect();
-    return rect.width > 0 && rect.height > 0;
-  }
-
-  function isInteractive(el) {
-    const interactiveTags = ['a','button','input','select','textarea','option','summary'];
-    const interactiveRoles = ['button','link','textbox','checkbox','radio','menuitem','tab','switch','combobox'];
-    if (interactiveTags.includes(el.tagName.toLowerCase())) return true;
+  function isInteractive(el, tag) {
+    if (interactiveTags.has(tag)) return true;
     const role = el.getAttribute('role');
-    if (role && interactiveRoles.includes(role)) return true;
+    if (role && interactiveRoles.has(role)) return true;
     if (el.tabIndex >= 0) return true;
     if (el.isContentEditable) return true;
     return false;
   }
 
-  function shouldExcludeElement(el) {
-    if (excludedTags.has(el.tagName.toLowerCase())) return true;
-    
-    // Exclude if not visible and has no visible children
-    if (!isVisible(el)) {
-      const hasVisibleChildren = Array.from(el.children).some(child => isVisible(child));
-      return !hasVisibleChildren;
-    }
-    
-    return false;
+  function hits(el, x, y) {
+    const hit = document.elementFromPoint(x, y);
+    return !!hit && (hit === el || el.contains(hit));
   }
 
-  function isElementCompletelyHidden(el, allElements) {
-    if (!isVisible(el)) return true;
-    
-    const rect = el.getBoundingClientRect();
-    if (rect.width === 0 || rect.height === 0) return true;
-    
-    // Paint order filtering: check if element is completely covered by others
+  // Paint order filtering: an element whose centre is covered by something
+  // else counts as hidden unless at least two of eight edge points reach it.
+  function isCovered(el, rect) {
     const centerX = rect.left + rect.width / 2;
     const centerY = rect.top + rect.height / 2;
     const topElement = document.elementFromPoint(centerX, centerY);
-    
-    // If the element at the center point is not this element or a descendant,
-    // it might be covered
-    if (topElement && !el.contains(topElement) && topElement !== el) {
-      // Additional checks at corners and edges
-      const points = [
-        [rect.left + 1, rect.top + 1],
-        [rect.right - 1, rect.top + 1],
-        [rect.left + 1, rect.bottom - 1],
-        [rect.right - 1, rect.bottom - 1],
-        [centerX, rect.top + 1],
-        [centerX, rect.bottom - 1],
-        [rect.left + 1, centerY],
-        [rect.right - 1, centerY]
-      ];
-      
-      let visiblePoints = 0;
-      for (const [x, y] of points) {
-        const elementAtPoint = document.elementFromPoint(x, y);
-        if (elementAtPoint && (el.contains(elementAtPoint) || elementAtPoint === el)) {
-          visiblePoints++;
-        }
-      }
-      
-      // If less than 25% of test points are visible, consider it hidden
-      return visiblePoints < 2;
+    if (!topElement || topElement === el || el.contains(topElement)) return false;
+
+    const points = [
+      [rect.left + 1, rect.top + 1],
+      [rect.right - 1, rect.top + 1],
+      [rect.left + 1, rect.bottom - 1],
+      [rect.right - 1, rect.bottom - 1],
+      [centerX, rect.top + 1],
+      [centerX, rect.bottom - 1],
+      [rect.left + 1, centerY],
+      [rect.right - 1, centerY]
+    ];
+    let visiblePoints = 0;
+    for (let i = 0; i < points.length; i++) {
+      if (hits(el, points[i][0], points[i][1]) && ++visiblePoints >= 2) return false;
+      // Stop once the remaining points can no longer reach two.
+      if (visiblePoints + points.length - 1 - i < 2) return true;
     }
-    
-    return false;
+    return true;
   }
 
-  function isInsideBoundsPropagateParent(el) {
-    let parent = el.parentElement;
-    while (parent) {
-      if (boundsPropagateTags.has(parent.tagName.toLowerCase())) {
-        const parentRect = parent.getBoundingClientRect();
-        const elRect = el.getBoundingClientRect();
-        
-        // Check if element is substantially within parent bounds (allow small margin)
-        const margin = 5;
-        if (elRect.left >= parentRect.left - margin &&
-            elRect.right <= parentRect.right + margin &&
-            elRect.top >= parentRect.top - margin &&
-            elRect.bottom <= parentRect.bottom + margin) {
-          
-          // Don't exclude if this is an independent interactive element
-          if (independentInteractiveTags.has(el.tagName.toLowerCase())) {
-            return false;
-          }
-          
-          return true;
-        }
+  function isInsidePropagatingBounds(rect, propagating) {
+    for (let i = propagating.length - 1; i >= 0; i--) {
+      const parentRect = propagating[i];
+      if (rect.left >= parentRect.left - propagateMargin &&
+          rect.right <= parentRect.right + propagateMargin &&
+          rect.top >= parentRect.top - propagateMargin &&
+          rect.bottom <= parentRect.bottom + propagateMargin) {
+        return true;
       }
-      parent = parent.parentElement;
     }
     return false;
   }
 
   function extractRelevantAttributes(el) {
     const attrs = {};
-    for (const attr of Array.from(el.attributes)) {
+    const attributes = el.attributes;
+    for (let i = 0; i < attributes.length; i++) {
+      const attr = attributes[i];
       if (relevantAttributes.has(attr.name)) {
         let value = attr.value;
         // Trim long attribute values
@@ -147,70 +125,103 @@ DOM_SNAPSHOT_SCRIPT = """
     return attrs;
   }
 
-  function isScrollableContainer(el) {
-    const style = window.getComputedStyle(el);
-    return style.overflow === 'scroll' || style.overflow === 'auto' || 
-           style.overflowX === 'scroll' || style.overflowX === 'auto' ||
-           style.overflowY === 'scroll' || style.overflowY === 'auto';
-  }
-
-  function isIframe(el) {
-    return el.tagName.toLowerCase() === 'iframe';
+  function isScrollable(style) {
+    return scrollOverflow.has(style.overflow) ||
+           scrollOverflow.has(style.overflowX) ||
+           scrollOverflow.has(style.overflowY);
   }
 
   function getTextContent(node) {
-    if (node.nodeType === Node.TEXT_NODE) {
-      const text = node.textContent.trim();
-      // Filter out meaningless text (1-2 characters, only whitespace, etc.)
-      if (!text || text.length <= 2 && /^[\\s\\n\\r\\t]*$/.test(text)) {
-        return null;
-      }
-      return text;
+    const text = node.textContent.trim();
+    // Filter out meaningless text (1-2 characters, only whitespace, etc.)
+    if (!text || text.length <= 2 && /^[\\s\\n\\r\\t]*$/.test(text)) {
+      return null;
     }
-    return null;
+    return text;
   }
 
   let counter = 1;
-  const allElements = Array.from(document.querySelectorAll('*'));
-  
-  function serialize(node, depth = 0) {
-    if (node.nodeType === Node.TEXT_NODE) {
-      const text = getTextContent(node);
-      if (!text) return null;
-      return {nodeType: 'text', text};
+
+  // *propagating* holds the rects of bounds-propagating ancestors.  *track*
+  // is null for a plain snapshot; incremental snapshots pass a tracker that
+  // assigns stable node ids and lets unchanged children be sent as
+  // references.  Inside a *deep* subtree nothing is referenced.
+  function serialize(el, xpath, propagating, track, deep) {
+    const tag = el.tagName.toLowerCase();
+    if (excludedTags.has(tag)) return null;
+
+    // Hidden elements are dropped together with their subtree.
+    const style = window.getComputedStyle(el);
+    if (style.visibility === 'hidden' || style.display === 'none') return null;
+    const rect = el.getBoundingClientRect();
+    if (!(rect.width > 0 && rect.height > 0)) {
+      if (track !== null) track.collapsed.push(el);
+      return null;
+    }
+
+    if (isCovered(el, rect)) {
+      if (track !== null) track.covered(el, rect);
+      return null;
+    }
+
+    // Bounds propagation - merge into an enclosing button/link/label/summary
+    if (!independentInteractiveTags.has(tag) && isInsidePropagatingBounds(rect, propagating)) {
+      return null;
     }
-    
-    if (node.nodeType !== Node.ELEMENT_NODE) return null;
-    
-    // Exclude unnecessary elements
-    if (shouldExcludeElement(node)) return null;
-    
-    // Paint order filtering - exclude completely hidden elements
-    if (isElementCompletelyHidden(node, allElements)) return null;
-    
-    // Bounds propagation - exclude if inside bounds propagate parent
-    if (isInsideBoundsPropagateParent(node)) return null;
-    
-    const visible = isVisible(node);
-    const interactive = visible && isInteractive(node);
-    const attrs = extractRelevantAttributes(node);
-    
+
+    const interactive = isInteractive(el, tag);
+    const attrs = extractRelevantAttributes(el);
+
     // Add visual annotations
     const annotations = [];
-    if (isScrollableContainer(node)) {
+    if (isScrollable(style)) {
       annotations.push('SCROLL');
     }
-    if (isIframe(node)) {
+    if (tag === 'iframe') {
       annotations.push('IFRAME');
     }
-    
-    const children = Array.from(node.childNodes).map(child => serialize(child, depth + 1)).filter(Boolean);
-    
-    const result = {
-      tagName: node.tagName.toLowerCase(),
+
+    const propagates = boundsPropagateTags.has(tag);
+    if (propagates) propagating.push(rect);
+    // Descendants of a positioned box paint with it, over other content.
+    const paints = track !== null && positionedTypes.has(style.position);
+    if (paints) track.painting++;
+    const children = [];
+    // XPath indices count every earlier sibling with the same tag name,
+    // including ones that are not serialised.
+    const siblingCounts = new Map();
+    for (let child = el.firstChild; child; child = child.nextSibling) {
+      if (child.nodeType === Node.TEXT_NODE) {
+        const text = getTextContent(child);
+        if (text) children.push({nodeType: 'text', text});
+        continue;
+      }
+      if (child.nodeType !== Node.ELEMENT_NODE) continue;
+      const index = (siblingCounts.get(child.tagName) || 0) + 1;
+      siblingCounts.set(child.tagName, index);
+      const childXpath = xpath + '/' + child.tagName.toLowerCase() + '[' + index + ']';
+      let result;
+      if (track !== null && !deep && track.reusable(child)) {
+        result = {ref: track.idFor(child), xpath: childXpath};
+      } else {
+        result = serialize(
+          child,
+          childXpath,
+          propagating,
+          track,
+          deep || (track !== null && track.deep.has(child))
+        );
+      }
+      if (result) children.push(result);
+    }
+    if (propagates) propagating.pop();
+    if (paints) track.painting--;
+
+    const node = {
+      tagName: tag,
       attributes: attrs,
-      xpath: computeXPath(node),
-      isVisible: visible,
+      xpath: el === document.body ? '/html/body' : xpath,
+      isVisible: true,
       isInteractive: interactive,
       isTopElement: interactive,
       highlightIndex: interactive ? counter++ : undefined,
@@ -218,13 +229,438 @@ DOM_SNAPSHOT_SCRIPT = """
       annotations: annotations.length > 0 ? annotations : undefined,
       excludedByParent: false, // This will be set by parent elements
     };
-    
+    if (track !== null) node.nodeId = track.record(el, node, style, rect);
+    return node;
+  }
+"""
+
+DOM_SNAPSHOT_SCRIPT = (
+    "\n(() => {\n"
+    + _SNAPSHOT_FUNCTIONS
+    + "\n  return serialize(document.body, computeXPath(document.body), [], null, false);\n})()\n"
+)
+
+# Called with ``{generation, maxDirty}``.  The first call installs a
+# MutationObserver on the page and returns a full snapshot whose element
+# nodes carry stable ``nodeId``s.  Later calls whose ``generation`` matches
+# the page's return only ``patches``: ``{nodeId, node}`` pairs replacing the
+# subtree of ``nodeId`` (``node`` is null when it disappeared), in which
+# unchanged children appear as ``{ref: nodeId, xpath}``.  Anything the
+# observer cannot localise (window scroll or resize, changes to <html> or
+# <body>, too many dirty subtrees or overlays) yields a full snapshot
+# instead.  Unchanged elements whose box moved are re-serialised too;
+# positioned elements nested inside merged elements are not tracked as
+# overlays.
+DOM_INCREMENTAL_SCRIPT = (
+    "\n(options) => {\n"
+    + _SNAPSHOT_FUNCTIONS
+    + """
+  const stateKey = '__webAgentDomSnapshot';
+  const propagateSelector = 'a,button,label,summary';
+  const maxDirty = options.maxDirty;
+  // Marks beyond this are not worth keeping; the next snapshot is full.
+  const maxMarks = 5000;
+  const maxOverlays = 25;
+
+  function install() {
+    const state = {
+      generation: 0,
+      nextId: 1,
+      ids: new WeakMap(),
+      deep: new Set(),
+      shallow: new Set(),
+      full: true,
+      body: null,
+      mirror: new Map(),
+      covered: new Map(),
+      painters: new Map(),
+    };
+    function mark(target, deep) {
+      if (state.full || !target || target.nodeType !== Node.ELEMENT_NODE) return;
+      (deep ? state.deep : state.shallow).add(target);
+      if (state.deep.size + state.shallow.size > maxMarks) state.full = true;
+    }
+    state.take = (records) => {
+      for (const record of records) {
+        if (record.type === 'attributes') mark(record.target, true);
+        else if (record.type === 'childList') {
+          mark(record.target, false);
+          record.addedNodes.forEach((node) => mark(node, true));
+        }
+        else mark(record.target.parentElement, false);
+      }
+    };
+    state.observer = new MutationObserver(state.take);
+    // The document itself, so a replaced <html> (document.open) is seen.
+    state.document = document;
+    state.observer.observe(document, {
+      subtree: true, childList: true, attributes: true, characterData: true,
+    });
+    // Changes that move or resize boxes without touching the DOM.
+    window.addEventListener('resize', () => { state.full = true; });
+    document.addEventListener('scroll', (event) => {
+      const target = event.target;
+      if (target === document || target === document.scrollingElement) state.full = true;
+      else mark(target, true);
+    }, true);
+    for (const type of ['load', 'transitionend', 'animationend']) {
+      document.addEventListener(type, (event) => mark(event.target, true), true);
+    }
+    window[stateKey] = state;
+    return state;
+  }
+
+  // The mirror holds {el, parent, children, box, positioned} for every
+  // element in the page's latest snapshot, so inclusion can be checked and
+  // stale entries dropped without walking unchanged subtrees; positioned
+  // also holds for descendants of positioned elements, which paint with
+  // them.  Elements left out because something covered them are remembered
+  // in state.covered so they can be re-checked when that changes.
+  // Positioned elements that are not in the snapshot (say, a menu inside a
+  // zero-height wrapper) still paint over others; state.painters remembers
+  // their boxes.  Covered elements are scanned for them too.
+  function makeTracker(state, deepMarks, shallowMarks) {
+    const fresh = new Set();
+    const overlays = [];
+    const collapsed = [];
+    function idFor(el) {
+      let id = state.ids.get(el);
+      if (id === undefined) {
+        id = state.nextId++;
+        state.ids.set(el, id);
+      }
+      return id;
+    }
+    function included(el) {
+      const id = state.ids.get(el);
+      return id !== undefined && state.mirror.has(id);
+    }
+    function drop(id, parentId) {
+      const entry = state.mirror.get(id);
+      // A moved element has already been claimed by its new parent.
+      if (!entry || entry.parent !== parentId) return;
+      if (entry.positioned) overlays.push(entry.box);
+      state.mirror.delete(id);
+      for (const child of entry.children) drop(child, id);
+    }
+    return {
+      deep: deepMarks,
+      fresh,
+      overlays,
+      collapsed,
+      idFor,
+      included,
+      drop,
+      // Positioned ancestors of the element being serialised.
+      painting: 0,
+      reusable(el) {
+        return !deepMarks.has(el) && !shallowMarks.has(el) && included(el);
+      },
+      covered(el, rect) {
+        state.covered.set(el, boxOf(rect));
+        collapsed.push(el);
+      },
+      record(el, node, style, rect) {
+        const id = idFor(el);
+        const childIds = [];
+        for (const child of node.children) {
+          const childId = child.nodeId || child.ref;
+          if (childId) childIds.push(childId);
+        }
+        const box = boxOf(rect);
+        const own = positionedTypes.has(style.position);
+        const positioned = own || this.painting > 0;
+        let entry = state.mirror.get(id);
+        let changed = true;
+        if (entry) {
+          changed = !entry.positioned || !sameBox(entry.box, box);
+          if (entry.positioned && (changed || !positioned)) overlays.push(entry.box);
+          const kept = new Set(childIds);
+          for (const childId of entry.children) {
+            if (!kept.has(childId)) drop(childId, id);
+          }
+        } else {
+          entry = {el, parent: 0, children: [], box, positioned: false};
+          state.mirror.set(id, entry);
+        }
+        for (const childId of childIds) state.mirror.get(childId).parent = id;
+        entry.children = childIds;
+        entry.box = box;
+        entry.positioned = positioned;
+        if (own || (positioned && changed)) overlays.push(box);
+        fresh.add(el);
+        return id;
+      },
+    };
+  }
+
+  function boxOf(rect) {
+    return {left: rect.left, top: rect.top, right: rect.right, bottom: rect.bottom};
+  }
+
+  function sameBox(a, b) {
+    return a.left === b.left && a.top === b.top && a.right === b.right && a.bottom === b.bottom;
+  }
+
+  function intersectsAny(box, boxes) {
+    for (const other of boxes) {
+      if (box.left < other.right && other.left < box.right &&
+          box.top < other.bottom && other.top < box.bottom) return true;
+    }
+    return false;
+  }
+
+  let state = window[stateKey];
+  if (state && state.document !== document) {
+    state.observer.disconnect();
+    state = null;
+  }
+  if (!state) state = install();
+  state.take(state.observer.takeRecords());
+
+  function paintedBox(el) {
+    const style = window.getComputedStyle(el);
+    if (!positionedTypes.has(style.position) || style.visibility === 'hidden' || style.display === 'none') return null;
+    const rect = el.getBoundingClientRect();
+    return rect.width > 0 && rect.height > 0 ? boxOf(rect) : null;
+  }
+
+  // Record positioned elements in *subtrees* that the snapshot skipped, and
+  // queue the old and new boxes of known ones that moved or went away.
+  function findPainters(track, subtrees) {
+    for (const [el, box] of state.painters) {
+      const now = el.isConnected ? paintedBox(el) : null;
+      if (now && sameBox(now, box)) continue;
+      track.overlays.push(box);
+      if (now) {
+        state.painters.set(el, now);
+        track.overlays.push(now);
+      } else {
+        state.painters.delete(el);
+      }
+    }
+    for (const root of subtrees) {
+      if (!root.isConnected || track.included(root)) continue;
+      const elements = [root, ...root.querySelectorAll('*')];
+      for (const el of elements) {
+        if (state.painters.has(el) || track.included(el)) continue;
+        const box = paintedBox(el);
+        if (box) {
+          state.painters.set(el, box);
+          track.overlays.push(box);
+        }
+      }
+    }
+  }
+
+  function fullSnapshot() {
+    // May follow an abandoned incremental attempt.
+    counter = 1;
+    state.mirror = new Map();
+    state.covered = new Map();
+    state.painters = new Map();
+    state.deep.clear();
+    state.shallow.clear();
+    state.full = false;
+    state.body = document.body;
+    const track = makeTracker(state, new Set(), new Set());
+    const tree = serialize(document.body, computeXPath(document.body), [], track, true);
+    findPainters(track, track.collapsed);
+    state.generation += 1;
+    return {
+      full: true,
+      generation: state.generation,
+      tree,
+      stats: {roots: 1, serialized: track.fresh.size},
+    };
+  }
+
+  // Rects of bounds-propagating ancestors, as serialize() would have them.
+  function ancestorBounds(el) {
+    const rects = [];
+    for (let parent = el.parentElement; parent && parent !== document.documentElement; parent = parent.parentElement) {
+      if (boundsPropagateTags.has(parent.tagName.toLowerCase())) rects.unshift(parent.getBoundingClientRect());
+    }
+    return rects;
+  }
+
+  function insidePositioned(el) {
+    for (let parent = el.parentElement; parent; parent = parent.parentElement) {
+      if (positionedTypes.has(window.getComputedStyle(parent).position)) return true;
+    }
+    return false;
+  }
+
+  // Turn raw marks into elements to re-serialise: deep ones are redone with
+  // their whole subtree, shallow ones (children or text changed) reference
+  // their unchanged children.  Returns false when only a full snapshot will do.
+  function normalise(track, marks, deepMarks, shallowMarks) {
+    for (const [target, isDeep] of marks) {
+      let el = target;
+      let deep = isDeep;
+      if (!el.isConnected) continue;
+      if (el === document.documentElement || el === document.body) return false;
+      // A change inside a link or button can move its bounds, which decide
+      // whether its other descendants merge into it.
+      const propagator = el.closest(propagateSelector);
+      if (propagator) {
+        el = propagator;
+        deep = true;
+      }
+      if (track.included(el)) {
+        (deep ? deepMarks : shallowMarks).add(el);
+        continue;
+      }
+      const parent = el.parentElement;
+      if (parent && track.included(parent)) {
+        // Newly shown: its parent re-lists its children.
+        deepMarks.add(el);
+        shallowMarks.add(parent);
+      }
+      // Otherwise it is inside a subtree the snapshot does not include.
+    }
+    return true;
+  }
+
+  function roots(deepMarks, shallowMarks) {
+    const result = [];
+    const consider = (el) => {
+      const parent = el.parentElement;
+      if (parent && (deepMarks.has(parent) || shallowMarks.has(parent))) return;
+      for (let ancestor = parent; ancestor; ancestor = ancestor.parentElement) {
+        if (deepMarks.has(ancestor)) return;
+      }
+      result.push(el);
+    };
+    deepMarks.forEach(consider);
+    shallowMarks.forEach((el) => { if (!deepMarks.has(el)) consider(el); });
     return result;
   }
 
-  return serialize(document.body);
-})()
+  function patch(track, targets, patches) {
+    for (const root of targets) {
+      const id = track.idFor(root);
+      const entry = state.mirror.get(id);
+      if (!entry) continue;
+      const parentId = entry.parent;
+      track.painting = insidePositioned(root) ? 1 : 0;
+      const node = serialize(root, computeXPath(root), ancestorBounds(root), track, track.deep.has(root));
+      track.painting = 0;
+      if (!node) track.drop(id, parentId);
+      patches.push({nodeId: id, node});
+    }
+  }
+
+  function stillShown(el) {
+    if (excludedTags.has(el.tagName.toLowerCase())) return false;
+    const style = window.getComputedStyle(el);
+    if (style.visibility === 'hidden' || style.display === 'none') return false;
+    const rect = el.getBoundingClientRect();
+    if (!(rect.width > 0 && rect.height > 0)) return false;
+    return !isCovered(el, rect);
+  }
+
+  // Re-serialised roots can reflow the rest of the page: siblings in a
+  // scroll container slide into or out of its clipped area, in-flow boxes
+  // slide under positioned ones.  Re-check everything whose box moved.
+  function reflowed(track, deepMarks, shallowMarks) {
+    for (const entry of state.mirror.values()) {
+      const el = entry.el;
+      if (el === document.body || track.fresh.has(el) || !el.isConnected) continue;
+      if (!sameBox(boxOf(el.getBoundingClientRect()), entry.box)) deepMarks.add(el);
+    }
+    for (const [el, box] of state.covered) {
+      if (!el.isConnected || track.included(el)) continue;
+      const parent = el.parentElement;
+      if (!parent || !track.included(parent) || track.fresh.has(parent)) continue;
+      const now = boxOf(el.getBoundingClientRect());
+      if (sameBox(now, box)) continue;
+      state.covered.set(el, now);
+      if (stillShown(el)) {
+        deepMarks.add(el);
+        shallowMarks.add(parent);
+      }
+    }
+  }
+
+  // A positioned element that appeared, moved or went away can cover or
+  // uncover elements outside its own subtree.  Re-check everything whose
+  // last known box overlaps its old or new box.
+  function uncovered(track, deepMarks, shallowMarks) {
+    const boxes = track.overlays;
+    for (const entry of state.mirror.values()) {
+      const el = entry.el;
+      if (el === document.body || track.fresh.has(el) || !intersectsAny(entry.box, boxes)) continue;
+      if (!stillShown(el)) deepMarks.add(el);
+    }
+    for (const [el, box] of state.covered) {
+      if (!el.isConnected || track.included(el)) {
+        state.covered.delete(el);
+        continue;
+      }
+      const parent = el.parentElement;
+      if (!parent || !track.included(parent) || track.fresh.has(parent)) continue;
+      if (intersectsAny(box, boxes) && stillShown(el)) {
+        deepMarks.add(el);
+        shallowMarks.add(parent);
+      }
+    }
+  }
+
+  if (state.full || options.generation !== state.generation || state.body !== document.body) {
+    return fullSnapshot();
+  }
+  const bodyId = state.ids.get(document.body);
+  if (bodyId === undefined || !state.mirror.has(bodyId)) return fullSnapshot();
+
+  const marks = [];
+  state.deep.forEach((el) => marks.push([el, true]));
+  state.shallow.forEach((el) => marks.push([el, false]));
+  const deepMarks = new Set();
+  const shallowMarks = new Set();
+  const track = makeTracker(state, deepMarks, shallowMarks);
+  if (!normalise(track, marks, deepMarks, shallowMarks)) return fullSnapshot();
+  const firstRoots = roots(deepMarks, shallowMarks);
+  if (firstRoots.length > maxDirty) return fullSnapshot();
+
+  const patches = [];
+  patch(track, firstRoots, patches);
+  if (marks.length) {
+    const movedDeep = new Set();
+    const movedShallow = new Set();
+    reflowed(track, movedDeep, movedShallow);
+    movedDeep.forEach((el) => deepMarks.add(el));
+    movedShallow.forEach((el) => shallowMarks.add(el));
+    const movedRoots = roots(movedDeep, movedShallow);
+    if (firstRoots.length + movedRoots.length > maxDirty) return fullSnapshot();
+    patch(track, movedRoots, patches);
+    firstRoots.push(...movedRoots);
+  }
+  findPainters(track, track.collapsed.concat(marks.map(([el]) => el)));
+  if (track.overlays.length > maxOverlays) return fullSnapshot();
+  if (track.overlays.length) {
+    const coveredDeep = new Set();
+    const coveredShallow = new Set();
+    uncovered(track, coveredDeep, coveredShallow);
+    coveredDeep.forEach((el) => deepMarks.add(el));
+    coveredShallow.forEach((el) => shallowMarks.add(el));
+    const moreRoots = roots(coveredDeep, coveredShallow);
+    if (firstRoots.length + moreRoots.length > maxDirty) return fullSnapshot();
+    patch(track, moreRoots, patches);
+  }
+
+  state.deep.clear();
+  state.shallow.clear();
+  state.generation += 1;
+  return {
+    full: false,
+    generation: state.generation,
+    patches,
+    stats: {roots: patches.length, serialized: track.fresh.size},
+  };
+}
 """
+)
 
 
 @dataclass
@@ -241,6 +677,7 @@ class DOMElementNode:
     annotations: Optional[List[str]] = None
     excludedByParent: bool = False
     isNewElement: bool = False  # For marking new elements with *
+    nodeId: Optional[int] = None  # Stable id from incremental snapshots
 
     @classmethod
     def from_json(cls, data: dict) -> "DOMElementNode":
@@ -248,7 +685,61 @@ class DOMElementNode:
             return None
         if data.get("nodeType") == "text":
             return cls(tagName="#text", text=data.get("text"))
-        children = [cls.from_json(c) for c in data.get("children", []) if c]
+        # Built children-first without recursion, so deeply nested pages
+        # stay within the recursion limit.
+        built: List["DOMElementNode"] = []
+        stack: List[tuple[dict, Optional[list]]] = [(data, None)]
+        while stack:
+            item, children = stack.pop()
+            if children is None:
+                if item.get("nodeType") == "text":
+                    built.append(cls(tagName="#text", text=item.get("text")))
+                    continue
+                children = [c for c in item.get("children", []) if c]
+                if children:
+                    # Revisit once the children are built.
+                    stack.append((item, children))
+                    stack.extend((child, None) for child in reversed(children))
+                    continue
+            start = len(built) - len(children)
+            nodes = built[start:]
+            del built[start:]
+            built.append(cls._from_element(item, nodes))
+        return built[0]
+
+    def to_json(self) -> dict:
+        """The inverse of :meth:`from_json`, in :data:`DOM_SNAPSHOT_SCRIPT`'s shape."""
+
+        built: List[dict] = []
+        stack: List[tuple["DOMElementNode", bool]] = [(self, False)]
+        while stack:
+            node, visited = stack.pop()
+            if node.tagName == "#text":
+                built.append({"nodeType": "text", "text": node.text})
+                continue
+            if not visited and node.children:
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(node.children))
+                continue
+            start = len(built) - len(node.children)
+            children = built[start:]
+            del built[start:]
+            built.append({
+                "tagName": node.tagName,
+                "attributes": node.attributes,
+                "xpath": node.xpath,
+                "isVisible": node.isVisible,
+                "isInteractive": node.isInteractive,
+                "isTopElement": node.isTopElement,
+                "highlightIndex": node.highlightIndex,
+                "children": children,
+                "annotations": node.annotations,
+                "excludedByParent": node.excludedByParent,
+            })
+        return built[0]
+
+    @classmethod
+    def _from_element(cls, data: dict, children: List["DOMElementNode"]) -> "DOMElementNode":
         return cls(
             tagName=data.get("tagName", ""),
             attributes=data.get("attributes", {}),
@@ -262,6 +753,7 @@ class DOMElementNode:
             annotations=data.get("annotations"),
             excludedByParent=data.get("excludedByParent", False),
             isNewElement=data.get("isNewElement", False),
+            nodeId=data.get("nodeId"),
         )
 
     @classmethod
@@ -277,162 +769,364 @@ class DOMElementNode:
     # Backwards compatible alias
     from_html = from_page
 
+    def apply_patches(self, patches: List[Dict[str, Any]]) -> Optional["DOMElementNode"]:
+        """Return a copy of this tree with incremental snapshot *patches* applied.
+
+        Each patch replaces the subtree of its ``nodeId`` (or removes it when
+        ``node`` is ``None``).  ``{"ref": id, "xpath": ...}`` entries reuse the
+        unchanged node with that id, moving its XPaths under the new path.
+        Only the patched nodes and their ancestors are rebuilt; other subtrees
+        are shared with this tree, which is left as is, and copied only when
+        their highlight indices shift.  Highlight indices are renumbered
+        exactly as a full snapshot assigns them.  Raises ``KeyError`` when a
+        reference is not in this tree.
+        """
+
+        replacements = {patch["nodeId"]: patch.get("node") for patch in patches}
+        nodes, parents = self._patch_index()
+        dirty: set = set()
+        for node_id in replacements:
+            if node_id not in nodes:
+                continue
+            while node_id is not None and node_id not in dirty:
+                dirty.add(node_id)
+                node_id = parents[node_id]
+
+        added: Dict[int, DOMElementNode] = {}
+        added_parents: Dict[int, Optional[int]] = {}
+        removed: List[DOMElementNode] = []
+        reused: set = set()
+        counter = 0
+
+        def record(node: DOMElementNode, start: int) -> None:
+            count = counter - start
+            node._highlight_span = (count, start + 1 if count else None)
+            if node.nodeId is not None:
+                added[node.nodeId] = node
+            for child in node.children:
+                if child.nodeId is not None:
+                    added_parents[child.nodeId] = node.nodeId
+
+        # Post-order walk with an explicit stack, so deep pages stay within
+        # the recursion limit.  Finished nodes are appended to ``out``, the
+        # children list of the frame that will build their parent.
+        result: List[DOMElementNode] = []
+        stack: List[tuple] = [("visit", [self], 0, self.xpath, self.xpath, result)]
+        while stack:
+            frame = stack.pop()
+            kind, out = frame[0], frame[-1]
+            if kind == "data":
+                data = frame[1]
+                if data is None:
+                    continue
+                if "ref" in data:
+                    old = nodes[data["ref"]]
+                    reused.add(data["ref"])
+                    stack.append(("visit", [old], 0, old.xpath, data.get("xpath", old.xpath), out))
+                elif data.get("nodeType") == "text":
+                    out.append(DOMElementNode(tagName="#text", text=data.get("text")))
+                else:
+                    children: List[DOMElementNode] = []
+                    stack.append(("build", data, counter, children, out))
+                    stack.extend(
+                        ("data", child, children) for child in reversed(data.get("children", []))
+                    )
+            elif kind == "visit":
+                # Clean siblings are placed in a tight loop; the walk only
+                # descends into patched nodes and their ancestors.
+                _, siblings, position, old_prefix, new_prefix, _ = frame
+                for position in range(position, len(siblings)):
+                    node = siblings[position]
+                    if node.nodeId in replacements or node.nodeId in dirty:
+                        break
+                    span = getattr(node, "_highlight_span", None) or _highlight_span(node)
+                    if old_prefix == new_prefix and (not span[0] or span[1] == counter + 1):
+                        out.append(node)
+                    else:
+                        out.append(_relocate(node, old_prefix, new_prefix, counter, added))
+                    counter += span[0]
+                else:
+                    continue
+                if position + 1 < len(siblings):
+                    stack.append(("visit", siblings, position + 1, old_prefix, new_prefix, out))
+                if node.nodeId in replacements:
+                    removed.append(node)
+                    stack.append(("data", replacements[node.nodeId], out))
+                else:
+                    children = []
+                    stack.append(("rebuild", node, old_prefix, new_prefix, counter, children, out))
+                    stack.append(("visit", node.children, 0, old_prefix, new_prefix, children))
+            elif kind == "build":
+                _, data, start, children, _ = frame
+                node = DOMElementNode._from_element(data, children)
+                node.highlightIndex = None
+                if node.isInteractive:
+                    counter += 1
+                    node.highlightIndex = counter
+                record(node, start)
+                out.append(node)
+            else:
+                _, node, old_prefix, new_prefix, start, children, _ = frame
+                xpath = _moved_xpath(node.xpath, old_prefix, new_prefix)
+                highlight = None
+                if node.isInteractive:
+                    counter += 1
+                    highlight = counter
+                if (
+                    xpath == node.xpath
+                    and highlight == node.highlightIndex
+                    and len(children) == len(node.children)
+                    and all(new is old for new, old in zip(children, node.children))
+                ):
+                    out.append(node)
+                    continue
+                node = replace(node, xpath=xpath, highlightIndex=highlight, children=children)
+                record(node, start)
+                out.append(node)
+
+        root = result[0] if result else None
+        if root is None or root is self:
+            return root
+        new_nodes = dict(nodes)
+        new_parents = dict(parents)
+        for old in removed:
+            pending = [old]
+            while pending:
+                node = pending.pop()
+                if node.nodeId in reused:
+                    continue
+                new_nodes.pop(node.nodeId, None)
+                new_parents.pop(node.nodeId, None)
+                pending.extend(node.children)
+        new_nodes.update(added)
+        new_parents.update(added_parents)
+        if root.nodeId is not None:
+            new_parents[root.nodeId] = None
+        root._patch_index_cache = (new_nodes, new_parents)
+        return root
+
+    def _patch_index(self) -> tuple[Dict[int, "DOMElementNode"], Dict[int, Optional[int]]]:
+        """Return ``nodeId`` -> node and ``nodeId`` -> parent id maps for this tree.
+
+        Built once per full snapshot; :meth:`apply_patches` hands its result
+        an updated copy, so later steps never walk the whole tree again.
+        """
+
+        index = getattr(self, "_patch_index_cache", None)
+        if index is None:
+            nodes: Dict[int, DOMElementNode] = {}
+            parents: Dict[int, Optional[int]] = {}
+            stack: List[tuple[DOMElementNode, Optional[int]]] = [(self, None)]
+            while stack:
+                node, parent = stack.pop()
+                if node.nodeId is not None:
+                    nodes[node.nodeId] = node
+                    parents[node.nodeId] = parent
+                    parent = node.nodeId
+                stack.extend((child, parent) for child in node.children)
+            index = self._patch_index_cache = (nodes, parents)
+        return index
+
     def to_lines(
         self, depth: int = 0, max_lines: int | None = None, _lines=None
     ) -> List[str]:
         """Return structured text representation of the DOM tree optimized for LLM consumption."""
-        if _lines is None:
-            _lines = []
-        if max_lines is not None and len(_lines) >= max_lines:
-            return _lines
-            
-        indent = "  " * depth
-        
-        # Handle text nodes
-        if self.tagName == "#text":
-            if self.text and self.text.strip():
-                # Only add meaningful text (already filtered in JS)
-                _lines.append(f"{indent}{self.text.strip()}")
-            return _lines
-        
-        # Skip excluded elements
-        if self.excludedByParent:
-            return _lines
-            
-        # Build element representation
-        parts = []
-        
-        # Add interactive element index at the beginning
-        if self.highlightIndex is not None:
-            prefix = "*" if self.isNewElement else ""
-            parts.append(f"[{prefix}{self.highlightIndex}]")
-        
-        # Add opening tag with attributes
-        tag_parts = [f"<{self.tagName}"]
-        
-        # Add relevant attributes
-        attr_parts = []
-        for key, value in self.attributes.items():
-            if value:  # Only add attributes with values
-                # Format specific attributes nicely
-                if key in ['type', 'name', 'role', 'title', 'placeholder', 'alt', 'aria-label']:
-                    attr_parts.append(f'{key}="{value}"')
-                elif key == 'href' and value.startswith('http'):
-                    # Shorten long URLs
-                    if len(value) > 50:
-                        attr_parts.append(f'href="{value[:47]}..."')
-                    else:
-                        attr_parts.append(f'href="{value}"')
-                elif key in ['id', 'class'] and len(value) <= 30:
-                    attr_parts.append(f'{key}="{value}"')
-        
-        if attr_parts:
-            tag_parts.append(" " + " ".join(attr_parts))
-        
-        # For self-closing elements or elements with only text content
-        text_content = self._collect_text_content()
-        
-        if not self.children or (len(self.children) == 1 and self.children[0].tagName == "#text"):
-            # Self-closing format with text content
-            if text_content:
-                tag_parts.append(f" /> {text_content}")
-            else:
-                tag_parts.append(" />")
-            
-            # Add visual annotations
-            if self.annotations:
-                for annotation in self.annotations:
-                    tag_parts.append(f" |{annotation}|")
-            
-            parts.extend(tag_parts)
-            _lines.append(f"{indent}{''.join(parts)}")
-        else:
-            # Opening tag
-            tag_parts.append(">")
-            
-            # Add visual annotations
-            if self.annotations:
-                for annotation in self.annotations:
-                    tag_parts.append(f" |{annotation}|")
-            
-            parts.extend(tag_parts)
-            _lines.append(f"{indent}{''.join(parts)}")
-            
-            # Add children
-            for ch in self.children:
-                if max_lines is not None and len(_lines) >= max_lines:
-                    break
-                ch.to_lines(depth + 1, max_lines, _lines)
-        
-        return _lines
-    
-    def _collect_text_content(self) -> str:
-        """Collect all text content from this element and its children."""
-        texts = []
-        
-        def collect_text(node):
-            if node.tagName == "#text" and node.text:
-                texts.append(node.text.strip())
-            else:
-                for child in node.children:
-                    collect_text(child)
-        
-        for child in self.children:
-            collect_text(child)
-        
-        return " ".join(texts).strip()
-
-    def to_text(self, max_lines: int | None = None, previous_dom: "DOMElementNode" = None) -> str:
-        """Generate structured text representation with scroll position annotations."""
+        return render_lines(self, depth, max_lines, _lines)
+
+    def to_text(
+        self,
+        max_lines: int | None = None,
+        previous_dom: "DOMElementNode" = None,
+        *,
+        max_chars: int | None = None,
+        max_tokens: int | None = None,
+        changes_only: bool = False,
+    ) -> str:
+        """Generate structured text representation with scroll position annotations.
+
+        With *max_chars* or *max_tokens* the text is fitted to that budget by
+        :func:`~agent.browser.dom_render.render_budgeted`.  With
+        *changes_only* and a *previous_dom*, only what changed since it is
+        rendered (see :func:`~agent.browser.dom_diff.render_diff`).
+        """
         # Mark new elements if we have a previous DOM to compare against
+        new = None
         if previous_dom:
-            self._mark_new_elements(previous_dom)
-        
-        lines = self.to_lines(max_lines=max_lines)
-        
-        # Add scroll position annotations
-        # Note: This would need to be enhanced with actual scroll position data from the browser
-        # For now, we'll add placeholder logic that could be enhanced later
-        result_lines = []
-        
-        # Check if we need scroll annotations (this would be populated from browser data)
-        # For demonstration, we'll add the structure that would be used
-        scroll_info = getattr(self, '_scroll_info', None)
-        if scroll_info:
-            if scroll_info.get('pixels_above', 0) > 0:
-                result_lines.append(f"... {scroll_info['pixels_above']} pixels above ...")
-        
-        result_lines.extend(lines)
-        
-        if scroll_info:
-            if scroll_info.get('pixels_below', 0) > 0:
-                result_lines.append(f"... {scroll_info['pixels_below']} pixels below ...")
-        
-        return "\n".join(result_lines)
-    
-    def _mark_new_elements(self, previous_dom: "DOMElementNode"):
-        """Mark elements that are new compared to previous DOM."""
-        previous_elements = set()
-        
-        def collect_elements(node, elements_set):
-            if node.xpath:
-                elements_set.add(node.xpath)
-            for child in node.children:
-                collect_elements(child, elements_set)
-        
-        collect_elements(previous_dom, previous_elements)
-        
-        def mark_new(node):
-            if node.xpath and node.xpath not in previous_elements:
-                node.isNewElement = True
-            for child in node.children:
-                mark_new(child)
-        
-        mark_new(self)
-    
+            diff = diff_trees(previous_dom, self)
+            new = added_elements(diff)
+            if changes_only:
+                lines = render_diff(diff, max_lines, budget_chars(max_chars, max_tokens), new)
+                return "\n".join(lines)
+        return render_text(
+            self,
+            scroll_info=getattr(self, '_scroll_info', None),
+            max_lines=max_lines,
+            max_chars=budget_chars(max_chars, max_tokens),
+            new=new,
+        )
+
     def set_scroll_info(self, pixels_above: int = 0, pixels_below: int = 0):
         """Set scroll position information for annotations."""
         self._scroll_info = {
             'pixels_above': pixels_above,
             'pixels_below': pixels_below
         }
+
+
+def _highlight_span(node: DOMElementNode) -> tuple[int, Optional[int]]:
+    """Return the number of interactive nodes under *node* and the first one's index.
+
+    Post-order numbering gives every subtree a contiguous run of indices, so
+    the pair says where the run starts and how long it is.  The result is
+    cached on each node, which are never mutated once built.
+    """
+
+    span = getattr(node, "_highlight_span", None)
+    if span is not None:
+        return span
+    stack = [(node, False)]
+    while stack:
+        current, expanded = stack.pop()
+        if getattr(current, "_highlight_span", None) is not None:
+            continue
+        if not expanded:
+            stack.append((current, True))
+            stack.extend((child, False) for child in current.children)
+            continue
+        count, first = 0, None
+        for child in current.children:
+            child_count, child_first = child._highlight_span
+            if child_count and not count:
+                first = child_first
+            count += child_count
+        if current.isInteractive:
+            if not count:
+                first = current.highlightIndex
+            count += 1
+        current._highlight_span = (count, first)
+    return node._highlight_span
+
+
+def _moved_xpath(xpath: str, old_prefix: str, new_prefix: str) -> str:
+    if old_prefix != new_prefix and xpath.startswith(old_prefix):
+        return new_prefix + xpath[len(old_prefix):]
+    return xpath
+
+
+def _relocate(
+    node: DOMElementNode,
+    old_prefix: str,
+    new_prefix: str,
+    start: int,
+    copies: Dict[int, DOMElementNode],
+) -> DOMElementNode:
+    """Place the unchanged subtree *node* after *start* interactive nodes.
+
+    The subtree is shared when neither its XPaths nor its highlight indices
+    change; otherwise it is copied and renumbered.  Copies with a ``nodeId``
+    are added to *copies*.
+    """
+
+    count, first = _highlight_span(node)
+    if old_prefix == new_prefix and (not count or first == start + 1):
+        return node
+    counter = start
+    built: List[DOMElementNode] = []
+    stack = [(node, False)]
+    while stack:
+        current, expanded = stack.pop()
+        if current.tagName == "#text":
+            built.append(current)
+            continue
+        if not expanded:
+            stack.append((current, True))
+            stack.extend((child, False) for child in reversed(current.children))
+            continue
+        split = len(built) - len(current.children)
+        children = built[split:]
+        del built[split:]
+        highlight = None
+        if current.isInteractive:
+            counter += 1
+            highlight = counter
+        copy = replace(
+            current,
+            xpath=_moved_xpath(current.xpath, old_prefix, new_prefix),
+            highlightIndex=highlight,
+            children=children,
+        )
+        count = _highlight_span(current)[0]
+        copy._highlight_span = (count, counter - count + 1 if count else None)
+        if copy.nodeId is not None:
+            copies[copy.nodeId] = copy
+        built.append(copy)
+    return built[0]
+
+
+class IncrementalDOMSnapshot:
+    """Keep a page's :class:`DOMElementNode` tree current between steps.
+
+    The first :meth:`snapshot` serialises the whole page and leaves a
+    MutationObserver behind; later calls fetch only the subtrees that changed
+    since and patch the previous tree, so a step that opens one dropdown
+    costs about as much as the dropdown.  The page falls back to a full
+    snapshot whenever a change cannot be localised.  Use one instance per
+    page; :meth:`snapshot_async` is the same for async Playwright pages.
+
+    Set ``DOM_SNAPSHOT_INCREMENTAL=0`` (or pass *incremental*) to take a
+    plain full snapshot on every call instead.
+    """
+
+    def __init__(
+        self, max_dirty: int = _MAX_DIRTY_ROOTS, *, incremental: Optional[bool] = None
+    ) -> None:
+        if incremental is None:
+            incremental = env_flag("DOM_SNAPSHOT_INCREMENTAL", default=True)
+        self.incremental = incremental
+        self.max_dirty = max_dirty
+        self.root: Optional[DOMElementNode] = None
+        self.generation: Optional[int] = None
+        self.last_stats: Dict[str, Any] = {}
+
+    def snapshot(self, page, *, full: bool = False) -> Optional[DOMElementNode]:
+        if not self.incremental:
+            tree = page.evaluate(DOM_SNAPSHOT_SCRIPT)
+            return self._update(None, {"full": True, "tree": tree})
+        base = None if full else self.root
+        try:
+            result = page.evaluate(DOM_INCREMENTAL_SCRIPT, self._options(base))
+            return self._update(base, result)
+        except KeyError:
+            # The page's notion of the previous tree drifted from ours.
+            return self.snapshot(page, full=True)
+
+    async def snapshot_async(self, page, *, full: bool = False) -> Optional[DOMElementNode]:
+        if not self.incremental:
+            tree = await page.evaluate(DOM_SNAPSHOT_SCRIPT)
+            return self._update(None, {"full": True, "tree": tree})
+        base = None if full else self.root
+        try:
+            result = await page.evaluate(DOM_INCREMENTAL_SCRIPT, self._options(base))
+            return self._update(base, result)
+        except KeyError:
+            return await self.snapshot_async(page, full=True)
+
+    def _options(self, base: Optional[DOMElementNode]) -> Dict[str, Any]:
+        generation = None if base is None else self.generation
+        return {"generation": generation, "maxDirty": self.max_dirty}
+
+    def _update(
+        self, base: Optional[DOMElementNode], result: Dict[str, Any]
+    ) -> Optional[DOMElementNode]:
+        # Patches apply to *base*, the tree the request was made against; a
+        # concurrent call may have replaced self.root in the meantime.
+        if result.get("full"):
+            root = DOMElementNode.from_json(result.get("tree"))
+        elif base is None:
+            raise KeyError("patches without a previous tree")
+        else:
+            root = base.apply_patches(result.get("patches", []))
+        self.root = root
+        self.generation = result.get("generation")
+        self.last_stats = {"full": bool(result.get("full")), **(result.get("stats") or {})}
+        return root
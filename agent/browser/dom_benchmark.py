@@ -0,0 +1,238 @@
+"""Time :data:`DOM_SNAPSHOT_SCRIPT` against saved fixture pages.
+
+Each ``*.html`` file in the fixture directory is loaded into Chromium, its
+body optionally repeated ``--scale`` times to reach realistic node counts, and
+the snapshot script evaluated ``--repeat`` times.  With ``--baseline-rev`` the
+script from that git revision is timed on the same page and both snapshots are
+compared, so a rewrite can be checked for speed and for identical output::
+
+    python -m agent.browser.dom_benchmark --scale 40 --baseline-rev HEAD~1
+
+``--incremental`` also times :class:`IncrementalDOMSnapshot` after a small
+change to the page, which should cost far less than a full snapshot.
+"""
+
+from __future__ import annotations
+
+import argparse
+import ast
+import json
+import subprocess
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from .dom import DOM_SNAPSHOT_SCRIPT, DOMElementNode, IncrementalDOMSnapshot
+
+_ROOT = Path(__file__).resolve().parents[2]
+FIXTURE_DIR = _ROOT / "tests" / "fixtures" / "dom"
+VIEWPORT = {"width": 1280, "height": 800}
+
+_SCALE_SCRIPT = """
+(factor) => {
+  const html = document.body.innerHTML;
+  document.body.innerHTML = html.repeat(factor);
+  return document.getElementsByTagName('*').length;
+}
+"""
+
+# Appends one visible item next to the first list item or link on the page.
+_SMALL_CHANGE_SCRIPT = """
+() => {
+  const anchor = document.querySelector('li, a') || document.body.firstElementChild;
+  const item = document.createElement(anchor.tagName);
+  item.textContent = 'benchmark ' + Date.now();
+  anchor.parentElement.appendChild(item);
+}
+"""
+
+
+def extract_snapshot_script(source: str) -> str:
+    """Return the ``DOM_SNAPSHOT_SCRIPT`` string defined in *source*.
+
+    The script may be a literal or a concatenation of earlier module-level
+    string constants; the module itself is never imported.
+    """
+
+    strings: Dict[str, str] = {}
+
+    def evaluate(node: ast.expr) -> str:
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return node.value
+        if isinstance(node, ast.Name) and node.id in strings:
+            return strings[node.id]
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+            return evaluate(node.left) + evaluate(node.right)
+        raise ValueError("not a string expression")
+
+    for node in ast.parse(source).body:
+        if not isinstance(node, ast.Assign):
+            continue
+        try:
+            value = evaluate(node.value)
+        except ValueError:
+            continue
+        for target in node.targets:
+            if isinstance(target, ast.Name):
+                strings[target.id] = value
+    if "DOM_SNAPSHOT_SCRIPT" not in strings:
+        raise ValueError("DOM_SNAPSHOT_SCRIPT not found")
+    return strings["DOM_SNAPSHOT_SCRIPT"]
+
+
+def script_at_revision(rev: str) -> str:
+    source = subprocess.run(
+        ["git", "show", f"{rev}:agent/browser/dom.py"],
+        cwd=_ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return extract_snapshot_script(source)
+
+
+def load_fixtures(directory: Path = FIXTURE_DIR) -> Dict[str, str]:
+    return {path.name: path.read_text(encoding="utf-8") for path in sorted(directory.glob("*.html"))}
+
+
+def _time_script(page, script: str, repeat: int) -> tuple[float, Any]:
+    best = float("inf")
+    result = None
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        result = page.evaluate(script)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def benchmark_page(
+    page,
+    html: str,
+    *,
+    scale: int = 1,
+    repeat: int = 3,
+    baseline: str | None = None,
+    incremental: bool = False,
+) -> Dict[str, Any]:
+    page.set_content(html)
+    nodes = page.evaluate(_SCALE_SCRIPT, max(1, scale))
+    seconds, snapshot = _time_script(page, DOM_SNAPSHOT_SCRIPT, repeat)
+    row: Dict[str, Any] = {"nodes": nodes, "seconds": seconds}
+    if baseline is not None:
+        baseline_seconds, baseline_snapshot = _time_script(page, baseline, repeat)
+        row["baseline_seconds"] = baseline_seconds
+        row["identical"] = snapshot == baseline_snapshot
+    if incremental:
+        row.update(_time_incremental(page, repeat))
+    return row
+
+
+def _time_incremental(page, repeat: int) -> Dict[str, Any]:
+    snapshots = IncrementalDOMSnapshot(incremental=True)
+    snapshots.snapshot(page)
+    best = float("inf")
+    matches = True
+    full = False
+    for _ in range(max(1, repeat)):
+        page.evaluate(_SMALL_CHANGE_SCRIPT)
+        started = time.perf_counter()
+        tree = snapshots.snapshot(page)
+        best = min(best, time.perf_counter() - started)
+        full = full or snapshots.last_stats.get("full", True)
+        # Every step is checked, not just the last, since a bad patch
+        # carries over into all later ones.
+        expected = DOMElementNode.from_page(page)
+        matches = matches and tree is not None and expected is not None
+        matches = matches and tree.to_text() == expected.to_text()
+    return {
+        "incremental_seconds": best,
+        "incremental_full": full,
+        "incremental_matches": matches,
+    }
+
+
+def run(
+    page,
+    fixtures: Dict[str, str],
+    *,
+    scale: int = 1,
+    repeat: int = 3,
+    baseline: str | None = None,
+    incremental: bool = False,
+) -> List[Dict[str, Any]]:
+    rows = []
+    for name, html in fixtures.items():
+        row = benchmark_page(
+            page, html, scale=scale, repeat=repeat, baseline=baseline, incremental=incremental
+        )
+        rows.append({"fixture": name, **row})
+    return rows
+
+
+def _format_row(row: Dict[str, Any]) -> str:
+    line = f"{row['fixture']}: {row['nodes']} nodes, {row['seconds'] * 1000:.1f} ms"
+    if "baseline_seconds" in row:
+        speedup = row["baseline_seconds"] / row["seconds"] if row["seconds"] else float("inf")
+        line += (
+            f" (baseline {row['baseline_seconds'] * 1000:.1f} ms, x{speedup:.1f},"
+            f" {'identical' if row['identical'] else 'DIFFERENT'} output)"
+        )
+    if "incremental_seconds" in row:
+        line += (
+            f"; incremental {row['incremental_seconds'] * 1000:.1f} ms"
+            f"{' (fell back to full)' if row['incremental_full'] else ''},"
+            f" {'matches' if row['incremental_matches'] else 'DIFFERS FROM'} full snapshot"
+        )
+    return line
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the in-page DOM snapshot script")
+    parser.add_argument("--fixtures", type=Path, default=FIXTURE_DIR, help="Directory of *.html pages")
+    parser.add_argument("--scale", type=int, default=1, help="Repeat each page body this many times")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per page; the fastest is reported")
+    parser.add_argument("--baseline-rev", help="Git revision whose script is timed for comparison")
+    parser.add_argument(
+        "--incremental", action="store_true", help="Also time incremental snapshots after a small change"
+    )
+    parser.add_argument("--cdp", help="Connect to an existing Chromium over CDP instead of launching one")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    from playwright.sync_api import sync_playwright
+
+    fixtures = load_fixtures(args.fixtures)
+    if not fixtures:
+        parser.error(f"no *.html fixtures in {args.fixtures}")
+    baseline = script_at_revision(args.baseline_rev) if args.baseline_rev else None
+
+    with sync_playwright() as pw:
+        if args.cdp:
+            browser = pw.chromium.connect_over_cdp(args.cdp)
+        else:
+            browser = pw.chromium.launch()
+        try:
+            page = browser.new_page(viewport=VIEWPORT)
+            rows = run(
+                page,
+                fixtures,
+                scale=args.scale,
+                repeat=args.repeat,
+                baseline=baseline,
+                incremental=args.incremental,
+            )
+            page.close()
+        finally:
+            browser.close()
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        for row in rows:
+            print(_format_row(row))
+    ok = all(row.get("identical", True) and row.get("incremental_matches", True) for row in rows)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,518 @@
+"""Array-backed DOM snapshot tree.
+
+:class:`DOMElementNode` spends a Python object, a ``__dict__``, an attribute
+dict, a children list and a full XPath string on every node.
+:class:`CompactDOMTree` keeps the same information as parallel ``array``
+columns indexed by node number in document order:
+
+* ``tag``, ``text`` and ``xpath`` hold ids into one interned string table,
+  so repeated tag names, class values and XPath steps are stored once.
+  ``xpath`` keeps only the step below the parent's XPath unless the
+  ``_XPATH_ABSOLUTE`` flag is set.
+* ``parent``, ``first_child`` and ``next_sibling`` link the tree (-1 when
+  absent).
+* ``attr_offset`` / ``attr_pairs`` store each node's attributes as
+  ``(key id, value id)`` pairs in one flat column.
+* ``flags`` packs the boolean fields; ``highlight`` and ``node_id`` use -1
+  for ``None``.
+
+:class:`CompactNode` is a two-slot view exposing the ``DOMElementNode``
+attributes, so code that walks ``children`` and reads ``highlightIndex``
+works unchanged.  Trees are built iteratively straight from the snapshot
+JSON, without intermediate node objects, and render the same text as
+:meth:`DOMElementNode.to_text`.
+"""
+
+from __future__ import annotations
+
+from array import array
+from typing import Any, Dict, Iterator, List, Optional
+
+from .dom import DOM_SNAPSHOT_SCRIPT, DOMElementNode
+from .dom_diff import added_elements, diff_trees, own_hash, render_diff
+from .dom_render import budget_chars, render_lines, render_text
+
+_VISIBLE = 1
+_INTERACTIVE = 2
+_TOP = 4
+_EXCLUDED = 8
+_NEW = 16
+_XPATH_ABSOLUTE = 32
+
+_TEXT_TAG = "#text"
+_INT_COLUMNS = (
+    "tag", "text", "xpath", "parent", "first_child", "next_sibling",
+    "highlight", "node_id", "attr_offset", "attr_pairs",
+)
+
+
+class CompactDOMTree:
+    """A snapshot tree stored as a struct of arrays; see the module docstring."""
+
+    def __init__(self) -> None:
+        # Columns are lists while building and arrays once _finish() packs
+        # them; appending to a list is about twice as fast.
+        self.strings: List[str] = []
+        self.tag: Any = []
+        self.text: Any = []
+        self.xpath: Any = []
+        self.parent: Any = []
+        self.first_child: Any = []
+        self.next_sibling: Any = []
+        self.flags: Any = []
+        self.highlight: Any = []
+        self.node_id: Any = []
+        self.attr_offset: Any = [0]
+        self.attr_pairs: Any = []
+        self.annotations: Dict[int, List[str]] = {}
+        self.scroll_info: Optional[Dict[str, int]] = None
+        self._merkle: Optional[List[tuple[int, int]]] = None
+        # Build-time state, released by _finish().
+        self._string_ids: Optional[Dict[str, int]] = {}
+        self._last_child: Optional[List[int]] = []
+        self._text_tag = self._intern(_TEXT_TAG)
+
+    # -- construction -----------------------------------------------------
+
+    def _intern(self, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        ids = self._string_ids
+        return ids.setdefault(value, len(ids))
+
+    def _add(
+        self,
+        parent: int,
+        parent_xpath: str,
+        tag_name: str,
+        attributes: Dict[str, str],
+        text: Optional[str],
+        xpath: str,
+        flags: int,
+        highlight: Optional[int],
+        annotations: Optional[List[str]],
+        node_id: Optional[int],
+    ) -> int:
+        ids = self._string_ids
+        index = len(self.tag)
+        self.tag.append(ids.setdefault(tag_name, len(ids)))
+        self.text.append(-1 if text is None else ids.setdefault(text, len(ids)))
+        if not xpath:
+            step = -1
+        elif parent_xpath and xpath.startswith(parent_xpath + "/"):
+            step = ids.setdefault(xpath[len(parent_xpath) + 1:], len(ids))
+        else:
+            step = ids.setdefault(xpath, len(ids))
+            flags |= _XPATH_ABSOLUTE
+        self.xpath.append(step)
+        self.parent.append(parent)
+        self.first_child.append(-1)
+        self.next_sibling.append(-1)
+        self.flags.append(flags)
+        self.highlight.append(-1 if highlight is None else highlight)
+        self.node_id.append(-1 if node_id is None else node_id)
+        if attributes:
+            pairs = self.attr_pairs
+            for key, value in attributes.items():
+                pairs.append(ids.setdefault(key, len(ids)))
+                pairs.append(ids.setdefault(value, len(ids)))
+        self.attr_offset.append(len(self.attr_pairs))
+        if annotations:
+            self.annotations[index] = list(annotations)
+        last_child = self._last_child
+        last_child.append(-1)
+        if parent != -1:
+            previous = last_child[parent]
+            if previous == -1:
+                self.first_child[parent] = index
+            else:
+                self.next_sibling[previous] = index
+            last_child[parent] = index
+        return index
+
+    def _finish(self) -> "CompactDOMTree":
+        for name in _INT_COLUMNS:
+            setattr(self, name, array("i", getattr(self, name)))
+        self.flags = array("B", self.flags)
+        # Dicts keep insertion order, so the keys are the table by id.
+        self.strings = list(self._string_ids)
+        self._string_ids = None
+        self._last_child = None
+        return self
+
+    @classmethod
+    def from_json(cls, data: Optional[dict]) -> Optional["CompactDOMTree"]:
+        """Build a tree from the output of :data:`DOM_SNAPSHOT_SCRIPT`.
+
+        This is the hot path, so :meth:`_add` is inlined with its column
+        appends bound to locals.
+        """
+
+        if data is None:
+            return None
+        tree = cls()
+        ids = tree._string_ids
+        intern = ids.setdefault
+        last_child = tree._last_child
+        first_child = tree.first_child
+        next_sibling = tree.next_sibling
+        annotations = tree.annotations
+        pairs = tree.attr_pairs
+        add_tag = tree.tag.append
+        add_text = tree.text.append
+        add_xpath = tree.xpath.append
+        add_parent = tree.parent.append
+        add_first = first_child.append
+        add_next = next_sibling.append
+        add_flags = tree.flags.append
+        add_highlight = tree.highlight.append
+        add_node_id = tree.node_id.append
+        add_offset = tree.attr_offset.append
+        add_pair = pairs.append
+        add_last = last_child.append
+        text_tag = tree._text_tag
+
+        index = -1
+        stack: List[tuple[dict, int, str]] = [(data, -1, "")]
+        pop = stack.pop
+        push = stack.append
+        while stack:
+            item, parent, parent_xpath = pop()
+            index += 1
+            get = item.get
+            text = get("text")
+            add_text(-1 if text is None else intern(text, len(ids)))
+            if get("nodeType") == "text":
+                add_tag(text_tag)
+                add_xpath(-1)
+                add_flags(0)
+                add_highlight(-1)
+                add_node_id(-1)
+                children = ()
+                xpath = ""
+            else:
+                add_tag(intern(get("tagName", ""), len(ids)))
+                xpath = get("xpath", "")
+                flags = (
+                    (_VISIBLE if get("isVisible") else 0)
+                    | (_INTERACTIVE if get("isInteractive") else 0)
+                    | (_TOP if get("isTopElement") else 0)
+                    | (_EXCLUDED if get("excludedByParent") else 0)
+                    | (_NEW if get("isNewElement") else 0)
+                )
+                if not xpath:
+                    add_xpath(-1)
+                elif parent_xpath and xpath.startswith(parent_xpath + "/"):
+                    add_xpath(intern(xpath[len(parent_xpath) + 1:], len(ids)))
+                else:
+                    add_xpath(intern(xpath, len(ids)))
+                    flags |= _XPATH_ABSOLUTE
+                add_flags(flags)
+                highlight = get("highlightIndex")
+                add_highlight(-1 if highlight is None else highlight)
+                node_id = get("nodeId")
+                add_node_id(-1 if node_id is None else node_id)
+                attributes = get("attributes")
+                if attributes:
+                    for key, value in attributes.items():
+                        add_pair(intern(key, len(ids)))
+                        add_pair(intern(value, len(ids)))
+                notes = get("annotations")
+                if notes:
+                    annotations[index] = list(notes)
+                children = get("children") or ()
+            add_offset(len(pairs))
+            add_parent(parent)
+            add_first(-1)
+            add_next(-1)
+            add_last(-1)
+            if parent != -1:
+                previous = last_child[parent]
+                if previous == -1:
+                    first_child[parent] = index
+                else:
+                    next_sibling[previous] = index
+                last_child[parent] = index
+            for child in reversed(children):
+                if child:
+                    push((child, index, xpath))
+        return tree._finish()
+
+    @classmethod
+    def from_node(cls, root: Optional[DOMElementNode]) -> Optional["CompactDOMTree"]:
+        """Pack an existing :class:`DOMElementNode` tree."""
+
+        if root is None:
+            return None
+        tree = cls()
+        stack: List[tuple[DOMElementNode, int, str]] = [(root, -1, "")]
+        while stack:
+            node, parent, parent_xpath = stack.pop()
+            flags = (
+                (_VISIBLE if node.isVisible else 0)
+                | (_INTERACTIVE if node.isInteractive else 0)
+                | (_TOP if node.isTopElement else 0)
+                | (_EXCLUDED if node.excludedByParent else 0)
+                | (_NEW if node.isNewElement else 0)
+            )
+            index = tree._add(
+                parent,
+                parent_xpath,
+                node.tagName,
+                node.attributes,
+                node.text,
+                node.xpath,
+                flags,
+                node.highlightIndex,
+                node.annotations,
+                node.nodeId,
+            )
+            stack.extend((child, index, node.xpath) for child in reversed(node.children))
+        tree.scroll_info = getattr(root, "_scroll_info", None)
+        return tree._finish()
+
+    @classmethod
+    def from_page(cls, page) -> Optional["CompactDOMTree"]:
+        return cls.from_json(page.evaluate(DOM_SNAPSHOT_SCRIPT))
+
+    def to_node(self) -> DOMElementNode:
+        """Expand back into a :class:`DOMElementNode` tree."""
+
+        xpaths = self.xpaths()
+        nodes: List[DOMElementNode] = []
+        for index in range(len(self)):
+            flags = self.flags[index]
+            if self.tag[index] == self._text_tag:
+                node = DOMElementNode(tagName=_TEXT_TAG, text=self._string(self.text[index]))
+            else:
+                node = DOMElementNode(
+                    tagName=self.strings[self.tag[index]],
+                    attributes=self.attributes_of(index),
+                    text=self._string(self.text[index]),
+                    xpath=xpaths[index],
+                    isVisible=bool(flags & _VISIBLE),
+                    isInteractive=bool(flags & _INTERACTIVE),
+                    isTopElement=bool(flags & _TOP),
+                    highlightIndex=self._optional(self.highlight[index]),
+                    annotations=self.annotations.get(index),
+                    excludedByParent=bool(flags & _EXCLUDED),
+                    isNewElement=bool(flags & _NEW),
+                    nodeId=self._optional(self.node_id[index]),
+                )
+            nodes.append(node)
+            if self.parent[index] != -1:
+                nodes[self.parent[index]].children.append(node)
+        if self.scroll_info:
+            nodes[0].set_scroll_info(**self.scroll_info)
+        return nodes[0]
+
+    # -- access -----------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.tag)
+
+    @property
+    def root(self) -> "CompactNode":
+        return CompactNode(self, 0)
+
+    def node(self, index: int) -> "CompactNode":
+        return CompactNode(self, index)
+
+    def _string(self, string_id: int) -> Optional[str]:
+        return None if string_id == -1 else self.strings[string_id]
+
+    @staticmethod
+    def _optional(value: int) -> Optional[int]:
+        return None if value == -1 else value
+
+    def children_of(self, index: int) -> Iterator[int]:
+        child = self.first_child[index]
+        while child != -1:
+            yield child
+            child = self.next_sibling[child]
+
+    def attribute_items(self, index: int) -> Iterator[tuple[str, str]]:
+        strings = self.strings
+        pairs = self.attr_pairs
+        for offset in range(self.attr_offset[index], self.attr_offset[index + 1], 2):
+            yield strings[pairs[offset]], strings[pairs[offset + 1]]
+
+    def attributes_of(self, index: int) -> Dict[str, str]:
+        return dict(self.attribute_items(index))
+
+    def xpath_of(self, index: int) -> str:
+        steps = []
+        while True:
+            step = self.xpath[index]
+            if step == -1:
+                return ""
+            steps.append(self.strings[step])
+            if self.flags[index] & _XPATH_ABSOLUTE:
+                break
+            index = self.parent[index]
+        return "/".join(reversed(steps))
+
+    def xpaths(self) -> List[str]:
+        """XPaths of every node, in node order; ``""`` for text nodes."""
+
+        result: List[str] = []
+        for index in range(len(self)):
+            step = self.xpath[index]
+            if step == -1:
+                result.append("")
+            elif self.flags[index] & _XPATH_ABSOLUTE:
+                result.append(self.strings[step])
+            else:
+                result.append(f"{result[self.parent[index]]}/{self.strings[step]}")
+        return result
+
+    def interactive(self) -> List["CompactNode"]:
+        """Nodes with a highlight index, ordered by that index."""
+
+        indices = [index for index, value in enumerate(self.highlight) if value != -1]
+        indices.sort(key=self.highlight.__getitem__)
+        return [CompactNode(self, index) for index in indices]
+
+    # -- rendering --------------------------------------------------------
+
+    def render_lines(
+        self, index: int = 0, depth: int = 0, max_lines: int | None = None, lines: List[str] | None = None
+    ) -> List[str]:
+        """:func:`~agent.browser.dom_render.render_lines` of the subtree at *index*."""
+
+        return render_lines(CompactNode(self, index), depth, max_lines, lines)
+
+    def to_lines(self, max_lines: int | None = None) -> List[str]:
+        return self.render_lines(max_lines=max_lines)
+
+    def merkle_hashes(self) -> List[tuple[int, int]]:
+        """``(own, subtree)`` hashes of every node, as :mod:`.dom_diff` computes them."""
+
+        if self._merkle is None:
+            hashes: List[Any] = [None] * len(self)
+            for index in range(len(self) - 1, -1, -1):
+                own = own_hash(CompactNode(self, index))
+                children = (hashes[child][1] for child in self.children_of(index))
+                hashes[index] = (own, hash((own, *children)))
+            self._merkle = hashes
+        return self._merkle
+
+    def to_text(
+        self,
+        max_lines: int | None = None,
+        previous_dom: "CompactDOMTree | DOMElementNode | None" = None,
+        *,
+        max_chars: int | None = None,
+        max_tokens: int | None = None,
+        changes_only: bool = False,
+    ) -> str:
+        """Same output as :meth:`DOMElementNode.to_text`."""
+
+        new = None
+        if previous_dom:
+            previous = previous_dom.root if isinstance(previous_dom, CompactDOMTree) else previous_dom
+            diff = diff_trees(previous, self.root)
+            new = added_elements(diff)
+            if changes_only:
+                return "\n".join(render_diff(diff, max_lines, budget_chars(max_chars, max_tokens), new))
+        return render_text(
+            self.root,
+            scroll_info=self.scroll_info,
+            max_lines=max_lines,
+            max_chars=budget_chars(max_chars, max_tokens),
+            new=new,
+        )
+
+    def set_scroll_info(self, pixels_above: int = 0, pixels_below: int = 0) -> None:
+        self.scroll_info = {'pixels_above': pixels_above, 'pixels_below': pixels_below}
+
+
+class CompactNode:
+    """Read-only ``DOMElementNode``-like view of one node of a :class:`CompactDOMTree`."""
+
+    __slots__ = ("tree", "index")
+
+    def __init__(self, tree: CompactDOMTree, index: int) -> None:
+        self.tree = tree
+        self.index = index
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, CompactNode) and other.tree is self.tree and other.index == self.index
+
+    def __hash__(self) -> int:
+        return hash((id(self.tree), self.index))
+
+    def __repr__(self) -> str:
+        return f"CompactNode({self.tagName!r}, index={self.index})"
+
+    @property
+    def tagName(self) -> str:
+        return self.tree.strings[self.tree.tag[self.index]]
+
+    @property
+    def attributes(self) -> Dict[str, str]:
+        return self.tree.attributes_of(self.index)
+
+    @property
+    def text(self) -> Optional[str]:
+        return self.tree._string(self.tree.text[self.index])
+
+    @property
+    def xpath(self) -> str:
+        return self.tree.xpath_of(self.index)
+
+    @property
+    def isVisible(self) -> bool:
+        return bool(self.tree.flags[self.index] & _VISIBLE)
+
+    @property
+    def isInteractive(self) -> bool:
+        return bool(self.tree.flags[self.index] & _INTERACTIVE)
+
+    @property
+    def isTopElement(self) -> bool:
+        return bool(self.tree.flags[self.index] & _TOP)
+
+    @property
+    def excludedByParent(self) -> bool:
+        return bool(self.tree.flags[self.index] & _EXCLUDED)
+
+    @property
+    def isNewElement(self) -> bool:
+        return bool(self.tree.flags[self.index] & _NEW)
+
+    @property
+    def _merkle(self) -> tuple[int, int]:
+        return self.tree.merkle_hashes()[self.index]
+
+    @property
+    def highlightIndex(self) -> Optional[int]:
+        return self.tree._optional(self.tree.highlight[self.index])
+
+    @property
+    def nodeId(self) -> Optional[int]:
+        return self.tree._optional(self.tree.node_id[self.index])
+
+    @property
+    def annotations(self) -> Optional[List[str]]:
+        return self.tree.annotations.get(self.index)
+
+    @property
+    def parent(self) -> Optional["CompactNode"]:
+        parent = self.tree.parent[self.index]
+        return None if parent == -1 else CompactNode(self.tree, parent)
+
+    @property
+    def children(self) -> List["CompactNode"]:
+        return [CompactNode(self.tree, child) for child in self.tree.children_of(self.index)]
+
+    def to_lines(self, depth: int = 0, max_lines: int | None = None, _lines=None) -> List[str]:
+        return self.tree.render_lines(self.index, depth, max_lines, _lines)
+
+    def to_text(self, max_lines: int | None = None) -> str:
+        if self.index == 0:
+            return self.tree.to_text(max_lines=max_lines)
+        return "\n".join(self.to_lines(max_lines=max_lines))
+
+
+__all__ = ["CompactDOMTree", "CompactNode"]
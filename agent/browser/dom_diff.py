@@ -0,0 +1,372 @@
+"""Structural diff of two snapshot trees using Merkle-style subtree hashes.
+
+Every node gets an *own* hash (tag, text, attributes and the flags that
+change its rendering) and a *subtree* hash combining its own hash with its
+children's subtree hashes.  Hashes are memoised on the node, so subtrees
+shared between consecutive snapshots (see
+:meth:`~agent.browser.dom.DOMElementNode.apply_patches`) are hashed once.
+
+:func:`diff_trees` walks both trees from the root and stops wherever the
+subtree hashes agree, so its cost follows the size of the change rather
+than the page.  Children are paired first by identical subtree, then by
+``nodeId`` or tag and ``id``/``name`` attribute.  It reports:
+
+* ``added`` / ``removed`` – subtrees present in only one tree;
+* ``changed`` – paired elements whose own content (or text) differs;
+* ``moved`` – identical subtrees that changed position, within their
+  parent or to another one.
+
+Highlight indices and XPaths are positions, not content, and are left out
+of the hashes.  Works on anything shaped like ``DOMElementNode``.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Any, Container, Dict, Iterable, List, Optional, Tuple
+
+from .dom_render import render_lines
+
+_TEXT_TAG = "#text"
+
+
+def own_hash(node: Any) -> int:
+    return hash((
+        node.tagName,
+        node.text,
+        tuple(node.attributes.items()),
+        node.isVisible,
+        node.isInteractive,
+        node.excludedByParent,
+        tuple(node.annotations or ()),
+    ))
+
+
+def node_hashes(node: Any) -> Tuple[int, int]:
+    """``(own, subtree)`` hashes of *node*, memoised as ``node._merkle``.
+
+    Nodes are treated as immutable once hashed.
+    """
+
+    cached = getattr(node, "_merkle", None)
+    if cached is not None:
+        return cached
+    stack = [(node, False)]
+    while stack:
+        current, expanded = stack.pop()
+        if getattr(current, "_merkle", None) is not None:
+            continue
+        if not expanded:
+            stack.append((current, True))
+            stack.extend((child, False) for child in current.children)
+            continue
+        own = own_hash(current)
+        current._merkle = (own, hash((own, *(child._merkle[1] for child in current.children))))
+    return node._merkle
+
+
+@dataclass
+class DOMChange:
+    kind: str  # "added", "removed", "changed" or "moved"
+    old: Any = None
+    new: Any = None
+    parent: Any = None  # Parent in the tree holding the node (old for removals)
+
+
+@dataclass
+class DOMDiff:
+    changes: List[DOMChange] = field(default_factory=list)
+    compared: int = 0  # Node pairs visited; a measure of the work done
+
+    def __bool__(self) -> bool:
+        return bool(self.changes)
+
+    def of_kind(self, kind: str) -> List[DOMChange]:
+        return [change for change in self.changes if change.kind == kind]
+
+    @property
+    def added(self) -> List[DOMChange]:
+        return self.of_kind("added")
+
+    @property
+    def removed(self) -> List[DOMChange]:
+        return self.of_kind("removed")
+
+    @property
+    def changed(self) -> List[DOMChange]:
+        return self.of_kind("changed")
+
+    @property
+    def moved(self) -> List[DOMChange]:
+        return self.of_kind("moved")
+
+    def counts(self) -> Dict[str, int]:
+        counts = {"added": 0, "removed": 0, "changed": 0, "moved": 0}
+        for change in self.changes:
+            counts[change.kind] += 1
+        return counts
+
+
+def _key(node: Any) -> tuple:
+    node_id = getattr(node, "nodeId", None)
+    if node_id is not None:
+        return ("nodeId", node_id)
+    attributes = node.attributes
+    return (node.tagName, attributes.get("id") or attributes.get("name") or "")
+
+
+def _stable(old_positions: List[int]) -> set:
+    """Indices into *old_positions* forming its longest increasing run."""
+
+    tails: List[int] = []
+    tail_at: List[int] = []
+    previous = [-1] * len(old_positions)
+    for index, value in enumerate(old_positions):
+        slot = bisect_left(tails, value)
+        if slot == len(tails):
+            tails.append(value)
+            tail_at.append(index)
+        else:
+            tails[slot] = value
+            tail_at[slot] = index
+        previous[index] = tail_at[slot - 1] if slot else -1
+    stable = set()
+    index = tail_at[-1] if tail_at else -1
+    while index != -1:
+        stable.add(index)
+        index = previous[index]
+    return stable
+
+
+def _pair_children(old: List[Any], new: List[Any]) -> Tuple[List[Tuple[int, int, bool]], List[int], List[int]]:
+    """Pair *old* and *new* children as ``(old index, new index, identical)``."""
+
+    by_hash: Dict[int, deque] = defaultdict(deque)
+    for index, child in enumerate(old):
+        by_hash[node_hashes(child)[1]].append(index)
+    pairs: List[Tuple[int, int, bool]] = []
+    paired_old = set()
+    unpaired_new = []
+    for index, child in enumerate(new):
+        candidates = by_hash.get(node_hashes(child)[1])
+        if candidates:
+            old_index = candidates.popleft()
+            pairs.append((old_index, index, True))
+            paired_old.add(old_index)
+        else:
+            unpaired_new.append(index)
+
+    by_key: Dict[tuple, deque] = defaultdict(deque)
+    for index, child in enumerate(old):
+        if index not in paired_old:
+            by_key[_key(child)].append(index)
+    added = []
+    for index in unpaired_new:
+        candidates = by_key.get(_key(new[index]))
+        if candidates:
+            old_index = candidates.popleft()
+            pairs.append((old_index, index, False))
+            paired_old.add(old_index)
+        else:
+            added.append(index)
+    removed = [index for index in range(len(old)) if index not in paired_old]
+    pairs.sort(key=lambda pair: pair[1])
+    return pairs, added, removed
+
+
+def diff_trees(old: Optional[Any], new: Optional[Any]) -> DOMDiff:
+    """Compare two snapshot trees; see the module docstring."""
+
+    diff = DOMDiff()
+    if old is None or new is None:
+        if new is not None:
+            diff.changes.append(DOMChange("added", new=new))
+        if old is not None:
+            diff.changes.append(DOMChange("removed", old=old))
+        return diff
+
+    reported = set()
+
+    def report_changed(old_node: Any, new_node: Any) -> None:
+        # Views are hashable and may be recreated; dataclass nodes are not.
+        identity = new_node if type(new_node).__hash__ is not None else id(new_node)
+        if identity not in reported:
+            reported.add(identity)
+            diff.changes.append(DOMChange("changed", old=old_node, new=new_node))
+
+    stack: List[Tuple[Any, Any, Any, Any]] = [(old, new, None, None)]
+    while stack:
+        old_node, new_node, old_parent, new_parent = stack.pop()
+        diff.compared += 1
+        old_own, old_subtree = node_hashes(old_node)
+        new_own, new_subtree = node_hashes(new_node)
+        if old_subtree == new_subtree:
+            continue
+        if new_node.tagName == _TEXT_TAG:
+            # Text has no identity of its own; its element changed.
+            if new_parent is not None:
+                report_changed(old_parent, new_parent)
+            continue
+        if old_own != new_own or old_node.tagName != new_node.tagName:
+            report_changed(old_node, new_node)
+
+        old_children = old_node.children
+        new_children = new_node.children
+        pairs, added, removed = _pair_children(old_children, new_children)
+        stable = _stable([old_index for old_index, _, _ in pairs])
+        for position, (old_index, new_index, identical) in enumerate(pairs):
+            if position in stable:
+                continue
+            moved = new_children[new_index]
+            if moved.tagName == _TEXT_TAG:
+                report_changed(old_node, new_node)
+            else:
+                diff.changes.append(
+                    DOMChange("moved", old=old_children[old_index], new=moved, parent=new_node)
+                )
+        for index in added:
+            diff.changes.append(DOMChange("added", new=new_children[index], parent=new_node))
+        for index in removed:
+            diff.changes.append(DOMChange("removed", old=old_children[index], parent=old_node))
+        for old_index, new_index, identical in reversed(pairs):
+            if not identical:
+                stack.append((old_children[old_index], new_children[new_index], old_node, new_node))
+
+    # Whole subtrees that left one parent and arrived under another.
+    removed_by_hash: Dict[int, deque] = defaultdict(deque)
+    for change in diff.changes:
+        if change.kind == "removed" and change.old.tagName != _TEXT_TAG:
+            removed_by_hash[node_hashes(change.old)[1]].append(change)
+    dropped = set()
+    for change in diff.changes:
+        if change.kind != "added" or change.new.tagName == _TEXT_TAG:
+            continue
+        candidates = removed_by_hash.get(node_hashes(change.new)[1])
+        if candidates:
+            origin = candidates.popleft()
+            dropped.add(id(origin))
+            change.kind = "moved"
+            change.old = origin.old
+    diff.changes = [change for change in diff.changes if id(change) not in dropped]
+    return diff
+
+
+class NodeSet:
+    """A set of nodes by identity.
+
+    ``DOMElementNode`` compares by value and is unhashable, so its nodes are
+    keyed by ``id()``; hashable views such as ``CompactNode`` by themselves.
+    """
+
+    def __init__(self, nodes: Iterable[Any] = ()) -> None:
+        self._keys = set()
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def _key(node: Any) -> Any:
+        return node if type(node).__hash__ is not None else id(node)
+
+    def add(self, node: Any) -> None:
+        self._keys.add(self._key(node))
+
+    def __contains__(self, node: Any) -> bool:
+        return self._key(node) in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+def added_elements(diff: DOMDiff) -> NodeSet:
+    """Every element of the added subtrees, for rendering with a ``*`` marker.
+
+    Nodes are not flagged in place: incremental snapshots share unchanged
+    nodes between steps, so a flag would outlive the step that added them.
+    """
+
+    added = NodeSet()
+    stack = [change.new for change in diff.changes if change.kind == "added"]
+    while stack:
+        node = stack.pop()
+        if node.tagName != _TEXT_TAG:
+            added.add(node)
+        stack.extend(node.children)
+    return added
+
+
+def _own_lines(node: Any, depth: int, new: Optional[Container] = None) -> List[str]:
+    """The node's own line, followed by its direct text unless that is on it."""
+
+    lines = render_lines(node, depth, max_lines=1, new=new)
+    children = node.children
+    if len(children) > 1 or (children and children[0].tagName != _TEXT_TAG):
+        indent = "  " * (depth + 1)
+        lines.extend(
+            f"{indent}{child.text.strip()}"
+            for child in children
+            if child.tagName == _TEXT_TAG and child.text and child.text.strip()
+        )
+    return lines
+
+
+def render_diff(
+    diff: DOMDiff,
+    max_lines: int | None = None,
+    max_chars: int | None = None,
+    new: Optional[Container] = None,
+) -> List[str]:
+    """Render *diff* as a compact "what changed since the last step" view.
+
+    Added subtrees are shown in full; other changes as the node's own line
+    under a header giving its XPath.  Elements in *new* are marked as new.
+    """
+
+    if not diff:
+        return ["No changes since the previous step."]
+    counts = diff.counts()
+    lines = [
+        "Changes since the previous step: "
+        + ", ".join(f"{count} {kind}" for kind, count in counts.items())
+    ]
+    for change in diff.changes:
+        node = change.old if change.kind == "removed" else change.new
+        if node.tagName == _TEXT_TAG:
+            sign = "+" if change.kind == "added" else "-"
+            where = change.parent.xpath if change.parent is not None else ""
+            lines.append(f"{sign} text in {where}: {(node.text or '').strip()}")
+            continue
+        if change.kind == "added":
+            lines.append(f"+ {node.xpath}")
+            lines.extend(render_lines(node, 1, new=new))
+        elif change.kind == "removed":
+            lines.append(f"- {node.xpath}")
+            lines.extend(render_lines(node, 1, max_lines=1))
+        elif change.kind == "changed":
+            lines.append(f"~ {node.xpath}")
+            lines.extend(_own_lines(node, 1, new))
+        else:
+            lines.append(f"> {change.old.xpath} -> {node.xpath}")
+            lines.extend(render_lines(node, 1, max_lines=1, new=new))
+    lines = lines[:max_lines]
+    if max_chars is not None:
+        used = -1
+        for count, line in enumerate(lines):
+            used += len(line) + 1
+            if used > max_chars:
+                lines = lines[:count]
+                break
+    return lines
+
+
+__all__ = [
+    "DOMChange",
+    "DOMDiff",
+    "NodeSet",
+    "added_elements",
+    "diff_trees",
+    "node_hashes",
+    "own_hash",
+    "render_diff",
+]
@@ -0,0 +1,349 @@
+"""Render snapshot trees as the indented text the model reads.
+
+Works on anything shaped like :class:`~agent.browser.dom.DOMElementNode`
+(including :class:`~agent.browser.dom_compact.CompactNode` views) and never
+recurses, so deeply nested pages cannot hit the recursion limit.
+
+:func:`render_lines` produces the plain rendering.  :func:`render_budgeted`
+fits it into a character budget, spending it in priority order:
+
+1. interactive elements, by highlight index, with their ancestors;
+2. text lines, nearest to a kept interactive element first;
+3. one summary line per run of omitted siblings, largest runs first.
+
+Token budgets are converted at :data:`CHARS_PER_TOKEN`.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Container, Iterable, Iterator, List, Optional
+
+# Rough average for mixed HTML/Japanese text; only used to turn a token
+# budget into characters.
+CHARS_PER_TOKEN = 4
+
+# Summary lines quote at most this much of the omitted text.
+_SNIPPET_CHARS = 60
+
+# Share of a budget held back from lines so omissions can still be
+# summarised; at least about one summary line, at most a quarter.
+_SUMMARY_SHARE = 0.1
+_SUMMARY_MIN = 2 * _SNIPPET_CHARS
+
+# Attributes worth showing the model, formatted as-is when short.
+_SHOWN_ATTRIBUTES = ('type', 'name', 'role', 'title', 'placeholder', 'alt', 'aria-label')
+
+
+def element_line(
+    tag_name: str,
+    attributes: Iterable[tuple[str, str]],
+    highlight_index: Optional[int],
+    is_new: bool,
+    annotations: Optional[List[str]],
+    leaf: bool,
+    text_content: str = "",
+) -> str:
+    """Format one element line of the rendering.
+
+    *leaf* elements are written self-closing followed by their text; others
+    as an opening tag with their children on the following lines.
+    """
+
+    parts = []
+
+    # Add interactive element index at the beginning
+    if highlight_index is not None:
+        prefix = "*" if is_new else ""
+        parts.append(f"[{prefix}{highlight_index}]")
+
+    # Add opening tag with attributes
+    parts.append(f"<{tag_name}")
+
+    # Add relevant attributes
+    attr_parts = []
+    for key, value in attributes:
+        if value:  # Only add attributes with values
+            # Format specific attributes nicely
+            if key in _SHOWN_ATTRIBUTES:
+                attr_parts.append(f'{key}="{value}"')
+            elif key == 'href' and value.startswith('http'):
+                # Shorten long URLs
+                if len(value) > 50:
+                    attr_parts.append(f'href="{value[:47]}..."')
+                else:
+                    attr_parts.append(f'href="{value}"')
+            elif key in ['id', 'class'] and len(value) <= 30:
+                attr_parts.append(f'{key}="{value}"')
+
+    if attr_parts:
+        parts.append(" " + " ".join(attr_parts))
+
+    if not leaf:
+        parts.append(">")
+    elif text_content:
+        parts.append(f" /> {text_content}")
+    else:
+        parts.append(" />")
+
+    # Add visual annotations
+    for annotation in annotations or ():
+        parts.append(f" |{annotation}|")
+    return "".join(parts)
+
+
+@dataclass
+class _Entry:
+    """One rendered line: its node, indentation and parent line."""
+
+    node: Any
+    depth: int
+    parent: int
+    line: str
+    text: str = ""  # Visible text the line carries
+    size: int = 1  # Lines in this subtree
+    interactive: int = 0  # Highlighted elements in this subtree
+    snippet: str = ""  # Leading text of this subtree
+    children: List[int] = field(default_factory=list)
+
+    @property
+    def cost(self) -> int:
+        return 2 * self.depth + len(self.line) + 1
+
+
+def _entries(root: Any, depth: int = 0, new: Optional[Container] = None) -> Iterator[_Entry]:
+    """Yield the lines of *root* in document order, without recursion.
+
+    Elements in *new* are marked as new, as are those with ``isNewElement``.
+    """
+
+    stack = [(root, depth, -1)]
+    position = 0
+    while stack:
+        node, level, parent = stack.pop()
+        if node.tagName == "#text":
+            text = node.text.strip() if node.text else ""
+            if text:
+                # Only add meaningful text (already filtered in JS)
+                yield _Entry(node, level, parent, text, text)
+                position += 1
+            continue
+        # Skip excluded elements
+        if node.excludedByParent:
+            continue
+        children = node.children
+        leaf = not children or (len(children) == 1 and children[0].tagName == "#text")
+        text = ""
+        if leaf and children and children[0].text:
+            text = children[0].text.strip()
+        line = element_line(
+            node.tagName,
+            node.attributes.items(),
+            node.highlightIndex,
+            node.isNewElement or (new is not None and node in new),
+            node.annotations,
+            leaf,
+            text,
+        )
+        yield _Entry(node, level, parent, line, text)
+        if not leaf:
+            stack.extend((child, level + 1, position) for child in reversed(children))
+        position += 1
+
+
+def render_lines(
+    root: Any,
+    depth: int = 0,
+    max_lines: int | None = None,
+    lines: List[str] | None = None,
+    new: Optional[Container] = None,
+) -> List[str]:
+    """Render *root*, stopping once *lines* holds *max_lines* lines."""
+
+    if lines is None:
+        lines = []
+    for entry in _entries(root, depth, new):
+        if max_lines is not None and len(lines) >= max_lines:
+            break
+        lines.append(f"{'  ' * entry.depth}{entry.line}")
+    return lines
+
+
+def budget_chars(max_chars: int | None = None, max_tokens: int | None = None) -> int | None:
+    """The tighter of a character and a token budget, in characters."""
+
+    if max_tokens is not None:
+        tokens = max_tokens * CHARS_PER_TOKEN
+        max_chars = tokens if max_chars is None else min(max_chars, tokens)
+    return max_chars
+
+
+def _summary(entries: List[_Entry], run: List[int]) -> tuple[str, int]:
+    """Summary line for omitted sibling entries *run*, and its indentation."""
+
+    count = sum(entries[i].size for i in run)
+    interactive = sum(entries[i].interactive for i in run)
+    snippet = " ".join(entries[i].snippet for i in run if entries[i].snippet)
+    parts = [f"... {count} {'line' if count == 1 else 'lines'} omitted"]
+    if interactive:
+        parts.append(f" ({interactive} interactive)")
+    if snippet:
+        if len(snippet) > _SNIPPET_CHARS:
+            snippet = snippet[:_SNIPPET_CHARS - 3] + "..."
+        parts.append(f': "{snippet}"')
+    parts.append(" ...")
+    return "".join(parts), entries[run[0]].depth
+
+
+def render_budgeted(
+    root: Any, max_chars: int, depth: int = 0, new: Optional[Container] = None
+) -> List[str]:
+    """Render *root* in at most *max_chars* characters (newlines included).
+
+    Returns exactly :func:`render_lines` when the whole tree fits.
+    """
+
+    entries = list(_entries(root, depth, new))
+    # Costs count a newline after every line; the last one does not need it.
+    if sum(entry.cost for entry in entries) <= max_chars + 1:
+        return [f"{'  ' * entry.depth}{entry.line}" for entry in entries]
+
+    # Bottom-up pass: subtree sizes, interactive counts and leading text are
+    # computed once per line instead of re-walking each subtree.
+    for position in range(len(entries) - 1, -1, -1):
+        entry = entries[position]
+        entry.children.reverse()
+        if entry.node.highlightIndex is not None:
+            entry.interactive += 1
+        if entry.text:
+            entry.snippet = (entry.text + " " + entry.snippet).strip()[:_SNIPPET_CHARS]
+        if entry.parent != -1:
+            parent = entries[entry.parent]
+            parent.children.append(position)
+            parent.size += entry.size
+            parent.interactive += entry.interactive
+            if entry.snippet:
+                parent.snippet = (entry.snippet + " " + parent.snippet).strip()[:_SNIPPET_CHARS]
+
+    kept = [False] * len(entries)
+    remaining = max_chars + 1
+
+    def keep(position: int, limit: int) -> bool:
+        """Keep *position* and its missing ancestors if they fit in *limit*."""
+
+        nonlocal remaining
+        chain = []
+        while position != -1 and not kept[position]:
+            chain.append(position)
+            position = entries[position].parent
+        cost = sum(entries[i].cost for i in chain)
+        if cost > remaining - limit:
+            return False
+        remaining -= cost
+        for i in chain:
+            kept[i] = True
+        return True
+
+    reserve = min(max_chars // 4, max(int(max_chars * _SUMMARY_SHARE), _SUMMARY_MIN))
+    interactive = [i for i, entry in enumerate(entries) if entry.node.highlightIndex is not None]
+    interactive.sort(key=lambda i: entries[i].node.highlightIndex)
+    for position in interactive:
+        keep(position, reserve)
+
+    # Distance in lines to the nearest kept interactive element.
+    distance = [len(entries)] * len(entries)
+    last = None
+    for position in range(len(entries)):
+        if kept[position] and entries[position].node.highlightIndex is not None:
+            last = position
+        if last is not None:
+            distance[position] = position - last
+    last = None
+    for position in range(len(entries) - 1, -1, -1):
+        if kept[position] and entries[position].node.highlightIndex is not None:
+            last = position
+        if last is not None:
+            distance[position] = min(distance[position], last - position)
+    texts = [i for i, entry in enumerate(entries) if entry.text and not kept[i]]
+    texts.sort(key=lambda i: (distance[i], i))
+    for position in texts:
+        keep(position, reserve)
+
+    # Runs of omitted siblings under kept parents, summarised largest first.
+    runs: List[tuple[int, List[int]]] = []
+    if not kept[0]:
+        runs.append((-1, [0]))
+    for position, entry in enumerate(entries):
+        if not kept[position]:
+            continue
+        run: List[int] = []
+        for child in entry.children + [None]:
+            if child is not None and not kept[child]:
+                run.append(child)
+            elif run:
+                runs.append((position, run))
+                run = []
+    summaries = {}
+    for parent, run in sorted(runs, key=lambda item: -sum(entries[i].size for i in item[1])):
+        line, level = _summary(entries, run)
+        cost = 2 * level + len(line) + 1
+        if cost <= remaining:
+            remaining -= cost
+            summaries[run[0]] = f"{'  ' * level}{line}"
+
+    lines = []
+    for position, entry in enumerate(entries):
+        if position in summaries:
+            lines.append(summaries[position])
+        if kept[position]:
+            lines.append(f"{'  ' * entry.depth}{entry.line}")
+    return lines
+
+
+def render_text(
+    root: Any,
+    *,
+    scroll_info: Optional[dict] = None,
+    max_lines: int | None = None,
+    max_chars: int | None = None,
+    new: Optional[Container] = None,
+) -> str:
+    """Render *root* between its scroll position annotations.
+
+    *max_chars* covers the annotations too; the tree gets what is left.
+    Elements in *new* are marked as added since the previous step.
+    """
+
+    above = below = None
+    if scroll_info:
+        if scroll_info.get('pixels_above', 0) > 0:
+            above = f"... {scroll_info['pixels_above']} pixels above ..."
+        if scroll_info.get('pixels_below', 0) > 0:
+            below = f"... {scroll_info['pixels_below']} pixels below ..."
+
+    def join(lines: List[str]) -> str:
+        return "\n".join(([above] if above else []) + lines + ([below] if below else []))
+
+    text = join(render_lines(root, max_lines=max_lines, new=new))
+    if max_chars is None or len(text) <= max_chars:
+        return text
+    # Annotations that do not fit are dropped.
+    if above and len(above) + 1 <= max_chars:
+        max_chars -= len(above) + 1
+    else:
+        above = None
+    if below and len(below) + 1 <= max_chars:
+        max_chars -= len(below) + 1
+    else:
+        below = None
+    return join(render_budgeted(root, max_chars, new=new)[:max_lines])
+
+
+__all__ = [
+    "CHARS_PER_TOKEN",
+    "budget_chars",
+    "element_line",
+    "render_budgeted",
+    "render_lines",
+    "render_text",
+]
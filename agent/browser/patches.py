@@ -161,12 +161,47 @@ async def _run_subprocess(command: Iterable[str]) -> tuple[int, bytes, bytes]:
     return process.returncode, stdout, stderr
 
 
+def _patch_google_image_mime_types(logger: logging.Logger) -> None:
+    """Label Gemini image parts with their real type instead of ``image/png``.
+
+    ``GoogleMessageSerializer`` ignores ``ImageURL.media_type`` and always
+    sends ``image/png``, which is wrong once screenshots are re-encoded as
+    JPEG or WebP.  The serialized bytes are sniffed and relabelled.
+    """
+
+    try:
+        from browser_use.llm.google.serializer import GoogleMessageSerializer
+    except Exception as exc:  # pragma: no cover - optional provider
+        logger.debug("Gemini serializer unavailable for patching: %s", exc)
+        return
+
+    original = GoogleMessageSerializer.serialize_messages
+    if getattr(original, "_agent_patch", False):
+        return
+
+    from agent.utils.screenshots import sniff_image_mimetype
+
+    def serialize_messages(messages, include_system_in_user: bool = False):
+        contents, system_message = original(messages, include_system_in_user)
+        for content in contents:
+            for part in getattr(content, "parts", None) or ():
+                inline = getattr(part, "inline_data", None)
+                if inline is not None and inline.data and (inline.mime_type or "").startswith("image/"):
+                    inline.mime_type = sniff_image_mimetype(inline.data[:16])
+        return contents, system_message
+
+    serialize_messages._agent_patch = True  # type: ignore[attr-defined]
+    GoogleMessageSerializer.serialize_messages = staticmethod(serialize_messages)
+    logger.info("Patched GoogleMessageSerializer to send the real image MIME type")
+
+
 def apply_browser_use_patches(logger: logging.Logger | None = None) -> None:
     global _patch_applied
     if _patch_applied:
         return
 
     log = logger or logging.getLogger(__name__)
+    _patch_google_image_mime_types(log)
     try:
         from browser_use.browser.events import BrowserLaunchEvent, BrowserStartEvent
         from browser_use.browser.watchdogs.local_browser_watchdog import (  # type: ignore import
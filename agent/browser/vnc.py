@@ -3,6 +3,7 @@ from __future__ import annotations
 import logging
 import os
 import threading
+import time
 from typing import List
 
 import requests
@@ -15,6 +16,13 @@ _DEFAULT_ENDPOINTS: tuple[str, ...] = (
 _VNC_ENDPOINT: str | None = None
 _VNC_LOCK = threading.Lock()
 
+# Seconds a health probe result is trusted before the endpoint is re-probed.
+_HEALTH_TTL = max(0.0, float(os.getenv("VNC_API_HEALTH_TTL", "30")))
+_ENDPOINT_HEALTH: dict[str, tuple[bool, float]] = {}
+
+# Last ``/source`` body per URL with its ETag, revalidated on the next call.
+_HTML_CACHE: dict[str, tuple[str, str]] = {}
+
 log = logging.getLogger(__name__)
 
 
@@ -39,11 +47,39 @@ def _candidate_endpoints() -> List[str]:
 
 
 def _probe_endpoint(endpoint: str, timeout: float = 1.0) -> bool:
+    cached = _ENDPOINT_HEALTH.get(endpoint)
+    if cached is not None and time.monotonic() - cached[1] < _HEALTH_TTL:
+        return cached[0]
+
     try:
         response = requests.get(f"{endpoint}/healthz", timeout=timeout)
-        return response.status_code == 200
+        healthy = response.status_code == 200
     except Exception:
-        return False
+        healthy = False
+    _ENDPOINT_HEALTH[endpoint] = (healthy, time.monotonic())
+    return healthy
+
+
+def mark_vnc_endpoint_unhealthy(endpoint: str) -> None:
+    """Record a failed request so the next lookup skips *endpoint*."""
+
+    global _VNC_ENDPOINT
+    normalised = _normalize_endpoint(endpoint)
+    with _VNC_LOCK:
+        _ENDPOINT_HEALTH[normalised] = (False, time.monotonic())
+        if _VNC_ENDPOINT == normalised:
+            _VNC_ENDPOINT = None
+
+
+def get_endpoint_health() -> dict[str, dict[str, object]]:
+    """Return the cached health state of every probed endpoint."""
+
+    now = time.monotonic()
+    with _VNC_LOCK:
+        return {
+            endpoint: {"healthy": healthy, "age_seconds": round(now - checked_at, 3)}
+            for endpoint, (healthy, checked_at) in _ENDPOINT_HEALTH.items()
+        }
 
 
 def get_vnc_api_base(refresh: bool = False) -> str:
@@ -54,6 +90,7 @@ def get_vnc_api_base(refresh: bool = False) -> str:
         previous = _VNC_ENDPOINT
         if refresh:
             _VNC_ENDPOINT = None
+            _ENDPOINT_HEALTH.clear()
         if _VNC_ENDPOINT:
             return _VNC_ENDPOINT
 
@@ -113,8 +150,16 @@ def get_html() -> str:
     """Best-effort retrieval of the current page HTML."""
 
     try:
-        response = requests.get(_vnc_url("/source"), timeout=(5, 30))
+        url = _vnc_url("/source")
+        cached = _HTML_CACHE.get(url)
+        headers = {"If-None-Match": cached[0]} if cached else {}
+        response = requests.get(url, headers=headers, timeout=(5, 30))
+        if response.status_code == 304 and cached:
+            return cached[1]
         response.raise_for_status()
+        etag = response.headers.get("ETag")
+        if etag:
+            _HTML_CACHE[url] = (etag, response.text)
         return response.text
     except Exception as exc:
         log.error("get_html error: %s", exc)
@@ -137,7 +182,9 @@ def get_url() -> str:
 
 
 __all__ = [
+    "get_endpoint_health",
     "get_vnc_api_base",
+    "mark_vnc_endpoint_unhealthy",
     "set_vnc_api_base",
     "get_html",
     "get_url",
@@ -1,35 +1,67 @@
 from __future__ import annotations
 
 import asyncio
-import copy
+import json
 import logging
+import math
 import os
+import queue
 import threading
 import time
 import uuid
-from concurrent.futures import Future
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from dataclasses import dataclass, field
-from typing import Any, Dict, Iterable, Literal, Optional
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, Literal, Optional
 from urllib.parse import urlsplit, urlunsplit
 
 import requests
+from requests.adapters import HTTPAdapter
 from browser_use.agent.service import Agent, AgentHistoryList
 from browser_use.agent.views import ActionModel, AgentOutput
 from browser_use.browser import BrowserSession
+from browser_use.browser.events import SwitchTabEvent
 from browser_use.browser.views import BrowserStateSummary
 from browser_use.llm.base import BaseChatModel
 from browser_use.llm.google.chat import ChatGoogle
 from browser_use.llm.groq.chat import ChatGroq
 
-from agent.browser.catalog import ElementCatalogSnapshot, build_element_catalog
+from agent.browser.catalog import ElementCatalogCache, ElementCatalogSnapshot, build_element_catalog
+from agent.browser.context_pool import (
+    BrowserContextLease,
+    BrowserContextPoolTimeout,
+    browser_context_pool_stats,
+    close_browser_context_pools,
+    get_browser_context_pool,
+)
 from agent.browser.patches import apply_browser_use_patches
-from agent.browser.vnc import get_vnc_api_base
+from agent.browser.vnc import (
+    get_endpoint_health,
+    get_vnc_api_base,
+    mark_vnc_endpoint_unhealthy,
+)
 from agent.utils.history import append_history_entry
+from agent.utils.metrics import REGISTRY
+from agent.utils.scheduler import AdmissionScheduler, QueueFullError
+from agent.utils.screenshot_pipeline import (
+    ARCHIVE_VARIANT,
+    MODEL_VARIANT,
+    PREVIEW_VARIANT,
+    difference_hash,
+    encode_data_uri,
+    hash_distance,
+    open_screenshot,
+    render_opened,
+    to_data_uri,
+)
+from agent.utils.screenshots import store_screenshot
+from agent.utils.session_store import load_session_record, spill_session_record
 from agent.utils.shared_browser import (
     env_flag,
     format_shared_browser_error,
     normalise_cdp_websocket,
 )
+from agent.utils.sse import parse_sse_lines
 
 log = logging.getLogger(__name__)
 apply_browser_use_patches(log)
@@ -47,6 +79,47 @@ _CDP_WARMUP_TIMEOUT = max(
     5.0,
     float(os.getenv("BROWSER_USE_CDP_WARMUP_TIMEOUT", "12")),
 )
+# Seconds a resolved CDP websocket URL is reused without probing again.
+_CDP_CACHE_TTL = max(0.0, float(os.getenv("BROWSER_USE_CDP_CACHE_TTL", "60")))
+_CDP_PROBE_WORKERS = 8
+_TERMINAL_STATUSES = frozenset({"completed", "failed", "cancelled"})
+# Keep-alive connections kept per automation server by the remote manager.
+_REMOTE_POOL_SIZE = max(1, int(os.getenv("BROWSER_USE_REMOTE_POOL_SIZE", "16")))
+_REMOTE_POOL_HOSTS = 4
+# Sessions run at once by the scheduler, and how many more may wait for a slot
+# before new submissions are rejected.
+_MAX_CONCURRENT_SESSIONS = max(
+    1, int(os.getenv("BROWSER_USE_MAX_CONCURRENT_SESSIONS", "4"))
+)
+_MAX_QUEUED_SESSIONS = max(0, int(os.getenv("BROWSER_USE_MAX_QUEUED_SESSIONS", "32")))
+# Per-provider caps on concurrent sessions; 0 leaves only the global cap.
+_MODEL_CONCURRENCY_DEFAULTS = {"gemini": "4", "groq": "2"}
+
+# Finished sessions stay in memory until idle for this many seconds or until
+# more than the max count have finished; older ones are spilled to disk.
+_SESSION_TTL = max(0.0, float(os.getenv("BROWSER_USE_SESSION_TTL", "900")))
+_MAX_FINISHED_SESSIONS = max(0, int(os.getenv("BROWSER_USE_MAX_FINISHED_SESSIONS", "50")))
+
+# Completed-session timing samples kept per phase for the metrics endpoint.
+_METRICS_SAMPLE_LIMIT = 1000
+
+# Consecutive screenshots whose difference hashes are at most this many bits
+# apart reuse the previous step's stored image.
+_SCREENSHOT_DEDUP = env_flag("SCREENSHOT_DEDUP", default=True)
+_SCREENSHOT_DEDUP_DISTANCE = max(0, int(os.getenv("SCREENSHOT_DEDUP_DISTANCE", "0")))
+
+_CDP_PROBE_SECONDS = REGISTRY.histogram(
+    "cdp_probe_duration_seconds",
+    "Latency of CDP /json/version probes by caller and outcome.",
+    ("source", "result"),
+)
+_SCREENSHOTS_UNCHANGED = REGISTRY.counter(
+    "screenshot_unchanged_total",
+    "Step screenshots deduplicated against the previous step.",
+)
+
+# Seconds between keep-alive events on idle progress streams.
+_EVENT_HEARTBEAT = max(1.0, float(os.getenv("BROWSER_USE_EVENT_HEARTBEAT", "15")))
 
 
 def _merge_candidates(*groups: Iterable[str | None]) -> list[str]:
@@ -262,12 +335,21 @@ def _probe_cdp_endpoint(
     url = _json_version_url(endpoint)
     if not url:
         return False, None
+    started = time.perf_counter()
     try:
         response = requests.get(url, timeout=timeout)
     except Exception as exc:
         log.debug("CDP endpoint probe failed for %s: %s", endpoint, exc)
+        _CDP_PROBE_SECONDS.observe(
+            time.perf_counter() - started, source="browser_use", result="failure"
+        )
         return False, None
 
+    _CDP_PROBE_SECONDS.observe(
+        time.perf_counter() - started,
+        source="browser_use",
+        result="success" if response.status_code == 200 else "failure",
+    )
     if response.status_code != 200:
         log.debug(
             "CDP endpoint probe for %s returned unexpected status %s",
@@ -289,6 +371,87 @@ def _probe_cdp_endpoint(
     return True, websocket_url or endpoint
 
 
+_cdp_cache: dict[tuple[str, ...], tuple[str, float]] = {}
+_cdp_cache_lock = threading.Lock()
+_cdp_probe_executor: ThreadPoolExecutor | None = None
+
+
+def _cdp_cache_key(candidates: Iterable[str | None]) -> tuple[str, ...]:
+    return tuple(_merge_candidates(candidates))
+
+
+def _cached_cdp_endpoint(key: tuple[str, ...]) -> str | None:
+    with _cdp_cache_lock:
+        cached = _cdp_cache.get(key)
+        if cached is None:
+            return None
+        endpoint, stored_at = cached
+        if time.monotonic() - stored_at >= _CDP_CACHE_TTL:
+            _cdp_cache.pop(key, None)
+            return None
+        return endpoint
+
+
+def _remember_cdp_endpoint(key: tuple[str, ...], endpoint: str) -> None:
+    if not key or not endpoint or _CDP_CACHE_TTL <= 0:
+        return
+    with _cdp_cache_lock:
+        _cdp_cache[key] = (endpoint, time.monotonic())
+
+
+def invalidate_cdp_endpoint_cache(endpoint: str | None = None) -> None:
+    """Forget cached CDP resolutions, either all or those pointing at *endpoint*."""
+
+    with _cdp_cache_lock:
+        if endpoint is None:
+            _cdp_cache.clear()
+            return
+        for key, (cached, _) in list(_cdp_cache.items()):
+            if cached == endpoint:
+                del _cdp_cache[key]
+
+
+def _get_cdp_probe_executor() -> ThreadPoolExecutor:
+    global _cdp_probe_executor
+    with _cdp_cache_lock:
+        if _cdp_probe_executor is None:
+            _cdp_probe_executor = ThreadPoolExecutor(
+                max_workers=_CDP_PROBE_WORKERS, thread_name_prefix="cdp-probe"
+            )
+        return _cdp_probe_executor
+
+
+def _probe_cdp_candidates(candidates: list[str], timeout: float) -> str | None:
+    """Probe *candidates* concurrently and return the preferred healthy one.
+
+    A healthy candidate is returned as soon as every candidate listed before
+    it has failed, so configured endpoints keep priority over the defaults
+    while unreachable hosts no longer delay the others one after another.
+    """
+
+    executor = _get_cdp_probe_executor()
+    futures = {
+        executor.submit(_probe_cdp_endpoint, candidate, timeout): index
+        for index, candidate in enumerate(candidates)
+    }
+    results: dict[int, str | None] = {}
+    for future in as_completed(futures):
+        index = futures[future]
+        try:
+            success, resolved_endpoint = future.result()
+        except Exception as exc:  # pragma: no cover - defensive
+            log.debug("CDP endpoint probe for %s raised: %s", candidates[index], exc)
+            success, resolved_endpoint = False, None
+        results[index] = (resolved_endpoint or candidates[index]) if success else None
+
+        for position in range(len(candidates)):
+            if position not in results:
+                break
+            if results[position]:
+                return results[position]
+    return None
+
+
 def _resolve_cdp_endpoint(
     *,
     candidates: Iterable[str] | None = None,
@@ -302,31 +465,31 @@ def _resolve_cdp_endpoint(
         else _candidate_cdp_endpoints()
     )
 
-    if not candidate_list:
+    normalised_candidates = _merge_candidates(candidate_list)
+    if not normalised_candidates:
         return None
 
-    first_viable: str | None = None
+    cache_key = tuple(normalised_candidates)
+    cached = _cached_cdp_endpoint(cache_key)
+    if cached:
+        log.debug("Using cached CDP endpoint %s", cached)
+        return cached
+
+    first_viable = normalised_candidates[0]
     max_attempts = max(retries, 1)
 
     for attempt in range(1, max_attempts + 1):
-        for candidate in candidate_list:
-            normalised = _normalise_cdp_candidate(candidate)
-            if not normalised:
-                continue
-            if first_viable is None:
-                first_viable = normalised
-            success, resolved_endpoint = _probe_cdp_endpoint(
-                normalised, timeout=request_timeout
-            )
-            if success:
-                if attempt > 1:
-                    log.info(
-                        "CDP endpoint %s became reachable on retry %d/%d",
-                        resolved_endpoint or normalised,
-                        attempt,
-                        max_attempts,
-                    )
-                return resolved_endpoint or normalised
+        resolved_endpoint = _probe_cdp_candidates(normalised_candidates, request_timeout)
+        if resolved_endpoint:
+            if attempt > 1:
+                log.info(
+                    "CDP endpoint %s became reachable on retry %d/%d",
+                    resolved_endpoint,
+                    attempt,
+                    max_attempts,
+                )
+            _remember_cdp_endpoint(cache_key, resolved_endpoint)
+            return resolved_endpoint
 
         if attempt < max_attempts:
             wait_time = delay if delay > 0 else 0.0
@@ -347,19 +510,12 @@ def _resolve_cdp_endpoint(
 
     total_wait = max(0.0, (max_attempts - 1) * max(delay, 0.0))
 
-    if first_viable is not None:
-        log.warning(
-            "Could not verify CDP endpoint connectivity after %d attempts and %.1fs total wait; last candidate was %s",
-            max_attempts,
-            total_wait,
-            first_viable,
-        )
-    else:
-        log.warning(
-            "Could not verify CDP endpoint connectivity after %d attempts and %.1fs total wait; no candidates available",
-            max_attempts,
-            total_wait,
-        )
+    log.warning(
+        "Could not verify CDP endpoint connectivity after %d attempts and %.1fs total wait; last candidate was %s",
+        max_attempts,
+        total_wait,
+        first_viable,
+    )
 
     return None
 
@@ -368,12 +524,194 @@ def _now() -> float:
     return time.time()
 
 
-def _normalise_screenshot(data: Optional[str]) -> Optional[str]:
-    if not data:
-        return None
-    if data.startswith("data:image"):
-        return data
-    return f"data:image/png;base64,{data}"
+def _readonly(self: Any, *args: Any, **kwargs: Any) -> None:
+    raise TypeError("step records are immutable")
+
+
+class _FrozenDict(dict):
+    """A ``dict`` that refuses mutation so it can be shared without copying.
+
+    It stays a ``dict`` subclass so ``json``/``jsonify`` serialise it as-is.
+    """
+
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __ior__ = _readonly  # type: ignore[assignment]
+    clear = pop = popitem = setdefault = update = _readonly  # type: ignore[assignment]
+
+    def __copy__(self) -> "_FrozenDict":
+        return self
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "_FrozenDict":
+        return self
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (_FrozenDict, (dict(self),))
+
+
+class _FrozenList(list):
+    """Read-only ``list`` counterpart of :class:`_FrozenDict`."""
+
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly  # type: ignore[assignment]
+    append = clear = extend = insert = pop = remove = reverse = sort = _readonly  # type: ignore[assignment]
+
+    def __copy__(self) -> "_FrozenList":
+        return self
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "_FrozenList":
+        return self
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (_FrozenList, (list(self),))
+
+
+def _freeze(value: Any) -> Any:
+    """Return a recursively read-only copy of *value*."""
+
+    if isinstance(value, (_FrozenDict, _FrozenList)):
+        return value
+    if isinstance(value, dict):
+        return _FrozenDict((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return _FrozenList(_freeze(item) for item in value)
+    return value
+
+
+def _estimate_size(value: Any) -> int:
+    """Approximate the memory held by *value* via its JSON encoding."""
+
+    try:
+        return len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+    except (TypeError, ValueError):  # pragma: no cover - defensive
+        return 0
+
+
+def _record_phase(timings: Dict[str, float], phase: str, seconds: float) -> None:
+    timings[phase] = round(seconds, 4)
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of *values* (which must be non-empty)."""
+
+    ordered = sorted(values)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarise_timings(samples: Dict[str, list[float]]) -> Dict[str, Dict[str, float]]:
+    """Return count/total/p50/p95 per phase, in seconds."""
+
+    summary: Dict[str, Dict[str, float]] = {}
+    for phase, values in samples.items():
+        if not values:
+            continue
+        summary[phase] = {
+            "count": len(values),
+            "total": round(sum(values), 4),
+            "p50": round(_percentile(values, 0.5), 4),
+            "p95": round(_percentile(values, 0.95), 4),
+        }
+    return summary
+
+
+class _LoopQueue:
+    """Event subscriber that hands events to an asyncio queue on *loop*.
+
+    Sessions publish from their own threads, so events go through
+    ``call_soon_threadsafe`` and a waiting reader holds no worker thread.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+        self.events: asyncio.Queue = asyncio.Queue()
+
+    def put_nowait(self, item: tuple[str, Dict[str, Any]]) -> None:
+        try:
+            self._loop.call_soon_threadsafe(self.events.put_nowait, item)
+        except RuntimeError:
+            # The reader's loop is closed; it will not read any more.
+            pass
+
+
+async def _iter_async(
+    items: Iterable[tuple[str, Dict[str, Any]]]
+) -> AsyncIterator[tuple[str, Dict[str, Any]]]:
+    for item in items:
+        yield item
+
+
+def _slice_session_record(record: Dict[str, Any], since: int | None) -> Dict[str, Any]:
+    offset = max(since or 0, 0)
+    data = dict(record)
+    steps = record.get("steps") or []
+    data["steps"] = steps[offset:]
+    data["steps_since"] = offset
+    data["step_count"] = len(steps)
+    data["queue_position"] = None
+    return data
+
+
+def _store_screenshot_variants(
+    data: Optional[str],
+    previous: tuple[int, Dict[str, Any]] | None = None,
+) -> tuple[Dict[str, Any], tuple[int, Dict[str, Any]] | None]:
+    """Store the archive and UI preview encodings of a step screenshot.
+
+    Returns the step fields to set and the ``(fingerprint, fields)`` reference
+    to compare the next screenshot against.  A frame near-identical to
+    *previous* reuses its images and is flagged ``screenshot_unchanged``.
+    When storage fails the preview is kept inline so the image is not lost.
+    """
+
+    opened = open_screenshot(data)
+    if opened is None:
+        return {"screenshot_hash": None, "screenshot_unchanged": False}, None
+    fingerprint = difference_hash(opened) if _SCREENSHOT_DEDUP else None
+    if (
+        fingerprint is not None
+        and previous is not None
+        and hash_distance(fingerprint, previous[0]) <= _SCREENSHOT_DEDUP_DISTANCE
+    ):
+        _SCREENSHOTS_UNCHANGED.inc()
+        # Keep the stored frame as the reference so slow drift still shows up.
+        return {**previous[1], "screenshot_unchanged": True}, previous
+
+    rendered = render_opened(opened, (ARCHIVE_VARIANT, PREVIEW_VARIANT))
+    archive, _ = rendered[ARCHIVE_VARIANT.name]
+    preview, preview_type = rendered[PREVIEW_VARIANT.name]
+    archive_hash = store_screenshot(archive)
+    preview_hash = archive_hash if preview is archive else store_screenshot(preview)
+    fields: Dict[str, Any] = {
+        "screenshot_hash": archive_hash,
+        "screenshot_preview_hash": preview_hash,
+    }
+    if archive_hash is None:
+        fields["screenshot"] = to_data_uri(preview, preview_type)
+    reference = (fingerprint, fields) if fingerprint is not None else None
+    return {**fields, "screenshot_unchanged": False}, reference
+
+
+def _compress_message_images(messages: Any) -> None:
+    """Re-encode PNG screenshots in LLM *messages* with the model variant, in place."""
+
+    if not isinstance(messages, list):
+        return
+    for message in messages:
+        content = getattr(message, "content", None)
+        if not isinstance(content, list):
+            continue
+        for part in content:
+            image_url = getattr(part, "image_url", None)
+            url = getattr(image_url, "url", None)
+            # Only raw captures; anything else was already processed.
+            if not isinstance(url, str) or not url.startswith("data:image/png"):
+                continue
+            encoded, mimetype = encode_data_uri(url, MODEL_VARIANT)
+            if encoded is not url:
+                image_url.url = encoded
+                image_url.media_type = mimetype
 
 
 @dataclass
@@ -406,9 +744,43 @@ class BrowserUseSession:
         default=None, init=False, repr=False
     )
     _delivered_instruction_count: int = field(default=0, init=False, repr=False)
+    _enqueued_instruction_count: int = field(default=0, init=False, repr=False)
+    _instruction_queue: asyncio.Queue = field(
+        default_factory=asyncio.Queue, init=False, repr=False
+    )
+    _instruction_drainer_active: bool = field(default=False, init=False, repr=False)
     _agent_ready: asyncio.Event = field(
         default_factory=asyncio.Event, init=False, repr=False
     )
+    _subscribers: list[queue.Queue | _LoopQueue] = field(
+        default_factory=list, init=False, repr=False
+    )
+    _context_lease: BrowserContextLease | None = field(
+        default=None, init=False, repr=False
+    )
+    _queue_position: Callable[[str], int | None] | None = field(
+        default=None, init=False, repr=False
+    )
+    _memory_bytes: int = field(default=0, init=False, repr=False)
+    # Catalog entries of the previous step, reused while their node is unchanged.
+    _catalog_cache: ElementCatalogCache = field(
+        default_factory=ElementCatalogCache, init=False, repr=False
+    )
+    # Per-step timing state (perf_counter based) and per-phase samples.
+    _step_started: float | None = field(default=None, init=False, repr=False)
+    _step_llm_started: float | None = field(default=None, init=False, repr=False)
+    _step_llm_seconds: float = field(default=0.0, init=False, repr=False)
+    _llm_wait_seconds: float = field(default=0.0, init=False, repr=False)
+    _pending_action_timing: tuple[int, float] | None = field(
+        default=None, init=False, repr=False
+    )
+    _phase_samples: Dict[str, list[float]] = field(
+        default_factory=dict, init=False, repr=False
+    )
+    # Fingerprint and stored fields of the last distinct step screenshot.
+    _last_screenshot: tuple[int, Dict[str, Any]] | None = field(
+        default=None, init=False, repr=False
+    )
 
     def __post_init__(self) -> None:
         context = (self.history_context or "").strip()
@@ -456,54 +828,51 @@ class BrowserUseSession:
             if self.status in {"completed", "failed", "cancelled"}:
                 return "not_running"
             self.extra_commands.append(text)
+            self._memory_bytes += _estimate_size(text)
             self.updated_at = _now()
 
         log.info("Session %s: queued additional instruction", self.session_id)
         return "accepted"
 
     def ensure_instruction_delivery(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Hand newly added instructions to the delivery coroutine on *loop*."""
+
         with self._lock:
+            pending = self.extra_commands[self._enqueued_instruction_count :]
+            self._enqueued_instruction_count = len(self.extra_commands)
             future = self._instruction_delivery_future
-            if future and not future.done():
+            if not pending and future is not None and not future.done():
                 return
 
-        coroutine = self._deliver_instructions()
-        future = asyncio.run_coroutine_threadsafe(coroutine, loop)
+        future = asyncio.run_coroutine_threadsafe(self._deliver_instructions(pending), loop)
 
         with self._lock:
             self._instruction_delivery_future = future
 
-    async def _deliver_instructions(self) -> None:
-        try:
-            # Wait until the agent is ready or the session terminates.
-            while self._agent is None and self.status not in {"failed", "cancelled"}:
-                if self._agent_ready.is_set():
-                    break
-                await asyncio.sleep(0.05)
-
-            await asyncio.sleep(0)
+    async def _deliver_instructions(self, pending: list[str]) -> None:
+        for instruction in pending:
+            self._instruction_queue.put_nowait(instruction)
+        if self._instruction_drainer_active:
+            # The running drainer picks these up; it cannot have decided to
+            # stop yet because it only does so without yielding to the loop.
+            return
 
+        self._instruction_drainer_active = True
+        try:
+            # Sleeps until the agent exists or the session ends; no polling.
+            await self._agent_ready.wait()
             while True:
-                with self._lock:
-                    if self.status in {"completed", "failed", "cancelled"}:
-                        self._instruction_delivery_future = None
-                        return
-
-                    if self._delivered_instruction_count >= len(self.extra_commands):
-                        self._instruction_delivery_future = None
-                        return
+                try:
+                    instruction = self._instruction_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
 
-                    index = self._delivered_instruction_count
-                    instruction = self.extra_commands[index]
+                with self._lock:
+                    terminal = self.status in _TERMINAL_STATUSES
                     agent = self._agent
-                    self._delivered_instruction_count += 1
-
-                if agent is None:
-                    # Agent still not ready; wait briefly and retry without losing progress.
-                    await asyncio.sleep(0.05)
-                    with self._lock:
-                        self._delivered_instruction_count = index
-                    continue
+                if terminal or agent is None:
+                    # The session ended before the agent could take it.
+                    return
 
                 try:
                     agent.add_new_task(instruction)
@@ -516,25 +885,99 @@ class BrowserUseSession:
                     self._add_warning(
                         f"追加の指示を適用できませんでした（{type(exc).__name__}: {exc}）"
                     )
-                    with self._lock:
-                        self._delivered_instruction_count = index
-                        self._instruction_delivery_future = None
                     return
+                with self._lock:
+                    self._delivered_instruction_count += 1
         finally:
-            with self._lock:
-                if self._instruction_delivery_future and self._instruction_delivery_future.done():
-                    # Clear reference so new instructions trigger a fresh task.
-                    self._instruction_delivery_future = None
+            self._instruction_drainer_active = False
 
     async def prepare(self) -> None:
         if self._prepared_browser_session is not None:
             return
 
+        # CDP probing and the warmup request block, so keep them off the
+        # manager loop where other sessions' coroutines run.
+        loop = asyncio.get_running_loop()
         try:
-            self._prepared_browser_session = self._create_browser_session()
+            self._prepared_browser_session = await loop.run_in_executor(
+                None, self._create_browser_session
+            )
         except Exception:
             self._prepared_browser_session = None
             raise
+        try:
+            await self._acquire_browser_context()
+        except BaseException:
+            self._prepared_browser_session = None
+            raise
+
+    async def _acquire_browser_context(self) -> None:
+        """Lease an isolated context on the shared browser when pooling is on."""
+
+        if self._context_lease is not None or not _context_pool_enabled():
+            return
+        endpoint = self.shared_browser_endpoint
+        if self.shared_browser_mode != "remote" or not endpoint:
+            return
+        pool = get_browser_context_pool(endpoint)
+        try:
+            self._context_lease = await pool.acquire()
+        except BrowserContextPoolTimeout as exc:
+            raise RuntimeError(
+                "共有ブラウザの空きコンテキストを待機中にタイムアウトしました。"
+                "しばらくしてから再度お試しください。"
+            ) from exc
+        log.info(
+            "Session %s: leased browser context %s",
+            self.session_id,
+            self._context_lease.browser_context_id,
+        )
+
+    async def _focus_browser_context(self, browser_session: BrowserSession) -> None:
+        await self._acquire_browser_context()
+        lease = self._context_lease
+        if lease is None:
+            return
+        # Connect now so the agent starts on the leased page rather than on
+        # whichever tab the shared browser lists first.
+        await browser_session.start()
+        await browser_session.event_bus.dispatch(
+            SwitchTabEvent(target_id=lease.target_id)
+        )
+
+    async def _release_browser_context(self) -> None:
+        lease, self._context_lease = self._context_lease, None
+        if lease is None:
+            return
+        try:
+            await get_browser_context_pool(lease.endpoint).release(lease)
+        except Exception as exc:  # pragma: no cover - best effort
+            log.debug(
+                "Session %s: failed to release browser context: %s",
+                self.session_id,
+                exc,
+            )
+
+    async def prepare_and_run(self) -> None:
+        """Prepare the browser and run the agent, reporting failures via status."""
+
+        self._task = asyncio.current_task()
+        try:
+            await self.prepare()
+        except asyncio.CancelledError:
+            self._set_status("cancelled")
+            self._record_history()
+            self._agent_ready.set()
+            raise
+        except Exception as exc:
+            log.error(
+                "Browser-use session %s failed during preparation: %s", self.session_id, exc
+            )
+            self._set_status("failed", str(exc))
+            self._record_history()
+            self._agent_ready.set()
+            return
+        await self.run()
 
     async def run(self) -> None:
         self._task = asyncio.current_task()
@@ -543,17 +986,20 @@ class BrowserUseSession:
         except Exception as exc:  # pragma: no cover - configuration error path
             log.error("Failed to create LLM for session %s: %s", self.session_id, exc)
             self._set_status("failed", str(exc))
+            await self._release_browser_context()
             self._record_history()
             self._agent_ready.set()
             return
 
         try:
+            self._instrument_llm(llm)
             self._set_status("running")
             if self._prepared_browser_session is not None:
                 browser_session = self._prepared_browser_session
                 self._prepared_browser_session = None
             else:
                 browser_session = self._create_browser_session()
+            await self._focus_browser_context(browser_session)
             self._agent = Agent(
                 task=self.command,
                 llm=llm,
@@ -565,7 +1011,11 @@ class BrowserUseSession:
                 extend_system_message=self._history_extension,
             )
             self._agent_ready.set()
-            history: AgentHistoryList = await self._agent.run(max_steps=self.max_steps)
+            history: AgentHistoryList = await self._agent.run(
+                max_steps=self.max_steps,
+                on_step_start=self._on_step_start,
+                on_step_end=self._on_step_end,
+            )
             self._finalise_result(history)
             self._set_status("completed")
         except asyncio.CancelledError:
@@ -573,6 +1023,9 @@ class BrowserUseSession:
             raise
         except Exception as exc:  # pragma: no cover - runtime failure path
             log.exception("Browser-use session %s failed", self.session_id)
+            if self.shared_browser_endpoint:
+                # The browser may have gone away; probe again next time.
+                invalidate_cdp_endpoint_cache(self.shared_browser_endpoint)
             self._set_status("failed", str(exc))
         finally:
             try:
@@ -580,6 +1033,7 @@ class BrowserUseSession:
                     await self._agent.close()
             except Exception as close_exc:  # pragma: no cover - defensive
                 log.debug("Error closing agent for session %s: %s", self.session_id, close_exc)
+            await self._release_browser_context()
             self._record_history()
             self._agent_ready.set()
 
@@ -589,6 +1043,7 @@ class BrowserUseSession:
             self.shared_browser_mode = normalised
             self.shared_browser_endpoint = endpoint
             self.updated_at = _now()
+        self._publish_status()
 
     def _add_warning(self, message: str | None) -> None:
         if not message:
@@ -597,9 +1052,101 @@ class BrowserUseSession:
         if not trimmed:
             return
         with self._lock:
-            if trimmed not in self.warnings:
-                self.warnings.append(trimmed)
-                self.updated_at = _now()
+            if trimmed in self.warnings:
+                return
+            self.warnings.append(trimmed)
+            self._memory_bytes += _estimate_size(trimmed)
+            self.updated_at = _now()
+        self._publish("warning", {"warning": trimmed})
+
+    def _publish(self, event: str, data: Dict[str, Any]) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.put_nowait((event, data))
+
+    def _publish_status(self) -> None:
+        with self._lock:
+            if not self._subscribers:
+                return
+            cursor = len(self.steps)
+        self._publish("status", self.snapshot(since=cursor))
+
+    def iter_events(
+        self, since: int | None = None, *, heartbeat: float = _EVENT_HEARTBEAT
+    ) -> Iterator[tuple[str, Dict[str, Any]]]:
+        """Yield live progress events until the session finishes.
+
+        The stream starts with a ``snapshot`` event (equivalent to
+        ``snapshot(since)``) followed by ``step``, ``warning`` and ``status``
+        events as they happen.  ``ping`` events are emitted every *heartbeat*
+        seconds while idle so proxies keep the connection open.
+        """
+
+        subscriber: queue.Queue = queue.Queue()
+        with self._lock:
+            self._subscribers.append(subscriber)
+        try:
+            initial = self.snapshot(since)
+            cursor = initial["step_count"]
+            yield "snapshot", initial
+            if initial["status"] in _TERMINAL_STATUSES:
+                return
+
+            while True:
+                try:
+                    event, data = subscriber.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield "ping", {"timestamp": _now()}
+                    continue
+
+                if event == "step":
+                    # Steps appended before the snapshot was taken are
+                    # already part of it.
+                    if data["position"] < cursor:
+                        continue
+                    cursor = data["position"] + 1
+                yield event, data
+                if event == "status" and data.get("status") in _TERMINAL_STATUSES:
+                    return
+        finally:
+            with self._lock:
+                if subscriber in self._subscribers:
+                    self._subscribers.remove(subscriber)
+
+    async def iter_events_async(
+        self, since: int | None = None, *, heartbeat: float = _EVENT_HEARTBEAT
+    ) -> AsyncIterator[tuple[str, Dict[str, Any]]]:
+        """:meth:`iter_events` for readers on an event loop."""
+
+        subscriber = _LoopQueue(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.append(subscriber)
+        try:
+            initial = self.snapshot(since)
+            cursor = initial["step_count"]
+            yield "snapshot", initial
+            if initial["status"] in _TERMINAL_STATUSES:
+                return
+
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(subscriber.events.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield "ping", {"timestamp": _now()}
+                    continue
+
+                if event == "step":
+                    if data["position"] < cursor:
+                        continue
+                    cursor = data["position"] + 1
+                yield event, data
+                if event == "status" and data.get("status") in _TERMINAL_STATUSES:
+                    return
+        finally:
+            with self._lock:
+                if subscriber in self._subscribers:
+                    self._subscribers.remove(subscriber)
 
     async def request_cancel(self) -> None:
         task = self._task
@@ -610,16 +1157,73 @@ class BrowserUseSession:
             except asyncio.CancelledError:
                 pass
 
+    def _instrument_llm(self, llm: BaseChatModel) -> None:
+        """Wrap ``llm.ainvoke`` so time spent waiting on the model is recorded."""
+
+        original = llm.ainvoke
+
+        async def timed_ainvoke(*args: Any, **kwargs: Any) -> Any:
+            if args:
+                try:
+                    await asyncio.to_thread(_compress_message_images, args[0])
+                except Exception as exc:  # pragma: no cover - send the originals
+                    log.debug("Session %s: screenshot compression failed: %s", self.session_id, exc)
+            started = time.perf_counter()
+            if self._step_llm_started is None:
+                self._step_llm_started = started
+            try:
+                return await original(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                self._step_llm_seconds += elapsed
+                with self._lock:
+                    self._llm_wait_seconds += elapsed
+
+        try:
+            setattr(llm, "ainvoke", timed_ainvoke)
+        except Exception as exc:  # pragma: no cover - frozen model classes
+            log.debug("Session %s: LLM timing unavailable: %s", self.session_id, exc)
+
+    async def _on_step_start(self, agent: Agent) -> None:
+        self._step_started = time.perf_counter()
+        self._step_llm_started = None
+        self._step_llm_seconds = 0.0
+
+    async def _on_step_end(self, agent: Agent) -> None:
+        pending, self._pending_action_timing = self._pending_action_timing, None
+        if pending is None:
+            return
+        position, actions_started = pending
+        elapsed = round(time.perf_counter() - actions_started, 4)
+        with self._lock:
+            self._phase_samples.setdefault("actions", []).append(elapsed)
+            if position < len(self.steps):
+                step = self.steps[position]
+                previous = step.get("timings") or {}
+                timings = {**previous, "actions": elapsed}
+                # Records are immutable; swap in an updated one.  Only the
+                # timings change, so they account for the whole size delta.
+                self.steps[position] = _freeze({**step, "timings": timings})
+                self._memory_bytes += _estimate_size(timings) - _estimate_size(previous)
+
     async def _on_step(
         self,
         browser_state: BrowserStateSummary,
         model_output: AgentOutput,
         step_number: int,
     ) -> None:
+        callback_started = time.perf_counter()
+        timings: Dict[str, float] = {}
+        if self._step_started is not None:
+            llm_started = self._step_llm_started or callback_started
+            _record_phase(timings, "browser_state", llm_started - self._step_started)
+            _record_phase(timings, "llm", self._step_llm_seconds)
+
         dom_excerpt = ""
         element_catalog: ElementCatalogSnapshot | None = None
         action_warnings: list[str] = []
 
+        phase_started = time.perf_counter()
         try:
             dom_text = browser_state.dom_state.llm_representation()
             if len(dom_text) > 2000:
@@ -628,8 +1232,10 @@ class BrowserUseSession:
                 dom_excerpt = dom_text
         except Exception as exc:  # pragma: no cover - best effort only
             dom_excerpt = f"DOM extraction failed: {exc}"
+        _record_phase(timings, "dom_serialisation", time.perf_counter() - phase_started)
 
         if self._agent is not None:
+            phase_started = time.perf_counter()
             try:
                 stabilised_actions, warnings, catalog = self._stabilise_model_output(
                     browser_state,
@@ -647,8 +1253,16 @@ class BrowserUseSession:
                 self._add_warning(warning)
             action_warnings.extend(warnings)
             element_catalog = catalog
+            _record_phase(timings, "catalog", time.perf_counter() - phase_started)
 
         actions = [action.model_dump(exclude_none=True) for action in model_output.action]
+        phase_started = time.perf_counter()
+        # Encoding is CPU bound; keep it off the loop other sessions share.
+        screenshot_fields, self._last_screenshot = await asyncio.to_thread(
+            _store_screenshot_variants, browser_state.screenshot, self._last_screenshot
+        )
+        _record_phase(timings, "screenshot_store", time.perf_counter() - phase_started)
+        _record_phase(timings, "callback", time.perf_counter() - callback_started)
         step_payload: Dict[str, Any] = {
             "index": step_number,
             "url": browser_state.url,
@@ -658,16 +1272,27 @@ class BrowserUseSession:
             "memory": model_output.memory,
             "next_goal": model_output.next_goal,
             "actions": actions,
-            "screenshot": _normalise_screenshot(browser_state.screenshot),
+            **screenshot_fields,
             "dom_excerpt": dom_excerpt,
             "element_catalog": element_catalog.text if element_catalog else "",
             "element_catalog_metadata": element_catalog.metadata if element_catalog else {},
             "action_warnings": action_warnings,
+            "timings": timings,
             "timestamp": _now(),
         }
+        # Frozen once here so snapshots and history can share it by reference.
+        step_payload = _freeze(step_payload)
+        step_size = _estimate_size(step_payload)
         with self._lock:
             self.steps.append(step_payload)
+            self._memory_bytes += step_size
+            position = len(self.steps) - 1
+            for phase, seconds in timings.items():
+                self._phase_samples.setdefault(phase, []).append(seconds)
             self.updated_at = _now()
+        self._publish("step", {"position": position, "step": step_payload})
+        # Actions run after this callback returns; _on_step_end times them.
+        self._pending_action_timing = (position, time.perf_counter())
 
     def _stabilise_model_output(
         self,
@@ -675,7 +1300,7 @@ class BrowserUseSession:
         model_output: AgentOutput,
     ) -> tuple[list[ActionModel] | None, list[str], ElementCatalogSnapshot | None]:
         selector_map = getattr(browser_state.dom_state, "selector_map", {}) or {}
-        catalog = build_element_catalog(selector_map)
+        catalog = build_element_catalog(selector_map, self._catalog_cache)
 
         if not model_output.action:
             return None, [], catalog
@@ -763,12 +1388,21 @@ class BrowserUseSession:
             except Exception:  # pragma: no cover - defensive
                 result["structured_output"] = str(structured)
         with self._lock:
-            warnings_copy = copy.deepcopy(self.warnings)
+            warnings_copy = list(self.warnings)
+            samples = {phase: list(values) for phase, values in self._phase_samples.items()}
+            llm_wait = self._llm_wait_seconds
         if warnings_copy:
             result["warnings"] = warnings_copy
+        result["timings"] = summarise_timings(samples)
+        result["llm_wait_seconds"] = round(llm_wait, 4)
 
+        result = _freeze(result)
+        result_size = _estimate_size(result)
         with self._lock:
+            if self.result is not None:
+                self._memory_bytes -= _estimate_size(self.result)
             self.result = result
+            self._memory_bytes += result_size
             self.updated_at = _now()
 
     def _create_llm(self) -> BaseChatModel:
@@ -812,6 +1446,7 @@ class BrowserUseSession:
 
     def _create_browser_session(self) -> BrowserSession:
         candidates = list(_candidate_cdp_endpoints())
+        cache_key = _cdp_cache_key(candidates)
         try:
             endpoint = _resolve_cdp_endpoint(candidates=candidates)
         except TypeError:
@@ -841,6 +1476,7 @@ class BrowserUseSession:
             try:
                 session = BrowserSession(cdp_url=endpoint, is_local=False)
             except Exception as exc:  # pragma: no cover - defensive
+                invalidate_cdp_endpoint_cache(endpoint)
                 detail = f"{type(exc).__name__}: {exc}"
                 message = format_shared_browser_error(
                     f"共有ブラウザ {endpoint} への接続に失敗しました（{detail}）",
@@ -860,6 +1496,7 @@ class BrowserUseSession:
                     endpoint,
                 )
                 self._set_shared_browser_state("remote", endpoint)
+                _remember_cdp_endpoint(cache_key, endpoint)
                 return session
 
         approx_wait = max(
@@ -881,6 +1518,7 @@ class BrowserUseSession:
             if error:
                 self.error = error
             self.updated_at = _now()
+        self._publish_status()
 
     def _record_history(self) -> None:
         if self._history_recorded:
@@ -889,8 +1527,8 @@ class BrowserUseSession:
             payload = {
                 "status": self.status,
                 "model": self.model_name,
-                "steps": copy.deepcopy(self.steps),
-                "result": copy.deepcopy(self.result),
+                "steps": list(self.steps),
+                "result": self.result,
                 "error": self.error,
                 "complete": self.status == "completed",
             }
@@ -914,7 +1552,18 @@ class BrowserUseSession:
             return urls[-1]
         return None
 
-    def snapshot(self) -> Dict[str, Any]:
+    def snapshot(self, since: int | None = None) -> Dict[str, Any]:
+        """Return a JSON-serialisable view of the session.
+
+        ``since`` is a step cursor: when given, only ``steps[since:]`` are
+        returned.  ``step_count`` is the cursor for the next poll.  Step
+        records and the result are immutable, so they are shared rather than
+        copied and the lock is held only for shallow list slices.
+        """
+
+        offset = max(since or 0, 0)
+        lookup = self._queue_position
+        queue_position = lookup(self.session_id) if lookup is not None else None
         with self._lock:
             return {
                 "session_id": self.session_id,
@@ -923,17 +1572,34 @@ class BrowserUseSession:
                 "model": self.model_name,
                 "status": self.status,
                 "error": self.error,
-                "steps": copy.deepcopy(self.steps),
-                "result": copy.deepcopy(self.result),
+                "steps": self.steps[offset:],
+                "steps_since": offset,
+                "step_count": len(self.steps),
+                "result": self.result,
                 "created_at": self.created_at,
                 "updated_at": self.updated_at,
                 "complete": self.status == "completed",
-                "warnings": copy.deepcopy(self.warnings),
-                "additional_instructions": copy.deepcopy(self.extra_commands),
+                "warnings": list(self.warnings),
+                "additional_instructions": list(self.extra_commands),
                 "shared_browser_mode": self.shared_browser_mode,
                 "shared_browser_endpoint": self.shared_browser_endpoint,
+                "queue_position": queue_position,
+                "memory_bytes": self._memory_bytes,
             }
 
+    def timing_samples(self) -> tuple[Dict[str, list[float]], float]:
+        """Return a copy of the per-phase samples and total LLM wait time."""
+
+        with self._lock:
+            samples = {phase: list(values) for phase, values in self._phase_samples.items()}
+            return samples, self._llm_wait_seconds
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes held by steps, result, warnings and instructions."""
+
+        with self._lock:
+            return self._memory_bytes
+
 
 class BrowserUseManager:
     def __init__(self) -> None:
@@ -942,11 +1608,134 @@ class BrowserUseManager:
         self._thread.start()
         self._sessions: Dict[str, BrowserUseSession] = {}
         self._lock = threading.Lock()
+        self._scheduler = AdmissionScheduler(
+            max_active=_MAX_CONCURRENT_SESSIONS,
+            max_queued=_MAX_QUEUED_SESSIONS,
+            group_limits=_model_concurrency_limits(),
+        )
+        # Finished session ids in least-recently-used order, with last access.
+        self._finished: OrderedDict[str, float] = OrderedDict()
+        self._spilled_count = 0
+        # Timing samples of finished sessions, merged in as they complete.
+        self._finished_samples: Dict[str, deque[float]] = {}
+        self._finished_llm_wait = 0.0
 
     def _run_loop(self) -> None:
         asyncio.set_event_loop(self._loop)
         self._loop.run_forever()
 
+    def scheduler_stats(self) -> Dict[str, Any]:
+        return self._scheduler.stats()
+
+    async def _run_admitted(self, session: BrowserUseSession, coroutine: Any) -> None:
+        try:
+            await coroutine
+        finally:
+            self._scheduler.finish(session.session_id)
+            self._publish_queue_positions()
+            self._collect_timings(session)
+            self._mark_finished(session.session_id)
+
+    def _collect_timings(self, session: BrowserUseSession) -> None:
+        samples, llm_wait = session.timing_samples()
+        with self._lock:
+            for phase, values in samples.items():
+                bucket = self._finished_samples.setdefault(
+                    phase, deque(maxlen=_METRICS_SAMPLE_LIMIT)
+                )
+                bucket.extend(values)
+            self._finished_llm_wait += llm_wait
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return step timing percentiles plus scheduler and memory stats."""
+
+        with self._lock:
+            sessions = list(self._sessions.values())
+            samples = {phase: list(values) for phase, values in self._finished_samples.items()}
+            llm_wait = self._finished_llm_wait
+        statuses: Dict[str, int] = {}
+        for session in sessions:
+            status = session.status
+            statuses[status] = statuses.get(status, 0) + 1
+            if status in _TERMINAL_STATUSES:
+                # Already merged into the finished samples.
+                continue
+            live_samples, live_wait = session.timing_samples()
+            for phase, values in live_samples.items():
+                samples.setdefault(phase, []).extend(values)
+            llm_wait += live_wait
+        return {
+            "sessions": statuses,
+            "step_timings": summarise_timings(samples),
+            "llm_wait_seconds": round(llm_wait, 4),
+            "scheduler": self._scheduler.stats(),
+            "memory": self.memory_stats(),
+            "context_pools": browser_context_pool_stats(),
+        }
+
+    def _launch(self, session: BrowserUseSession) -> None:
+        session._set_status("preparing")
+        asyncio.run_coroutine_threadsafe(
+            self._run_admitted(session, session.prepare_and_run()), self._loop
+        )
+
+    def _mark_finished(self, session_id: str) -> None:
+        with self._lock:
+            if session_id in self._sessions:
+                self._finished[session_id] = time.monotonic()
+                self._finished.move_to_end(session_id)
+        self._evict_finished()
+
+    def _evict_finished(self) -> None:
+        """Spill finished sessions past the TTL or max count to disk."""
+
+        now = time.monotonic()
+        evicted: list[BrowserUseSession] = []
+        with self._lock:
+            while self._finished:
+                session_id, last_access = next(iter(self._finished.items()))
+                if (
+                    len(self._finished) <= _MAX_FINISHED_SESSIONS
+                    and now - last_access < _SESSION_TTL
+                ):
+                    break
+                self._finished.popitem(last=False)
+                session = self._sessions.get(session_id)
+                if session is not None:
+                    evicted.append(session)
+
+        for session in evicted:
+            record = session.snapshot()
+            record.pop("queue_position", None)
+            spilled = spill_session_record(session.session_id, record)
+            with self._lock:
+                if not spilled:
+                    # Keep it in memory and retry later rather than losing it.
+                    self._finished[session.session_id] = time.monotonic()
+                    continue
+                self._sessions.pop(session.session_id, None)
+                self._spilled_count += 1
+            log.debug("Evicted finished browser-use session %s", session.session_id)
+
+    def memory_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sessions = list(self._sessions.values())
+            finished = len(self._finished)
+        per_session = {session.session_id: session.memory_bytes() for session in sessions}
+        return {
+            "sessions": per_session,
+            "total_bytes": sum(per_session.values()),
+            "in_memory": len(per_session),
+            "finished_in_memory": finished,
+            "spilled": self._spilled_count,
+        }
+
+    def _publish_queue_positions(self) -> None:
+        for session_id in self._scheduler.queued_keys():
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session._publish_status()
+
     def start_session(
         self,
         command: str,
@@ -954,15 +1743,57 @@ class BrowserUseManager:
         model: str,
         max_steps: int,
         conversation_context: str | None = None,
+        async_start: bool | None = None,
+        priority: int = 0,
     ) -> str:
+        """Create and start a session, returning its identifier.
+
+        With *async_start* the identifier is returned immediately while the
+        session is ``preparing``; shared browser failures are then reported
+        through the session status instead of being raised.  ``None`` uses the
+        ``BROWSER_USE_ASYNC_START`` default.
+
+        When the concurrency caps are reached the session is ``queued`` (higher
+        *priority* first) and started once a slot frees up.  Raises
+        :class:`QueueFullError` when the queue is full as well.
+        """
+
         session = BrowserUseSession(
             command=command,
             model_name=model,
             max_steps=max_steps,
             history_context=conversation_context,
         )
+        session._queue_position = self._scheduler.position
+        if async_start is None:
+            async_start = _async_start_default()
         with self._lock:
             self._sessions[session.session_id] = session
+        try:
+            admitted = self._scheduler.submit(
+                session.session_id,
+                _model_provider(model),
+                lambda: self._launch(session),
+                priority=priority,
+            )
+        except QueueFullError:
+            with self._lock:
+                self._sessions.pop(session.session_id, None)
+            raise
+        if not admitted:
+            session._set_status("queued")
+            log.info(
+                "Queued browser-use session %s for command: %s", session.session_id, command
+            )
+            return session.session_id
+        if async_start:
+            self._launch(session)
+            log.info(
+                "Started browser-use session %s (async) for command: %s",
+                session.session_id,
+                command,
+            )
+            return session.session_id
         try:
             prepare_future = asyncio.run_coroutine_threadsafe(
                 session.prepare(), self._loop
@@ -971,22 +1802,68 @@ class BrowserUseManager:
         except Exception:
             with self._lock:
                 self._sessions.pop(session.session_id, None)
+            self._scheduler.finish(session.session_id)
+            self._publish_queue_positions()
             raise
-        asyncio.run_coroutine_threadsafe(session.run(), self._loop)
+        asyncio.run_coroutine_threadsafe(
+            self._run_admitted(session, session.run()), self._loop
+        )
         log.info("Started browser-use session %s for command: %s", session.session_id, command)
         return session.session_id
 
-    def get_status(self, session_id: str) -> Optional[Dict[str, Any]]:
-        session = self._sessions.get(session_id)
+    def get_status(
+        self, session_id: str, since: int | None = None
+    ) -> Optional[Dict[str, Any]]:
+        session = self._touch(session_id)
         if not session:
-            return None
-        return session.snapshot()
+            record = load_session_record(session_id)
+            return _slice_session_record(record, since) if record else None
+        return session.snapshot(since)
+
+    def _touch(self, session_id: str) -> BrowserUseSession | None:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and session_id in self._finished:
+                self._finished[session_id] = time.monotonic()
+                self._finished.move_to_end(session_id)
+        self._evict_finished()
+        return session
+
+    def stream_events(
+        self, session_id: str, since: int | None = None
+    ) -> Optional[Iterator[tuple[str, Dict[str, Any]]]]:
+        session = self._touch(session_id)
+        if not session:
+            record = load_session_record(session_id)
+            if record is None:
+                return None
+            return iter([("snapshot", _slice_session_record(record, since))])
+        return session.iter_events(since)
+
+    def stream_events_async(
+        self, session_id: str, since: int | None = None
+    ) -> Optional[AsyncIterator[tuple[str, Dict[str, Any]]]]:
+        """:meth:`stream_events` for event-loop servers.
+
+        The lookup may read a spilled record from disk, so call it from a
+        worker thread; the returned iterator then runs on the caller's loop.
+        """
+
+        session = self._touch(session_id)
+        if not session:
+            record = load_session_record(session_id)
+            if record is None:
+                return None
+            return _iter_async([("snapshot", _slice_session_record(record, since))])
+        return session.iter_events_async(since)
 
     def add_instruction(
         self, session_id: str, instruction: str
     ) -> Literal["accepted", "not_found", "not_running", "invalid"]:
         session = self._sessions.get(session_id)
         if not session:
+            if load_session_record(session_id) is not None:
+                return "not_running"
             return "not_found"
 
         outcome = session.add_instruction(instruction)
@@ -1000,6 +1877,14 @@ class BrowserUseManager:
         session = self._sessions.get(session_id)
         if not session:
             return False
+        if self._scheduler.cancel(session_id):
+            # Never started, so there is no task to cancel.
+            session._set_status("cancelled")
+            session._record_history()
+            session._agent_ready.set()
+            self._publish_queue_positions()
+            self._mark_finished(session_id)
+            return True
         future = asyncio.run_coroutine_threadsafe(session.request_cancel(), self._loop)
         try:
             future.result(timeout=10)
@@ -1017,17 +1902,76 @@ class BrowserUseManager:
                 future.result(timeout=5)
             except Exception:  # pragma: no cover - best effort
                 pass
+        future = asyncio.run_coroutine_threadsafe(close_browser_context_pools(), self._loop)
+        try:
+            future.result(timeout=5)
+        except Exception:  # pragma: no cover - best effort
+            pass
         self._loop.call_soon_threadsafe(self._loop.stop)
         self._thread.join(timeout=5)
 
 
 class RemoteBrowserUseManager:
-    """Proxy ``BrowserUseManager`` requests to the automation server."""
+    """Proxy ``BrowserUseManager`` requests to the automation server.
+
+    Requests share one keep-alive :class:`requests.Session` so status polls
+    reuse pooled connections instead of opening a new one each time.
+    """
 
     _BASE_TIMEOUT = (5.0, 120.0)
 
-    def __init__(self) -> None:
+    def __init__(self, *, pool_size: int | None = None) -> None:
         self._lock = threading.Lock()
+        self._pool_size = max(1, pool_size or _REMOTE_POOL_SIZE)
+        self._http = self._create_http_session(self._pool_size)
+        self._request_count = 0
+        self._failure_count = 0
+
+    @staticmethod
+    def _create_http_session(pool_size: int) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=_REMOTE_POOL_HOSTS,
+            pool_maxsize=pool_size,
+            max_retries=0,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Return connection pool usage for the automation server client."""
+
+        pools: list[Dict[str, Any]] = []
+        seen: set[int] = set()
+        for adapter in self._http.adapters.values():
+            manager = getattr(adapter, "poolmanager", None)
+            if manager is None or id(manager) in seen:
+                continue
+            seen.add(id(manager))
+            for key in list(manager.pools.keys()):
+                pool = manager.pools.get(key)
+                if pool is None:
+                    continue
+                pools.append(
+                    {
+                        "endpoint": f"{pool.scheme}://{pool.host}:{pool.port}",
+                        "connections_created": pool.num_connections,
+                        "requests": pool.num_requests,
+                        "idle_connections": pool.pool.qsize() if pool.pool else 0,
+                    }
+                )
+
+        with self._lock:
+            request_count = self._request_count
+            failure_count = self._failure_count
+        return {
+            "pool_size": self._pool_size,
+            "requests": request_count,
+            "failures": failure_count,
+            "pools": pools,
+            "endpoint_health": get_endpoint_health(),
+        }
 
     def _request(
         self,
@@ -1035,22 +1979,34 @@ class RemoteBrowserUseManager:
         path: str,
         *,
         json_payload: dict[str, object] | None = None,
+        params: dict[str, object] | None = None,
         timeout: float | tuple[float, float] | None = None,
+        stream: bool = False,
     ) -> requests.Response:
         last_exc: requests.RequestException | None = None
-        for refresh in (False, True):
-            base_url = get_vnc_api_base(refresh=refresh) if refresh else get_vnc_api_base()
+        extra: dict[str, object] = {"params": params} if params else {}
+        if stream:
+            extra["stream"] = True
+        for _attempt in range(2):
+            base_url = get_vnc_api_base()
             url = f"{base_url}/browser-use{path}"
+            with self._lock:
+                self._request_count += 1
             try:
-                response = requests.request(
+                response = self._http.request(
                     method,
                     url,
                     json=json_payload,
                     timeout=timeout,
+                    **extra,
                 )
             except requests.RequestException as exc:  # pragma: no cover - network failure path
                 last_exc = exc
+                with self._lock:
+                    self._failure_count += 1
                 log.debug("Remote browser-use request to %s failed: %s", url, exc)
+                # Only the failing endpoint is re-probed; healthy ones stay cached.
+                mark_vnc_endpoint_unhealthy(base_url)
                 continue
             return response
 
@@ -1086,6 +2042,8 @@ class RemoteBrowserUseManager:
         model: str,
         max_steps: int,
         conversation_context: str | None = None,
+        async_start: bool | None = None,
+        priority: int = 0,
     ) -> str:
         payload = {
             "command": command,
@@ -1094,6 +2052,10 @@ class RemoteBrowserUseManager:
         }
         if conversation_context:
             payload["conversation_context"] = conversation_context
+        if async_start is not None:
+            payload["async_start"] = async_start
+        if priority:
+            payload["priority"] = priority
         response = self._request(
             "post",
             "/session",
@@ -1115,16 +2077,25 @@ class RemoteBrowserUseManager:
         message, code = self._error_details(response)
         if response.status_code == 400:
             raise ValueError(message)
+        if response.status_code == 429:
+            try:
+                retry_after = int(response.headers.get("Retry-After", ""))
+            except ValueError:
+                retry_after = 1
+            raise QueueFullError(message, retry_after=max(1, retry_after))
         if response.status_code == 503 and code == "shared_browser_unavailable":
             raise RuntimeError(message)
         if response.status_code in {503, 504}:
             raise RuntimeError(message)
         raise RuntimeError(message)
 
-    def get_status(self, session_id: str) -> Optional[Dict[str, Any]]:
+    def get_status(
+        self, session_id: str, since: int | None = None
+    ) -> Optional[Dict[str, Any]]:
         response = self._request(
             "get",
             f"/session/{session_id}",
+            params={"since": since} if since else None,
             timeout=15.0,
         )
 
@@ -1141,6 +2112,83 @@ class RemoteBrowserUseManager:
         message, _ = self._error_details(response)
         raise RuntimeError(message)
 
+    def stream_events(
+        self, session_id: str, since: int | None = None
+    ) -> Optional[Iterator[tuple[str, Dict[str, Any]]]]:
+        """Relay the automation server's progress stream for *session_id*."""
+
+        response = self._request(
+            "get",
+            f"/session/{session_id}/stream",
+            params={"since": since} if since else None,
+            # The server sends heartbeats, so a read timeout means it is gone.
+            timeout=(5.0, _EVENT_HEARTBEAT * 3),
+            stream=True,
+        )
+
+        if response.status_code == 404:
+            response.close()
+            return None
+        if response.status_code != 200:
+            message, _ = self._error_details(response)
+            response.close()
+            raise RuntimeError(message)
+
+        response.encoding = response.encoding or "utf-8"
+
+        def _relay() -> Iterator[tuple[str, Dict[str, Any]]]:
+            try:
+                for event, data in parse_sse_lines(
+                    response.iter_lines(decode_unicode=True)
+                ):
+                    if isinstance(data, dict):
+                        yield event, data
+            except requests.RequestException as exc:
+                log.debug("Remote event stream for %s ended: %s", session_id, exc)
+            finally:
+                response.close()
+
+        return _relay()
+
+    def get_screenshot(self, digest: str) -> tuple[bytes, str] | None:
+        """Fetch a stored step screenshot from the automation server."""
+
+        response = self._request(
+            "get",
+            f"/screenshots/{digest}",
+            timeout=15.0,
+        )
+
+        if response.status_code == 200:
+            mimetype = response.headers.get("Content-Type") or "image/png"
+            return response.content, mimetype
+        if response.status_code == 404:
+            return None
+
+        message, _ = self._error_details(response)
+        raise RuntimeError(message)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return the automation server's metrics plus this client's pool stats."""
+
+        payload: Dict[str, Any] = {}
+        try:
+            # _request prefixes /browser-use, so this is the JSON manager
+            # metrics; the server's bare /metrics is Prometheus text.
+            response = self._request("get", "/metrics", timeout=15.0)
+        except RuntimeError as exc:
+            payload["error"] = str(exc)
+        else:
+            if response.status_code == 200:
+                try:
+                    payload = response.json()
+                except ValueError:
+                    payload["error"] = "automation server returned malformed metrics"
+            else:
+                payload["error"], _ = self._error_details(response)
+        payload["remote_pool"] = self.pool_stats()
+        return payload
+
     def add_instruction(
         self, session_id: str, instruction: str
     ) -> Literal["accepted", "not_found", "not_running", "invalid"]:
@@ -1179,14 +2227,56 @@ class RemoteBrowserUseManager:
         message, _ = self._error_details(response)
         raise RuntimeError(message)
 
-    def shutdown(self) -> None:  # pragma: no cover - remote manager has no local resources
-        return None
+    def shutdown(self) -> None:
+        self._http.close()
 
 
 _browser_use_manager: BrowserUseManager | None = None
 _remote_browser_use_manager: RemoteBrowserUseManager | None = None
 
 
+def _async_start_default() -> bool:
+    return env_flag("BROWSER_USE_ASYNC_START", default=False)
+
+
+def _model_provider(model_name: str) -> str:
+    """Return the LLM provider ``_create_llm`` would pick for *model_name*."""
+
+    model_key = (model_name or "").strip().lower()
+    if not model_key or model_key.startswith("gemini"):
+        return "gemini"
+    if model_key == "groq" or any(
+        token in model_key for token in ("/", "llama", "mixtral", "gemma")
+    ):
+        return "groq"
+    if os.getenv("GEMINI_API_KEY"):
+        return "gemini"
+    if os.getenv("GROQ_API_KEY"):
+        return "groq"
+    return "other"
+
+
+def _model_concurrency_limits() -> Dict[str, int]:
+    limits: Dict[str, int] = {}
+    for provider, default in _MODEL_CONCURRENCY_DEFAULTS.items():
+        raw = os.getenv(f"BROWSER_USE_{provider.upper()}_CONCURRENCY", default)
+        try:
+            limits[provider] = max(0, int(raw))
+        except ValueError:
+            log.warning("Ignoring invalid concurrency limit for %s: %s", provider, raw)
+    return limits
+
+
+def _context_pool_enabled() -> bool:
+    """Whether remote sessions lease an isolated browser context.
+
+    Only the session's first page is isolated; new tabs the agent opens still
+    land in the shared default context (see ``agent.browser.context_pool``).
+    """
+
+    return env_flag("BROWSER_USE_CONTEXT_POOL", default=False)
+
+
 def _use_remote_manager() -> bool:
     return env_flag("BROWSER_USE_REMOTE_API", default=False)
 
@@ -3,6 +3,7 @@ import logging
 from typing import Any, Dict, Optional
 from ..utils.html import strip_html
 from ..browser.dom import DOMElementNode
+from ..browser.dom_compact import CompactDOMTree, CompactNode
 
 log = logging.getLogger("controller")
 MAX_STEPS = max(1, int(os.getenv("MAX_STEPS", "15")))
@@ -49,7 +50,7 @@ def build_prompt(
     page: str,
     hist,
     screenshot: bool = False,
-    elements: DOMElementNode | list | None = None,
+    elements: DOMElementNode | CompactDOMTree | list | None = None,
     error: str | None = None,
     *,
     element_catalog_text: str = "",
@@ -183,14 +184,17 @@ def build_prompt(
                 error_line = "\n".join(lines) + "\n--------------------------------\n"
     dom_text = strip_html(page)
     if elements:
-        nodes: list[DOMElementNode] = []
-        if isinstance(elements, DOMElementNode):
+        nodes: list[DOMElementNode | CompactNode] = []
+        if isinstance(elements, CompactDOMTree):
+            nodes.extend(elements.interactive())
+            dom_text = elements.to_text(max_lines=None)
+        elif isinstance(elements, DOMElementNode):
             _collect_interactive(elements, nodes)
             dom_text = elements.to_text(max_lines=None)
             #print(dom_text)
         elif isinstance(elements, list):
             for n in elements:
-                if isinstance(n, DOMElementNode):
+                if isinstance(n, (DOMElementNode, CompactNode)):
                     _collect_interactive(n, nodes)
         nodes.sort(key=lambda x: x.highlightIndex or 0)
         elem_lines = "\n".join(
@@ -1,4 +1,4 @@
-from ..utils.history import load_hist, save_hist
+from ..utils.history import append_hist_record, load_hist
 
 
 def get_memory():
@@ -6,7 +6,5 @@ def get_memory():
 
 
 def update_memory(item):
-    h = load_hist()
-    h.append(item)
-    save_hist(h)
-    return h
+    append_hist_record(item)
+    return load_hist()
@@ -1,65 +1,202 @@
 import os
 import json
 import logging
-from typing import Any, Sequence
+import shutil
+import threading
+from typing import Any, Iterable, Sequence
 
 log = logging.getLogger(__name__)
 
 LOG_DIR = os.getenv("LOG_DIR", "./")
 os.makedirs(LOG_DIR, exist_ok=True)
+# Legacy single-document history file.  It is migrated into the append-only
+# log on first access and kept only as a backup afterwards.
 HIST_FILE = os.path.join(LOG_DIR, "conversation_history.json")
+HIST_LOG_FILE = os.path.join(LOG_DIR, "conversation_history.jsonl")
 
-def load_hist():
+_TAIL_BLOCK_SIZE = 64 * 1024
+
+# Number of recent interactions included in system prompts.
+PROMPT_HISTORY_LIMIT = 5
+
+_HIST_LOCK = threading.RLock()
+
+
+def _encode_record(entry: Any) -> bytes:
+    return (json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def _decode_lines(lines: Iterable[bytes]) -> list[Any]:
+    records: list[Any] = []
+    skipped = 0
+    for raw in lines:
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            records.append(json.loads(raw.decode("utf-8")))
+        except (UnicodeDecodeError, json.JSONDecodeError, ValueError):
+            skipped += 1
+    if skipped:
+        log.warning("Skipped %d malformed history record(s) in %s", skipped, HIST_LOG_FILE)
+    return records
+
+
+def _write_records(path: str, records: Iterable[Any]) -> None:
+    """Atomically replace *path* with one JSON record per line."""
+
+    temp_file = path + ".tmp"
+    try:
+        with open(temp_file, "wb") as f:
+            for record in records:
+                f.write(_encode_record(record))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, path)
+    except Exception:
+        try:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+        except Exception:
+            pass
+        raise
+
+
+def _load_legacy_hist() -> list[Any]:
     try:
-        if not os.path.exists(HIST_FILE):
-            return []
-        
-        # Check if file is empty or has invalid content
         with open(HIST_FILE, "r", encoding="utf-8") as f:
             content = f.read().strip()
-            if not content:
-                # File is empty, return empty list
-                return []
-            
-            # Parse JSON content
-            return json.loads(content)
-            
+        if not content:
+            return []
+        data = json.loads(content)
     except (json.JSONDecodeError, ValueError) as e:
         log.error("load_hist JSON parsing error: %s", e)
         # File contains invalid JSON, backup corrupted file and return empty list
         try:
-            import shutil
             backup_file = HIST_FILE + ".corrupted.bak"
             shutil.move(HIST_FILE, backup_file)
             log.info("Corrupted history file backed up to: %s", backup_file)
         except Exception as backup_error:
             log.error("Failed to backup corrupted file: %s", backup_error)
         return []
+    return data if isinstance(data, list) else []
+
+
+def _migrate_legacy_hist() -> None:
+    """Convert ``conversation_history.json`` into the JSONL log once."""
+
+    if os.path.exists(HIST_LOG_FILE) or not os.path.exists(HIST_FILE):
+        return
+
+    records = _load_legacy_hist()
+    if not os.path.exists(HIST_FILE):
+        # The legacy file was corrupted and has been moved aside.
+        return
+
+    _write_records(HIST_LOG_FILE, records)
+    backup_file = HIST_FILE + ".migrated.bak"
+    try:
+        shutil.move(HIST_FILE, backup_file)
+    except Exception as e:
+        log.error("Failed to move migrated history file: %s", e)
+    log.info(
+        "Migrated %d history entries from %s to %s", len(records), HIST_FILE, HIST_LOG_FILE
+    )
+
+
+def append_hist_record(entry: Any) -> None:
+    """Durably append a single record to the history log.
+
+    Only the new record is serialised; the write is flushed and ``fsync``'d so
+    a finished session survives a crash immediately after this call returns.
+    """
+
+    data = _encode_record(entry)
+    with _HIST_LOCK:
+        _migrate_legacy_hist()
+        fd = os.open(HIST_LOG_FILE, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            # Terminate a partial line left behind by an interrupted write so
+            # the new record does not get glued onto it.
+            size = os.fstat(fd).st_size
+            if size and os.pread(fd, 1, size - 1) != b"\n":
+                data = b"\n" + data
+            os.write(fd, data)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def tail_hist(limit: int) -> list[Any]:
+    """Return the last *limit* history records without parsing the whole log."""
+
+    if limit <= 0:
+        return load_hist()
+
+    try:
+        with _HIST_LOCK:
+            _migrate_legacy_hist()
+            if not os.path.exists(HIST_LOG_FILE):
+                return []
+            with open(HIST_LOG_FILE, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                position = f.tell()
+                buffer = b""
+                # One extra newline is needed so the first line in the buffer
+                # is guaranteed to be complete.
+                while position > 0 and buffer.count(b"\n") <= limit:
+                    read_size = min(_TAIL_BLOCK_SIZE, position)
+                    position -= read_size
+                    f.seek(position)
+                    buffer = f.read(read_size) + buffer
+    except Exception as e:
+        log.error("tail_hist error: %s", e)
+        return []
+
+    lines = buffer.split(b"\n")
+    if position > 0:
+        lines = lines[1:]
+    records = _decode_lines(lines)
+    return records[-limit:]
+
+
+def compact_hist(max_entries: int | None = None) -> int:
+    """Rewrite the history log dropping malformed lines.
+
+    When *max_entries* is given only the most recent entries are kept.  This is
+    intended to run offline (see ``python -m agent.utils.history --compact``)
+    and returns the number of records retained.
+    """
+
+    with _HIST_LOCK:
+        records = load_hist()
+        if max_entries is not None and max_entries >= 0:
+            records = records[-max_entries:] if max_entries else []
+        _write_records(HIST_LOG_FILE, records)
+    log.info("Compacted history log %s to %d entries", HIST_LOG_FILE, len(records))
+    return len(records)
+
+
+def load_hist():
+    try:
+        with _HIST_LOCK:
+            _migrate_legacy_hist()
+            if not os.path.exists(HIST_LOG_FILE):
+                return []
+            with open(HIST_LOG_FILE, "rb") as f:
+                return _decode_lines(f)
     except Exception as e:
         log.error("load_hist error: %s", e)
         return []
 
+
 def save_hist(h):
     try:
-        # Write to a temporary file first to avoid corruption during writes
-        temp_file = HIST_FILE + ".tmp"
-        with open(temp_file, "w", encoding="utf-8") as f:
-            json.dump(h, f, ensure_ascii=False, indent=2)
-        
-        # Atomically replace the original file
-        import shutil
-        shutil.move(temp_file, HIST_FILE)
-        
+        with _HIST_LOCK:
+            _migrate_legacy_hist()
+            _write_records(HIST_LOG_FILE, h)
     except Exception as e:
         log.error("save_hist error: %s", e)
-        # Clean up temp file if it exists
-        try:
-            import os
-            temp_file = HIST_FILE + ".tmp"
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
-        except Exception:
-            pass
 
 
 def append_history_entry(user, bot, url=None):
@@ -77,8 +214,6 @@ def append_history_entry(user, bot, url=None):
     """
 
     try:
-        history = load_hist()
-
         if url is None:
             try:
                 from agent.browser.vnc import get_url
@@ -86,8 +221,7 @@ def append_history_entry(user, bot, url=None):
             except Exception:
                 url = None
 
-        history.append({"user": user, "bot": bot, "url": url})
-        save_hist(history)
+        append_hist_record({"user": user, "bot": bot, "url": url})
     except Exception as e:
         log.error("append_history_entry error: %s", e)
 
@@ -125,7 +259,7 @@ def _first_non_empty(items: Sequence[Any]) -> str:
 
 
 def format_history_for_prompt(
-    history: Sequence[dict[str, Any]] | None, *, limit: int = 5
+    history: Sequence[dict[str, Any]] | None, *, limit: int = PROMPT_HISTORY_LIMIT
 ) -> str:
     """Format recent conversation history for use in system prompts."""
 
@@ -205,3 +339,23 @@ def format_history_for_prompt(
 
     return "\n".join(blocks).strip()
 
+
+def main(argv: Sequence[str] | None = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintain the conversation history log")
+    parser.add_argument("--compact", action="store_true", help="Rewrite the log dropping malformed records")
+    parser.add_argument("--keep", type=int, default=None, help="Only keep the most recent N entries when compacting")
+    args = parser.parse_args(argv)
+
+    if not args.compact:
+        parser.print_help()
+        return 1
+
+    retained = compact_hist(args.keep)
+    print(f"{HIST_LOG_FILE}: {retained} entries")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
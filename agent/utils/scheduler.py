@@ -0,0 +1,187 @@
+"""Admission control for browser-use sessions.
+
+``AdmissionScheduler`` caps how many sessions run at once, both globally and
+per group (the LLM provider, since Gemini and Groq enforce different rate
+limits).  Sessions that cannot start yet wait in a priority queue that is FIFO
+within each priority; when the queue itself is full, submissions are rejected
+with a suggested retry delay.
+"""
+
+from __future__ import annotations
+
+import itertools
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict
+
+log = logging.getLogger(__name__)
+
+# Assumed run time before any session has finished, used for Retry-After.
+_DEFAULT_DURATION = 60.0
+_DURATION_SMOOTHING = 0.2
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a session cannot be admitted or queued."""
+
+    def __init__(self, message: str, *, retry_after: int) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass(order=True)
+class _Entry:
+    sort_key: tuple[int, int]
+    key: str = field(compare=False)
+    group: str = field(compare=False)
+    on_admit: Callable[[], None] = field(compare=False)
+
+
+class AdmissionScheduler:
+    def __init__(
+        self,
+        *,
+        max_active: int,
+        max_queued: int,
+        group_limits: Dict[str, int] | None = None,
+    ) -> None:
+        self._max_active = max(1, max_active)
+        self._max_queued = max(0, max_queued)
+        # A limit of 0 (or a missing group) means only the global cap applies.
+        self._group_limits = {
+            group: limit for group, limit in (group_limits or {}).items() if limit > 0
+        }
+        self._active: Dict[str, tuple[str, float]] = {}
+        self._queue: list[_Entry] = []
+        self._sequence = itertools.count()
+        self._average_duration = _DEFAULT_DURATION
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        key: str,
+        group: str,
+        on_admit: Callable[[], None],
+        *,
+        priority: int = 0,
+    ) -> bool:
+        """Admit *key* now (``True``) or queue it (``False``).
+
+        *on_admit* is only called for queued entries, once they are admitted.
+        Raises :class:`QueueFullError` when the queue has no room left.
+        """
+
+        with self._lock:
+            # Queued entries are only ever waiting on a saturated cap, so a
+            # group with a free slot cannot jump ahead of anyone here.
+            if self._has_capacity_locked(group):
+                self._active[key] = (group, time.monotonic())
+                return True
+            if len(self._queue) >= self._max_queued:
+                retry_after = self._retry_after_locked()
+                raise QueueFullError(
+                    f"実行待ちのセッションが上限（{self._max_queued}件）に達しています。"
+                    f"{retry_after}秒ほど待ってから再度お試しください。",
+                    retry_after=retry_after,
+                )
+            entry = _Entry((-priority, next(self._sequence)), key, group, on_admit)
+            self._queue.append(entry)
+            self._queue.sort()
+        log.info("Queued session %s (group=%s, priority=%d)", key, group, priority)
+        return False
+
+    def finish(self, key: str) -> None:
+        """Free *key*'s slot and admit whichever queued entries now fit."""
+
+        with self._lock:
+            active = self._active.pop(key, None)
+            if active is not None:
+                duration = time.monotonic() - active[1]
+                self._average_duration += _DURATION_SMOOTHING * (
+                    duration - self._average_duration
+                )
+            admitted = self._admit_locked()
+        self._notify(admitted)
+
+    def cancel(self, key: str) -> bool:
+        """Drop *key* from the queue; returns ``False`` if it was not queued."""
+
+        with self._lock:
+            for index, entry in enumerate(self._queue):
+                if entry.key == key:
+                    del self._queue[index]
+                    break
+            else:
+                return False
+            admitted = self._admit_locked()
+        self._notify(admitted)
+        return True
+
+    def position(self, key: str) -> int | None:
+        """Return *key*'s 1-based place in the queue, or ``None``."""
+
+        with self._lock:
+            for index, entry in enumerate(self._queue):
+                if entry.key == key:
+                    return index + 1
+        return None
+
+    def queued_keys(self) -> list[str]:
+        with self._lock:
+            return [entry.key for entry in self._queue]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            active_by_group: Dict[str, int] = {}
+            for group, _started in self._active.values():
+                active_by_group[group] = active_by_group.get(group, 0) + 1
+            return {
+                "max_active": self._max_active,
+                "max_queued": self._max_queued,
+                "group_limits": dict(self._group_limits),
+                "active": len(self._active),
+                "active_by_group": active_by_group,
+                "queued": len(self._queue),
+                "average_duration": round(self._average_duration, 3),
+            }
+
+    def _has_capacity_locked(self, group: str) -> bool:
+        if len(self._active) >= self._max_active:
+            return False
+        limit = self._group_limits.get(group)
+        if limit is None:
+            return True
+        running = sum(1 for active_group, _ in self._active.values() if active_group == group)
+        return running < limit
+
+    def _admit_locked(self) -> list[_Entry]:
+        admitted: list[_Entry] = []
+        index = 0
+        # Skip entries whose group is saturated so one provider's backlog
+        # does not hold up sessions for another.
+        while index < len(self._queue) and len(self._active) < self._max_active:
+            entry = self._queue[index]
+            if self._has_capacity_locked(entry.group):
+                del self._queue[index]
+                self._active[entry.key] = (entry.group, time.monotonic())
+                admitted.append(entry)
+            else:
+                index += 1
+        return admitted
+
+    def _retry_after_locked(self) -> int:
+        return max(1, math.ceil(self._average_duration / self._max_active))
+
+    def _notify(self, admitted: list[_Entry]) -> None:
+        for entry in admitted:
+            try:
+                entry.on_admit()
+            except Exception:  # pragma: no cover - defensive
+                log.exception("Failed to start admitted session %s", entry.key)
+                self.finish(entry.key)
+
+
+__all__ = ["AdmissionScheduler", "QueueFullError"]
@@ -0,0 +1,237 @@
+"""Re-encode step screenshots into size-appropriate variants.
+
+browser-use captures full-resolution PNGs.  Each consumer needs far less:
+
+* ``model`` – what the LLM sees; JPEG keeps text legible at a fraction of
+  the size.
+* ``preview`` – the thumbnail shown in the chat UI.
+* ``archive`` – the copy kept in screenshot storage and history.
+
+Each variant is configured with ``SCREENSHOT_<VARIANT>_FORMAT`` (``jpeg``,
+``webp``, ``png`` or ``original``), ``_QUALITY`` (1-100) and ``_MAX_WIDTH`` /
+``_MAX_HEIGHT`` (0 disables the bound).  Pillow is optional; without it, or
+for images it cannot decode, the original bytes are passed through.
+
+:func:`difference_hash` fingerprints a frame so visually identical
+consecutive screenshots can be detected without comparing pixels.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import io
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable
+
+from agent.utils.screenshots import decode_screenshot, sniff_image_mimetype
+
+try:  # Optional dependency; shipped with browser-use.
+    from PIL import Image  # type: ignore
+except Exception:  # pragma: no cover - Pillow missing
+    Image = None  # type: ignore[assignment]
+
+log = logging.getLogger(__name__)
+
+# 16 x 16 cells gives a 256-bit hash: coarse enough to ignore a blinking
+# caret, fine enough to notice a new line of text.
+DHASH_SIZE = 16
+
+_FORMATS = {"jpeg": ("JPEG", "image/jpeg"), "webp": ("WEBP", "image/webp"), "png": ("PNG", "image/png")}
+
+
+@dataclass(frozen=True)
+class ScreenshotVariant:
+    name: str
+    format: str
+    quality: int
+    max_width: int
+    max_height: int
+
+    @classmethod
+    def from_env(
+        cls, name: str, *, format: str, quality: int, max_width: int, max_height: int
+    ) -> "ScreenshotVariant":
+        prefix = f"SCREENSHOT_{name.upper()}_"
+        chosen = os.getenv(f"{prefix}FORMAT", format).strip().lower()
+        if chosen == "jpg":
+            chosen = "jpeg"
+        if chosen not in _FORMATS and chosen != "original":
+            log.warning("Unknown %sFORMAT %r; using %s", prefix, chosen, format)
+            chosen = format
+        return cls(
+            name=name,
+            format=chosen,
+            quality=min(100, max(1, int(os.getenv(f"{prefix}QUALITY", str(quality))))),
+            max_width=max(0, int(os.getenv(f"{prefix}MAX_WIDTH", str(max_width)))),
+            max_height=max(0, int(os.getenv(f"{prefix}MAX_HEIGHT", str(max_height)))),
+        )
+
+
+MODEL_VARIANT = ScreenshotVariant.from_env(
+    "model", format="jpeg", quality=75, max_width=1280, max_height=1280
+)
+PREVIEW_VARIANT = ScreenshotVariant.from_env(
+    "preview", format="webp", quality=60, max_width=800, max_height=800
+)
+ARCHIVE_VARIANT = ScreenshotVariant.from_env(
+    "archive", format="webp", quality=80, max_width=1920, max_height=1920
+)
+
+
+def to_data_uri(image: bytes, mimetype: str | None = None) -> str:
+    mimetype = mimetype or sniff_image_mimetype(image[:16])
+    return f"data:{mimetype};base64,{base64.b64encode(image).decode('ascii')}"
+
+
+def _encode(source, original: bytes, variant: ScreenshotVariant) -> tuple[bytes, str]:
+    original_type = sniff_image_mimetype(original[:16])
+    if variant.format == "original":
+        return original, original_type
+
+    pil_format, mimetype = _FORMATS[variant.format]
+    image = source
+    bounds = (variant.max_width or image.width, variant.max_height or image.height)
+    resize = image.width > bounds[0] or image.height > bounds[1]
+    if not resize and mimetype == original_type:
+        # Already in the requested shape; re-encoding would only lose quality.
+        return original, original_type
+    if resize:
+        image = image.copy()
+        image.thumbnail(bounds, Image.Resampling.LANCZOS)
+    if pil_format == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+    elif pil_format == "WEBP" and image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+    buffer = io.BytesIO()
+    if pil_format == "PNG":
+        image.save(buffer, format="PNG", optimize=True)
+    else:
+        image.save(buffer, format=pil_format, quality=variant.quality)
+    encoded = buffer.getvalue()
+    if not resize and len(encoded) >= len(original):
+        return original, original_type
+    return encoded, mimetype
+
+
+def open_screenshot(data: str | bytes | None) -> tuple[bytes, Any] | None:
+    """Decode *data* into ``(raw bytes, PIL image)``.
+
+    The image is ``None`` when Pillow is unavailable or cannot read the data.
+    Returns ``None`` when *data* is empty or not base64.
+    """
+
+    if not data:
+        return None
+    try:
+        original = decode_screenshot(data)
+    except (binascii.Error, ValueError) as exc:
+        log.debug("Discarding undecodable screenshot: %s", exc)
+        return None
+    if not original:
+        return None
+    if Image is None:
+        return original, None
+    try:
+        source = Image.open(io.BytesIO(original))
+        source.load()
+    except Exception as exc:
+        log.debug("Screenshot could not be decoded for re-encoding: %s", exc)
+        return original, None
+    return original, source
+
+
+def difference_hash(opened: tuple[bytes, Any], size: int = DHASH_SIZE) -> int | None:
+    """Return a ``size * size``-bit difference hash of an opened screenshot.
+
+    Each bit records whether a cell of the downscaled greyscale frame is
+    brighter than its right-hand neighbour, so the hash survives re-encoding
+    but changes with layout or content.
+    """
+
+    _, source = opened
+    if source is None:
+        return None
+    small = source.convert("L").resize((size + 1, size), Image.Resampling.BOX)
+    pixels = small.tobytes()
+    value = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for column in range(size):
+            value = (value << 1) | (pixels[offset + column] > pixels[offset + column + 1])
+    return value
+
+
+def hash_distance(first: int, second: int) -> int:
+    return (first ^ second).bit_count()
+
+
+def render_opened(
+    opened: tuple[bytes, Any] | None, variants: Iterable[ScreenshotVariant]
+) -> Dict[str, tuple[bytes, str]]:
+    """Encode an :func:`open_screenshot` result once per variant."""
+
+    if opened is None:
+        return {}
+    original, source = opened
+    variants = list(variants)
+    passthrough = {
+        variant.name: (original, sniff_image_mimetype(original[:16])) for variant in variants
+    }
+    if source is None:
+        return passthrough
+
+    rendered: Dict[str, tuple[bytes, str]] = {}
+    for variant in variants:
+        try:
+            rendered[variant.name] = _encode(source, original, variant)
+        except Exception as exc:  # pragma: no cover - encoder specific failures
+            log.debug("Failed to encode %s screenshot variant: %s", variant.name, exc)
+            rendered[variant.name] = passthrough[variant.name]
+    return rendered
+
+
+def render_variants(
+    data: str | bytes | None, variants: Iterable[ScreenshotVariant]
+) -> Dict[str, tuple[bytes, str]]:
+    """Encode *data* once per variant, returning ``{name: (bytes, mimetype)}``.
+
+    The source is decoded a single time.  Returns an empty mapping when *data*
+    is empty or not base64; undecodable images are passed through unchanged.
+    """
+
+    return render_opened(open_screenshot(data), variants)
+
+
+def encode_data_uri(data_uri: str, variant: ScreenshotVariant) -> tuple[str, str]:
+    """Re-encode an image data URI for *variant*; returns ``(uri, mimetype)``."""
+
+    try:
+        original = decode_screenshot(data_uri)
+    except (binascii.Error, ValueError):
+        original = b""
+    rendered = render_variants(original, (variant,)).get(variant.name)
+    if rendered is None or rendered[0] is original:
+        header = data_uri[5:].partition(";")[0] if data_uri.startswith("data:") else ""
+        return data_uri, header or "image/png"
+    image, mimetype = rendered
+    return to_data_uri(image, mimetype), mimetype
+
+
+__all__ = [
+    "ARCHIVE_VARIANT",
+    "DHASH_SIZE",
+    "MODEL_VARIANT",
+    "PREVIEW_VARIANT",
+    "ScreenshotVariant",
+    "difference_hash",
+    "encode_data_uri",
+    "hash_distance",
+    "open_screenshot",
+    "render_opened",
+    "render_variants",
+    "to_data_uri",
+]
@@ -0,0 +1,126 @@
+"""Content-addressed storage for step screenshots.
+
+Screenshots are stored once under ``LOG_DIR/screenshots`` keyed by the
+SHA-256 digest of the decoded image bytes.  Step payloads and history entries
+only keep the digest, and the image itself is served from
+``/screenshots/<digest>`` by the Flask apps.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import hashlib
+import logging
+import os
+import re
+
+from agent.utils.history import LOG_DIR
+from agent.utils.metrics import REGISTRY
+
+log = logging.getLogger(__name__)
+
+SCREENSHOT_DIR = os.path.join(LOG_DIR, "screenshots")
+# Stored screenshots are content addressed and therefore never change.
+SCREENSHOT_MAX_AGE = 365 * 24 * 3600
+
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+SCREENSHOT_BYTES = REGISTRY.histogram(
+    "screenshot_bytes",
+    "Decoded size of step screenshots passed to store_screenshot.",
+    buckets=(16_384, 65_536, 131_072, 262_144, 524_288, 1_048_576, 2_097_152, 4_194_304),
+)
+
+
+def decode_screenshot(data: str | bytes) -> bytes:
+    """Return raw image bytes from bytes, base64 text or a data URI."""
+
+    if isinstance(data, bytes):
+        return data
+    text = data.strip()
+    if text.startswith("data:"):
+        _, _, text = text.partition(",")
+    return base64.b64decode(text, validate=False)
+
+
+def is_screenshot_digest(value: object) -> bool:
+    return isinstance(value, str) and bool(_DIGEST_RE.match(value))
+
+
+def screenshot_path(digest: str) -> str | None:
+    """Return the on-disk path for *digest* or ``None`` if it is unknown."""
+
+    if not is_screenshot_digest(digest):
+        return None
+    path = os.path.join(SCREENSHOT_DIR, digest[:2], digest)
+    return path if os.path.exists(path) else None
+
+
+def screenshot_url(digest: str) -> str:
+    return f"/screenshots/{digest}"
+
+
+def sniff_image_mimetype(header: bytes) -> str:
+    if header.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    if header.startswith(b"GIF8"):
+        return "image/gif"
+    return "image/png"
+
+
+def store_screenshot(data: str | bytes | None) -> str | None:
+    """Persist *data* (raw bytes, base64 or a data URI) and return its digest.
+
+    Identical images map to the same digest and are written only once.
+    Returns ``None`` when *data* is empty or cannot be decoded/written.
+    """
+
+    if not data:
+        return None
+
+    try:
+        image = decode_screenshot(data)
+    except (binascii.Error, ValueError) as exc:
+        log.debug("Discarding undecodable screenshot: %s", exc)
+        return None
+    if not image:
+        return None
+    SCREENSHOT_BYTES.observe(len(image))
+
+    digest = hashlib.sha256(image).hexdigest()
+    directory = os.path.join(SCREENSHOT_DIR, digest[:2])
+    path = os.path.join(directory, digest)
+    if os.path.exists(path):
+        return digest
+
+    temp_file = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(temp_file, "wb") as f:
+            f.write(image)
+        os.replace(temp_file, path)
+    except OSError as exc:
+        log.error("Failed to store screenshot %s: %s", digest, exc)
+        try:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+        except OSError:
+            pass
+        return None
+    return digest
+
+
+__all__ = [
+    "SCREENSHOT_BYTES",
+    "SCREENSHOT_DIR",
+    "SCREENSHOT_MAX_AGE",
+    "decode_screenshot",
+    "is_screenshot_digest",
+    "screenshot_path",
+    "screenshot_url",
+    "sniff_image_mimetype",
+    "store_screenshot",
+]
@@ -0,0 +1,125 @@
+"""On-disk records for browser-use sessions evicted from memory.
+
+Finished sessions are written once as gzip-compressed JSON under
+``LOG_DIR/sessions`` so status requests for them can still be answered after
+``BrowserUseManager`` has dropped the in-memory object.  Every spill also
+prunes records past the retention limits below.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import os
+import re
+import time
+from typing import Any, Dict
+
+from agent.utils.history import LOG_DIR
+
+log = logging.getLogger(__name__)
+
+SESSION_SPILL_DIR = os.path.join(LOG_DIR, "sessions")
+
+# Spilled records are deleted once older than this many seconds or beyond
+# the newest max count; 0 disables either limit.
+_SPILLED_SESSION_TTL = max(
+    0.0, float(os.getenv("BROWSER_USE_SPILLED_SESSION_TTL", str(7 * 24 * 3600)))
+)
+_MAX_SPILLED_SESSIONS = max(0, int(os.getenv("BROWSER_USE_MAX_SPILLED_SESSIONS", "1000")))
+
+_SESSION_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+_RECORD_SUFFIX = ".json.gz"
+
+
+def _record_path(session_id: str) -> str | None:
+    if not isinstance(session_id, str) or not _SESSION_ID_RE.match(session_id):
+        return None
+    return os.path.join(SESSION_SPILL_DIR, f"{session_id}{_RECORD_SUFFIX}")
+
+
+def spill_session_record(session_id: str, record: Dict[str, Any]) -> bool:
+    """Persist *record* for *session_id*; returns ``False`` on failure."""
+
+    path = _record_path(session_id)
+    if path is None:
+        return False
+
+    temp_file = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(SESSION_SPILL_DIR, exist_ok=True)
+        payload = json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str)
+        with gzip.open(temp_file, "wb", compresslevel=6) as f:
+            f.write(payload.encode("utf-8"))
+        os.replace(temp_file, path)
+    except (OSError, TypeError, ValueError) as exc:
+        log.error("Failed to spill session %s: %s", session_id, exc)
+        try:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+        except OSError:
+            pass
+        return False
+    prune_session_records()
+    return True
+
+
+def prune_session_records(now: float | None = None) -> int:
+    """Delete spilled records past the age and count limits; returns how many."""
+
+    if not _SPILLED_SESSION_TTL and not _MAX_SPILLED_SESSIONS:
+        return 0
+    now = time.time() if now is None else now
+    records: list[tuple[float, str]] = []
+    try:
+        with os.scandir(SESSION_SPILL_DIR) as entries:
+            for entry in entries:
+                session_id = entry.name[: -len(_RECORD_SUFFIX)]
+                if not entry.name.endswith(_RECORD_SUFFIX) or not _SESSION_ID_RE.match(session_id):
+                    continue
+                try:
+                    records.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    continue
+    except OSError:
+        return 0
+
+    records.sort(reverse=True)
+    limit = _MAX_SPILLED_SESSIONS or len(records)
+    expired = records[limit:]
+    if _SPILLED_SESSION_TTL:
+        cutoff = now - _SPILLED_SESSION_TTL
+        expired.extend(record for record in records[:limit] if record[0] < cutoff)
+
+    removed = 0
+    for _, path in expired:
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError as exc:
+            log.debug("Failed to prune session record %s: %s", path, exc)
+    return removed
+
+
+def load_session_record(session_id: str) -> Dict[str, Any] | None:
+    """Return the spilled record for *session_id* or ``None`` if absent."""
+
+    path = _record_path(session_id)
+    if path is None or not os.path.exists(path):
+        return None
+    try:
+        with gzip.open(path, "rb") as f:
+            record = json.loads(f.read().decode("utf-8"))
+    except (OSError, ValueError) as exc:
+        log.warning("Discarding unreadable session record %s: %s", session_id, exc)
+        return None
+    return record if isinstance(record, dict) else None
+
+
+__all__ = [
+    "SESSION_SPILL_DIR",
+    "load_session_record",
+    "prune_session_records",
+    "spill_session_record",
+]
@@ -0,0 +1,73 @@
+"""Helpers for encoding and decoding Server-Sent Events."""
+
+from __future__ import annotations
+
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Iterator
+
+
+def format_sse_event(event: str, data: Any, *, event_id: str | int | None = None) -> str:
+    """Return a single SSE frame carrying *data* as JSON."""
+
+    lines: list[str] = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    payload = json.dumps(data, ensure_ascii=False)
+    lines.extend(f"data: {line}" for line in payload.splitlines() or [""])
+    return "\n".join(lines) + "\n\n"
+
+
+def _stream_event(event: str, data: Any) -> str:
+    event_id = None
+    if event == "step" and isinstance(data, dict):
+        position = data.get("position")
+        if isinstance(position, int):
+            event_id = position + 1
+    return format_sse_event(event, data, event_id=event_id)
+
+
+def encode_sse_stream(events: Iterable[tuple[str, Any]]) -> Iterator[str]:
+    """Encode ``(event, data)`` pairs, tagging step events with their cursor."""
+
+    for event, data in events:
+        yield _stream_event(event, data)
+
+
+async def encode_sse_stream_async(events: AsyncIterable[tuple[str, Any]]) -> AsyncIterator[str]:
+    """:func:`encode_sse_stream` for an async source of events."""
+
+    async for event, data in events:
+        yield _stream_event(event, data)
+
+
+def parse_sse_lines(lines: Iterable[str]) -> Iterator[tuple[str, Any]]:
+    """Decode an SSE line stream back into ``(event, data)`` pairs."""
+
+    event = "message"
+    data_lines: list[str] = []
+    for raw in lines:
+        line = raw.rstrip("\r")
+        if not line:
+            if data_lines:
+                text = "\n".join(data_lines)
+                try:
+                    data: Any = json.loads(text)
+                except ValueError:
+                    data = text
+                yield event, data
+            event = "message"
+            data_lines = []
+            continue
+        if line.startswith(":"):
+            continue
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "event":
+            event = value or "message"
+        elif field == "data":
+            data_lines.append(value)
+
+
+__all__ = ["encode_sse_stream", "encode_sse_stream_async", "format_sse_event", "parse_sse_lines"]
@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+from agent.utils.scheduler import QueueFullError
+from vnc import automation_asgi, automation_server
+
+
+def _client() -> httpx.AsyncClient:
+    transport = httpx.ASGITransport(app=automation_asgi.app)
+    return httpx.AsyncClient(transport=transport, base_url="http://automation")
+
+
+def test_start_session_queue_full_matches_flask_contract(monkeypatch: pytest.MonkeyPatch) -> None:
+    class DummyManager:
+        def start_session(self, command: str, **kwargs) -> str:
+            raise QueueFullError("busy", retry_after=7)
+
+    monkeypatch.setattr(automation_server, "_get_browser_use_manager", lambda: DummyManager())
+
+    async def scenario() -> httpx.Response:
+        async with _client() as client:
+            return await client.post(
+                "/browser-use/session",
+                json={"command": "search", "conversation_context": "ctx"},
+            )
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "7"
+    assert response.json() == {"error": "busy", "code": "queue_full"}
+
+
+def test_instruction_and_validation_errors(monkeypatch: pytest.MonkeyPatch) -> None:
+    captured: dict[str, str] = {}
+
+    class DummyManager:
+        def add_instruction(self, session_id: str, instruction: str) -> str:
+            captured[session_id] = instruction
+            return "not_running"
+
+    monkeypatch.setattr(automation_server, "_get_browser_use_manager", lambda: DummyManager())
+
+    async def scenario() -> tuple[httpx.Response, httpx.Response]:
+        async with _client() as client:
+            empty = await client.post("/browser-use/session/abc/instruction", json={})
+            stopped = await client.post(
+                "/browser-use/session/abc/instruction", json={"instruction": " next "}
+            )
+            return empty, stopped
+
+    empty, stopped = asyncio.run(scenario())
+    assert empty.status_code == 400
+    assert empty.json() == {"error": "instruction empty"}
+    assert stopped.status_code == 409
+    assert stopped.json()["status"] == "not_running"
+    assert captured == {"abc": "next"}
+
+
+def test_stream_lookup_runs_off_the_event_loop_and_events_on_it(monkeypatch: pytest.MonkeyPatch) -> None:
+    threads: list[int] = []
+
+    async def events(session_id: str):
+        threads.append(threading.get_ident())
+        yield "snapshot", {"session_id": session_id, "status": "completed"}
+
+    class DummyManager:
+        def stream_events_async(self, session_id: str, since=None):
+            # Stands in for a spilled session read back from disk.
+            threads.append(threading.get_ident())
+            return events(session_id)
+
+    monkeypatch.setattr(automation_server, "_get_browser_use_manager", lambda: DummyManager())
+
+    async def scenario() -> tuple[httpx.Response, int]:
+        async with _client() as client:
+            response = await client.get("/browser-use/session/abc/stream")
+            return response, threading.get_ident()
+
+    response, loop_thread = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert "event: snapshot" in response.text
+    lookup_thread, stream_thread = threads
+    assert lookup_thread != loop_thread
+    assert stream_thread == loop_thread
+
+
+def test_screencast_frames_are_awaited_on_the_event_loop(monkeypatch: pytest.MonkeyPatch) -> None:
+    opened: dict[str, object] = {}
+
+    class DummySubscriber:
+        def __init__(self) -> None:
+            self.frames = [b"jpeg", b"", None]
+            self.closed = False
+
+        async def get_async(self):
+            opened["reader"] = threading.get_ident()
+            return self.frames.pop(0)
+
+        def close(self) -> None:
+            self.closed = True
+
+    subscriber = DummySubscriber()
+
+    async def fake_websocket() -> str:
+        return "ws://browser"
+
+    def fake_open(websocket_url, settings, *, target_id=None, loop=None):
+        opened["loop"] = loop
+        return subscriber
+
+    monkeypatch.setattr(automation_server, "_screencast_websocket", fake_websocket)
+    monkeypatch.setattr(automation_asgi, "open_screencast", fake_open)
+
+    async def scenario() -> tuple[httpx.Response, asyncio.AbstractEventLoop]:
+        async with _client() as client:
+            return await client.get("/screencast"), asyncio.get_running_loop()
+
+    response, loop = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert response.content == automation_asgi.mjpeg_part(b"jpeg")
+    assert opened["loop"] is loop
+    assert opened["reader"] == threading.get_ident()
+    assert subscriber.closed
+
+
+def test_slow_page_request_does_not_block_others(monkeypatch: pytest.MonkeyPatch) -> None:
+    url_served = asyncio.Event()
+
+    async def fake_init() -> None:
+        return None
+
+    async def slow_content() -> str:
+        # Only completes once /url has been answered concurrently.
+        await asyncio.wait_for(url_served.wait(), timeout=2)
+        return "<html></html>"
+
+    async def fake_url() -> str:
+        url_served.set()
+        return "https://example.com/"
+
+    monkeypatch.setattr(automation_server, "_init_browser", fake_init)
+    monkeypatch.setattr(automation_server, "_safe_get_page_content", slow_content)
+    monkeypatch.setattr(automation_server, "_get_page_url_value", fake_url)
+
+    async def scenario():
+        async with _client() as client:
+            source = asyncio.create_task(client.get("/source"))
+            await asyncio.sleep(0)
+            health = await client.get("/healthz")
+            url = await client.get("/url")
+            return await source, health, url
+
+    source, health, url = asyncio.run(scenario())
+    assert health.text == "ok"
+    assert url.json() == {"url": "https://example.com/"}
+    assert source.status_code == 200
+    assert source.text == "<html></html>"
+
+
+def test_requests_are_recorded_in_prometheus_metrics() -> None:
+    async def scenario() -> httpx.Response:
+        async with _client() as client:
+            await client.get("/healthz")
+            return await client.get("/metrics")
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert (
+        'automation_http_request_duration_seconds_count{route="/healthz",method="GET",status="200"}'
+        in response.text
+    )
+
+
+def test_page_state_supports_conditional_requests(monkeypatch: pytest.MonkeyPatch) -> None:
+    reads: list[str] = []
+
+    class FakePage:
+        context = None  # No CDP session; the target id falls back to the object
+
+        async def evaluate(self, script: str):
+            return {"token": "a", "epoch": 3, "url": "https://example.com/", "viewport": [800, 600, 2]}
+
+        async def content(self) -> str:
+            reads.append("html")
+            return "<html></html>"
+
+    async def fake_init() -> None:
+        return None
+
+    monkeypatch.setattr(automation_server, "_init_browser", fake_init)
+    monkeypatch.setattr(automation_server, "PAGE", FakePage())
+    monkeypatch.setattr(automation_server, "_PAGE_TARGET", None)
+    monkeypatch.setattr(automation_server, "_PAGE_CACHE", automation_server._PageStateCache(30))
+
+    async def scenario():
+        async with _client() as client:
+            first = await client.get("/source")
+            second = await client.get("/source", headers={"If-None-Match": first.headers["etag"]})
+            return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first.text == "<html></html>"
+    assert first.headers["cache-control"] == "no-cache"
+    assert second.status_code == 304
+    assert second.headers["etag"] == first.headers["etag"]
+    assert reads == ["html"]
@@ -77,3 +77,310 @@ def test_add_instruction_rejects_empty(monkeypatch: pytest.MonkeyPatch) -> None:
     assert response.status_code == 400
     assert response.get_json() == {"error": "instruction empty"}
     assert captured == {}
+
+
+def test_start_session_forwards_async_start(monkeypatch: pytest.MonkeyPatch) -> None:
+    captured: dict[str, object] = {}
+
+    class DummyManager:
+        def start_session(self, command: str, **kwargs: object) -> str:
+            captured["command"] = command
+            captured.update(kwargs)
+            return "session-1"
+
+    monkeypatch.setattr(automation_server, "_get_browser_use_manager", lambda: DummyManager())
+    client = automation_server.app.test_client()
+
+    response = client.post(
+        "/browser-use/session",
+        json={"command": "検索", "async_start": True, "conversation_context": "履歴"},
+    )
+
+    assert response.status_code == 200
+    assert response.get_json() == {"session_id": "session-1"}
+    assert captured["async_start"] is True
+
+    invalid = client.post("/browser-use/session", json={"command": "検索", "async_start": "yes"})
+    assert invalid.status_code == 400
+
+
+def test_metrics_endpoint_returns_manager_metrics(monkeypatch: pytest.MonkeyPatch) -> None:
+    class DummyManager:
+        def metrics(self) -> dict[str, object]:
+            return {"llm_wait_seconds": 1.5}
+
+    monkeypatch.setattr(automation_server, "_get_browser_use_manager", lambda: DummyManager())
+    client = automation_server.app.test_client()
+
+    response = client.get("/browser-use/metrics")
+    assert response.status_code == 200
+    assert response.get_json() == {"llm_wait_seconds": 1.5}
+
+
+def test_remote_manager_metrics_reach_the_manager(monkeypatch: pytest.MonkeyPatch) -> None:
+    import requests
+
+    from agent import browser_use_runner
+
+    class DummyManager:
+        def metrics(self) -> dict[str, object]:
+            return {"llm_wait_seconds": 1.5, "phases": {"llm": {"count": 1}}}
+
+    monkeypatch.setattr(automation_server, "_get_browser_use_manager", lambda: DummyManager())
+    monkeypatch.setattr(browser_use_runner, "get_vnc_api_base", lambda: "http://vnc:7000")
+    client = automation_server.app.test_client()
+    remote = browser_use_runner.RemoteBrowserUseManager()
+    requested: list[str] = []
+
+    def forward(method, url, json=None, timeout=None, **kwargs):
+        requested.append(url)
+        served = client.open(url.removeprefix("http://vnc:7000"), method=method.upper())
+        response = requests.Response()
+        response.status_code = served.status_code
+        response.headers.update(served.headers)
+        response._content = served.get_data()
+        return response
+
+    monkeypatch.setattr(remote._http, "request", forward)
+
+    payload = remote.metrics()
+
+    assert requested == ["http://vnc:7000/browser-use/metrics"]
+    assert payload["llm_wait_seconds"] == 1.5
+    assert payload["phases"] == {"llm": {"count": 1}}
+    assert "error" not in payload
+    assert "remote_pool" in payload
+
+
+def test_prometheus_metrics_endpoint(monkeypatch: pytest.MonkeyPatch, tmp_path) -> None:
+    history_file = tmp_path / "history.jsonl"
+    history_file.write_text("{}\n", encoding="utf-8")
+    monkeypatch.setattr(automation_server.history_utils, "HIST_LOG_FILE", str(history_file))
+    monkeypatch.setattr(automation_server, "_browser_use_manager", None)
+    client = automation_server.app.test_client()
+
+    before = automation_server._REQUEST_SECONDS.count(route="/healthz", method="GET", status="200")
+    client.get("/healthz")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    body = response.get_data(as_text=True)
+    assert "# TYPE automation_http_request_duration_seconds histogram" in body
+    assert (
+        'automation_http_request_duration_seconds_count{route="/healthz",method="GET",status="200"} '
+        f"{before + 1}"
+    ) in body
+    assert 'automation_browser_use_sessions{state="queued"} 0.0' in body
+    assert "automation_history_file_bytes 3.0" in body
+
+
+def test_screencast_rejects_invalid_settings() -> None:
+    client = automation_server.app.test_client()
+
+    response = client.get("/screencast?quality=500")
+
+    assert response.status_code == 400
+    assert "quality" in response.get_json()["error"]
+
+
+def test_screencast_streams_mjpeg_parts(monkeypatch: pytest.MonkeyPatch) -> None:
+    captured: dict[str, object] = {}
+
+    class DummySubscriber:
+        def __init__(self) -> None:
+            self.frames = [b"one", b"two", None]
+            self.closed = False
+
+        def get(self, timeout: float = 0) -> bytes | None:
+            return self.frames.pop(0)
+
+        def close(self) -> None:
+            self.closed = True
+
+    subscriber = DummySubscriber()
+
+    async def fake_websocket() -> str:
+        return "ws://browser/devtools/browser/1"
+
+    def fake_open(websocket_url, settings, *, target_id=None):
+        captured.update(url=websocket_url, settings=settings, target_id=target_id)
+        return subscriber
+
+    monkeypatch.setattr(automation_server, "_screencast_websocket", fake_websocket)
+    monkeypatch.setattr(automation_server, "open_screencast", fake_open)
+    client = automation_server.app.test_client()
+
+    response = client.get("/screencast?fps=2&target_id=abc")
+
+    assert response.status_code == 200
+    assert response.content_type == "multipart/x-mixed-replace; boundary=frame"
+    body = response.get_data()
+    assert body.count(b"--frame\r\n") == 2
+    assert b"Content-Length: 3\r\n\r\ntwo\r\n" in body
+    assert captured["url"] == "ws://browser/devtools/browser/1"
+    assert captured["target_id"] == "abc"
+    assert captured["settings"].max_fps == 2.0
+    assert subscriber.closed
+
+
+class FakePage:
+    def __init__(self) -> None:
+        self.epoch = 0
+        self.reads: list[str] = []
+        self.dom_options: list[dict] = []
+        self.context = self
+
+    async def new_cdp_session(self, page):
+        return self
+
+    async def send(self, method: str) -> dict:
+        return {"targetInfo": {"targetId": "T1"}}
+
+    async def detach(self) -> None:
+        return None
+
+    async def evaluate(self, script: str, options: dict | None = None):
+        if script == automation_server._PAGE_EPOCH_SCRIPT:
+            return {"token": "a", "epoch": self.epoch, "url": "https://example.com/", "viewport": [1280, 720, 1]}
+        self.reads.append("dom")
+        self.dom_options.append(options)
+        text = {"nodeType": "text", "text": f"本文 {self.epoch}"}
+        if options["generation"] is None:
+            tree = {"tagName": "body", "nodeId": 1, "children": [{"tagName": "p", "nodeId": 2, "children": [text]}]}
+            return {"full": True, "generation": 1, "tree": tree}
+        patch = {"nodeId": 2, "node": {"tagName": "p", "nodeId": 2, "children": [text]}}
+        return {"full": False, "generation": options["generation"] + 1, "patches": [patch]}
+
+    async def content(self) -> str:
+        self.reads.append("html")
+        return f"<html>{self.epoch}</html>"
+
+    async def screenshot(self, type: str) -> bytes:
+        self.reads.append("screenshot")
+        return b"png"
+
+
+def _page_client(monkeypatch: pytest.MonkeyPatch, page: FakePage):
+    async def fake_init() -> None:
+        return None
+
+    monkeypatch.setattr(automation_server, "_init_browser", fake_init)
+    monkeypatch.setattr(automation_server, "PAGE", page)
+    monkeypatch.setattr(automation_server, "_PAGE_TARGET", None)
+    monkeypatch.setattr(automation_server, "_DOM_SNAPSHOTS", None)
+    monkeypatch.setattr(automation_server, "_PAGE_CACHE", automation_server._PageStateCache(30))
+    return automation_server.app.test_client()
+
+
+def test_page_state_is_cached_until_the_epoch_changes(monkeypatch: pytest.MonkeyPatch) -> None:
+    page = FakePage()
+    client = _page_client(monkeypatch, page)
+
+    first = client.get("/source")
+    second = client.get("/source")
+    assert first.get_data(as_text=True) == second.get_data(as_text=True) == "<html>0</html>"
+    assert first.headers["ETag"] == second.headers["ETag"]
+    assert first.headers["Cache-Control"] == "no-cache"
+    assert page.reads == ["html"]
+
+    revalidated = client.get("/source", headers={"If-None-Match": f'W/{first.headers["ETag"]}'})
+    assert revalidated.status_code == 304
+    assert revalidated.get_data() == b""
+    assert page.reads == ["html"]
+
+    page.epoch += 1
+    changed = client.get("/source", headers={"If-None-Match": first.headers["ETag"]})
+    assert changed.status_code == 200
+    assert changed.get_data(as_text=True) == "<html>1</html>"
+    assert changed.headers["ETag"] != first.headers["ETag"]
+    assert page.reads == ["html", "html"]
+    assert automation_server._PAGE_TARGET == (page, "T1")
+
+
+def test_dom_and_screenshot_are_cached_per_kind(monkeypatch: pytest.MonkeyPatch) -> None:
+    page = FakePage()
+    client = _page_client(monkeypatch, page)
+
+    dom = client.get("/dom")
+    assert dom.content_type == "application/json"
+    assert dom.get_json()["children"][0]["children"][0]["text"] == "本文 0"
+    shot = client.get("/screenshot")
+    assert shot.get_data() == b"cG5n"
+    client.get("/dom")
+    assert client.get("/screenshot", headers={"If-None-Match": shot.headers["ETag"]}).status_code == 304
+    assert page.reads == ["dom", "screenshot"]
+
+
+def test_dom_is_patched_from_the_previous_snapshot(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("DOM_SNAPSHOT_INCREMENTAL", raising=False)
+    page = FakePage()
+    client = _page_client(monkeypatch, page)
+
+    client.get("/dom")
+    page.epoch += 1
+    dom = client.get("/dom").get_json()
+
+    assert [options["generation"] for options in page.dom_options] == [None, 1]
+    assert dom["children"][0]["children"][0]["text"] == "本文 1"
+    assert dom["children"][0]["highlightIndex"] is None
+    assert "nodeId" not in dom
+
+    monkeypatch.setattr(automation_server, "PAGE", FakePage())
+    client.get("/dom")
+    assert automation_server._DOM_SNAPSHOTS[0] is automation_server.PAGE
+    assert [options["generation"] for options in automation_server.PAGE.dom_options] == [None]
+
+
+def test_screenshot_expires_sooner_than_other_page_state(monkeypatch: pytest.MonkeyPatch) -> None:
+    page = FakePage()
+    client = _page_client(monkeypatch, page)
+    monkeypatch.setattr(
+        automation_server, "_PAGE_CACHE", automation_server._PageStateCache(30, {"screenshot": 2})
+    )
+    now = [100.0]
+    monkeypatch.setattr(automation_server.time, "monotonic", lambda: now[0])
+
+    client.get("/source")
+    client.get("/screenshot")
+    now[0] += 5
+    client.get("/source")
+    client.get("/screenshot")
+
+    assert page.reads == ["html", "screenshot", "screenshot"]
+
+
+def test_page_epoch_moves_when_an_image_finishes_loading() -> None:
+    sync_api = pytest.importorskip("playwright.sync_api")
+    with sync_api.sync_playwright() as pw:
+        try:
+            browser = pw.chromium.launch()
+        except Exception as exc:
+            pytest.skip(f"Chromium unavailable: {exc}")
+        try:
+            page = browser.new_page()
+            page.set_content("<body><p>text</p></body>")
+            pixel = (
+                "data:image/gif;base64,"
+                "R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7"
+            )
+            page.evaluate(automation_server._PAGE_EPOCH_SCRIPT)
+            # Read in the same task as the insertion, so the epoch already
+            # counts the mutation but not yet the load that follows.
+            before = page.evaluate(
+                """src => {
+                  const img = document.createElement('img');
+                  img.addEventListener('load', () => { window.__imageLoaded = true; });
+                  img.src = src;
+                  document.body.appendChild(img);
+                  window.__webAgentEpoch.flush();
+                  return window.__webAgentEpoch.epoch;
+                }""",
+                pixel,
+            )
+            page.wait_for_function("() => window.__imageLoaded === true")
+            after = page.evaluate(automation_server._PAGE_EPOCH_SCRIPT)["epoch"]
+        finally:
+            browser.close()
+
+    assert after > before
@@ -23,6 +23,7 @@ def _reset_managers(monkeypatch: pytest.MonkeyPatch) -> None:
     monkeypatch.delenv("BROWSER_USE_REMOTE_API", raising=False)
     monkeypatch.setattr(browser_use_runner, "_browser_use_manager", None)
     monkeypatch.setattr(browser_use_runner, "_remote_browser_use_manager", None)
+    browser_use_runner.invalidate_cdp_endpoint_cache()
 
 
 def test_resolve_cdp_endpoint_prefers_ws_env(monkeypatch: pytest.MonkeyPatch) -> None:
@@ -31,7 +32,7 @@ def test_resolve_cdp_endpoint_prefers_ws_env(monkeypatch: pytest.MonkeyPatch) ->
         "ws://example.devtools/devtools/browser/abcdef",
     )
 
-    captured: dict[str, object] = {}
+    captured: dict[str, list[object]] = {"url": [], "timeout": []}
 
     class _Response:
         def __init__(self) -> None:
@@ -43,8 +44,8 @@ def test_resolve_cdp_endpoint_prefers_ws_env(monkeypatch: pytest.MonkeyPatch) ->
             }
 
     def fake_get(url: str, timeout: float) -> _Response:
-        captured["url"] = url
-        captured["timeout"] = timeout
+        captured["url"].append(url)
+        captured["timeout"].append(timeout)
         return _Response()
 
     monkeypatch.setattr(browser_use_runner.requests, "get", fake_get)
@@ -52,14 +53,15 @@ def test_resolve_cdp_endpoint_prefers_ws_env(monkeypatch: pytest.MonkeyPatch) ->
     result = browser_use_runner._resolve_cdp_endpoint()
 
     assert result == "ws://example.devtools/devtools/browser/abcdef"
-    assert captured["url"] == "http://example.devtools/json/version"
-    assert captured["timeout"] == browser_use_runner._CDP_PROBE_TIMEOUT
+    # Every candidate is probed concurrently; the configured one wins.
+    assert "http://example.devtools/json/version" in captured["url"]
+    assert set(captured["timeout"]) == {browser_use_runner._CDP_PROBE_TIMEOUT}
 
 
 def test_resolve_cdp_endpoint_accepts_host_port(monkeypatch: pytest.MonkeyPatch) -> None:
     monkeypatch.setenv("BROWSER_USE_CDP_URL", "localhost:9222")
 
-    captured: dict[str, object] = {}
+    captured: dict[str, list[object]] = {"url": [], "timeout": []}
 
     class _Response:
         def __init__(self) -> None:
@@ -69,8 +71,8 @@ def test_resolve_cdp_endpoint_accepts_host_port(monkeypatch: pytest.MonkeyPatch)
             return {"webSocketDebuggerUrl": "ws://localhost:9222/devtools/browser/test"}
 
     def fake_get(url: str, timeout: float) -> _Response:
-        captured["url"] = url
-        captured["timeout"] = timeout
+        captured["url"].append(url)
+        captured["timeout"].append(timeout)
         return _Response()
 
     monkeypatch.setattr(browser_use_runner.requests, "get", fake_get)
@@ -78,8 +80,9 @@ def test_resolve_cdp_endpoint_accepts_host_port(monkeypatch: pytest.MonkeyPatch)
     result = browser_use_runner._resolve_cdp_endpoint()
 
     assert result == "ws://localhost:9222/devtools/browser/test"
-    assert captured["url"] == "http://localhost:9222/json/version"
-    assert captured["timeout"] == browser_use_runner._CDP_PROBE_TIMEOUT
+    # Every candidate is probed concurrently; the configured one wins.
+    assert "http://localhost:9222/json/version" in captured["url"]
+    assert set(captured["timeout"]) == {browser_use_runner._CDP_PROBE_TIMEOUT}
 
 
 def test_resolve_cdp_endpoint_prefers_configured_http(monkeypatch: pytest.MonkeyPatch) -> None:
@@ -240,6 +243,93 @@ def test_resolve_cdp_endpoint_rewrites_loopback_host(
     assert result == "ws://vnc:9222/devtools/browser/loop"
 
 
+def test_resolve_cdp_endpoint_probes_candidates_concurrently(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    started: list[str] = []
+    release = threading.Event()
+
+    class _Response:
+        status_code = 200
+
+        def json(self) -> dict[str, str]:
+            return {}
+
+    def fake_get(url: str, timeout: float):  # type: ignore[override]
+        started.append(url)
+        if "slow" in url:
+            # Only returns once the fast probe has been started in parallel.
+            assert release.wait(timeout=2)
+            raise browser_use_runner.requests.ConnectionError("down")
+        release.set()
+        return _Response()
+
+    monkeypatch.setattr(browser_use_runner.requests, "get", fake_get)
+
+    result = browser_use_runner._resolve_cdp_endpoint(
+        candidates=("http://slow:9222", "http://fast:9222"),
+        retries=1,
+        delay=0.0,
+    )
+
+    assert result == "http://fast:9222"
+    assert len(started) == 2
+
+
+def test_resolve_cdp_endpoint_prefers_earlier_candidate(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    class _Response:
+        status_code = 200
+
+        def json(self) -> dict[str, str]:
+            return {}
+
+    def fake_get(url: str, timeout: float):  # type: ignore[override]
+        if "first" in url:
+            time.sleep(0.05)
+        return _Response()
+
+    monkeypatch.setattr(browser_use_runner.requests, "get", fake_get)
+
+    result = browser_use_runner._resolve_cdp_endpoint(
+        candidates=("http://first:9222", "http://second:9222"),
+        retries=1,
+        delay=0.0,
+    )
+
+    assert result == "http://first:9222"
+
+
+def test_resolve_cdp_endpoint_uses_cache_until_invalidated(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls: list[str] = []
+
+    class _Response:
+        status_code = 200
+
+        def json(self) -> dict[str, str]:
+            return {"webSocketDebuggerUrl": "ws://vnc:9222/devtools/browser/cached"}
+
+    def fake_get(url: str, timeout: float):  # type: ignore[override]
+        calls.append(url)
+        return _Response()
+
+    monkeypatch.setattr(browser_use_runner.requests, "get", fake_get)
+    candidates = ("http://vnc:9222",)
+
+    first = browser_use_runner._resolve_cdp_endpoint(candidates=candidates, retries=1)
+    second = browser_use_runner._resolve_cdp_endpoint(candidates=candidates, retries=1)
+
+    assert first == second == "ws://vnc:9222/devtools/browser/cached"
+    assert len(calls) == 1
+
+    browser_use_runner.invalidate_cdp_endpoint_cache(first)
+    browser_use_runner._resolve_cdp_endpoint(candidates=candidates, retries=1)
+    assert len(calls) == 2
+
+
 class DummyStructured:
     def __init__(self, data: dict[str, object]) -> None:
         self._data = data
@@ -299,6 +389,18 @@ def test_finalise_result_includes_structured_output_when_present() -> None:
     assert session.result["warnings"] == ["warn message"]
 
 
+def test_finalise_result_aggregates_step_timings() -> None:
+    session = BrowserUseSession(command="cmd", model_name="model", max_steps=1)
+    session._phase_samples = {"llm": [1.0, 2.0, 3.0]}
+    session._llm_wait_seconds = 6.0
+
+    session._finalise_result(DummyHistory(structured=None))
+
+    assert session.result["timings"]["llm"]["p50"] == 2.0
+    assert session.result["timings"]["llm"]["p95"] == 3.0
+    assert session.result["llm_wait_seconds"] == 6.0
+
+
 def test_snapshot_includes_warnings_and_shared_browser_data() -> None:
     session = BrowserUseSession(command="cmd", model_name="model", max_steps=1)
     session.warnings.append("notice")
@@ -315,6 +417,120 @@ def test_snapshot_includes_warnings_and_shared_browser_data() -> None:
     assert data["shared_browser_endpoint"] is None
 
 
+def test_snapshot_since_returns_only_new_steps() -> None:
+    session = BrowserUseSession(command="cmd", model_name="model", max_steps=3)
+    session.steps.extend({"index": index} for index in range(1, 4))
+
+    data = session.snapshot(since=2)
+
+    assert data["steps"] == [{"index": 3}]
+    assert data["steps_since"] == 2
+    assert data["step_count"] == 3
+    assert session.snapshot()["steps_since"] == 0
+    assert session.snapshot(since=10)["steps"] == []
+
+
+def test_snapshot_shares_frozen_step_records() -> None:
+    import copy
+    import json
+
+    session = BrowserUseSession(command="cmd", model_name="model", max_steps=1)
+    step = browser_use_runner._freeze({"index": 1, "actions": [{"click": {"index": 2}}]})
+    session.steps.append(step)
+
+    snapshot = session.snapshot()
+    assert snapshot["steps"][0] is step
+    assert copy.deepcopy(step) is step
+    assert json.loads(json.dumps(snapshot["steps"])) == [
+        {"index": 1, "actions": [{"click": {"index": 2}}]}
+    ]
+    with pytest.raises(TypeError):
+        step["index"] = 2
+    with pytest.raises(TypeError):
+        step["actions"].append({})
+    with pytest.raises(TypeError):
+        step["actions"][0]["click"]["index"] = 3
+
+
+def test_iter_events_streams_steps_warnings_and_status() -> None:
+    session = BrowserUseSession(command="cmd", model_name="model", max_steps=3)
+    session.status = "running"
+    session.steps.append({"index": 1})
+
+    events = session.iter_events(since=0, heartbeat=0.05)
+    name, initial = next(events)
+    assert name == "snapshot"
+    assert initial["steps"] == [{"index": 1}]
+
+    with session._lock:
+        session.steps.append({"index": 2})
+    session._publish("step", {"position": 1, "step": {"index": 2}})
+    session._add_warning("slow page")
+    session._set_status("completed")
+
+    received = list(events)
+    names = [item[0] for item in received]
+    assert names[0] == "step"
+    assert received[0][1]["step"] == {"index": 2}
+    assert ("warning", {"warning": "slow page"}) in received
+    assert received[-1][0] == "status"
+    assert received[-1][1]["status"] == "completed"
+    assert received[-1][1]["steps"] == []
+    assert session._subscribers == []
+
+
+def test_iter_events_skips_steps_included_in_snapshot() -> None:
+    session = BrowserUseSession(command="cmd", model_name="model", max_steps=3)
+    session.status = "running"
+
+    events = session.iter_events(heartbeat=0.01)
+    next(events)
+    session._publish("step", {"position": -1, "step": {"index": 0}})
+
+    assert next(events)[0] == "ping"
+    events.close()
+    assert session._subscribers == []
+
+
+def test_iter_events_async_receives_events_published_from_other_threads() -> None:
+    session = BrowserUseSession(command="cmd", model_name="model", max_steps=3)
+    session.status = "running"
+
+    async def scenario() -> list[tuple[str, dict]]:
+        events = session.iter_events_async(since=0, heartbeat=0.05)
+        received = [await anext(events)]
+
+        def publish() -> None:
+            with session._lock:
+                session.steps.append({"index": 1})
+            session._publish("step", {"position": 0, "step": {"index": 1}})
+            session._set_status("completed")
+
+        threading.Thread(target=publish).start()
+        received.extend([item async for item in events])
+        return received
+
+    received = asyncio.run(scenario())
+    assert [name for name, _ in received] == ["snapshot", "step", "status"]
+    assert received[1][1]["step"] == {"index": 1}
+    assert session._subscribers == []
+
+
+def test_iter_events_async_sends_pings_while_idle() -> None:
+    session = BrowserUseSession(command="cmd", model_name="model", max_steps=3)
+    session.status = "running"
+
+    async def scenario() -> str:
+        events = session.iter_events_async(heartbeat=0.01)
+        await anext(events)
+        name, _ = await anext(events)
+        await events.aclose()
+        return name
+
+    assert asyncio.run(scenario()) == "ping"
+    assert session._subscribers == []
+
+
 def test_history_context_creates_extension() -> None:
     session = BrowserUseSession(
         command="cmd",
@@ -411,6 +627,45 @@ def test_add_instruction_triggers_delivery() -> None:
         loop.close()
 
 
+def test_instruction_waits_for_agent_readiness() -> None:
+    session = BrowserUseSession(command="cmd", model_name="model", max_steps=1)
+    session.status = "preparing"
+    received: list[str] = []
+
+    class DummyAgent:
+        def add_new_task(self, text: str) -> None:
+            received.append(text)
+
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    try:
+        assert session.add_instruction("一つ目") == "accepted"
+        session.ensure_instruction_delivery(loop)
+        assert session.add_instruction("二つ目") == "accepted"
+        session.ensure_instruction_delivery(loop)
+        time.sleep(0.05)
+        assert received == []
+
+        def make_ready() -> None:
+            session._agent = DummyAgent()
+            session._agent_ready.set()
+
+        loop.call_soon_threadsafe(make_ready)
+        deadline = time.time() + 1.0
+        while len(received) < 2 and time.time() < deadline:
+            time.sleep(0.01)
+
+        assert received == ["一つ目", "二つ目"]
+        with session._lock:
+            assert session._delivered_instruction_count == 2
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=1)
+        loop.close()
+
+
 def test_create_browser_session_raises_when_shared_browser_unavailable(
     monkeypatch: pytest.MonkeyPatch,
 ) -> None:
@@ -729,6 +984,306 @@ def test_browser_use_manager_add_instruction_respects_status(monkeypatch: pytest
         manager.shutdown()
 
 
+def _wait_for_status(manager, session_id: str, expected: str) -> dict[str, object]:
+    deadline = time.time() + 2.0
+    while time.time() < deadline:
+        data = manager.get_status(session_id)
+        if data["status"] == expected:
+            return data
+        time.sleep(0.01)
+    raise AssertionError(f"session did not reach status {expected}")
+
+
+def test_browser_use_manager_async_start_reports_failure(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    release = threading.Event()
+    recorded: list[str] = []
+
+    def fake_create(self):  # type: ignore[override]
+        assert release.wait(timeout=2)
+        raise RuntimeError("shared browser unavailable")
+
+    monkeypatch.setattr(BrowserUseSession, "_create_browser_session", fake_create)
+    monkeypatch.setattr(
+        browser_use_runner,
+        "append_history_entry",
+        lambda user, bot, url=None: recorded.append(bot["status"]),
+    )
+
+    manager = browser_use_runner.BrowserUseManager()
+    try:
+        session_id = manager.start_session(
+            "cmd", model="model", max_steps=1, async_start=True
+        )
+        assert manager.get_status(session_id)["status"] == "preparing"
+
+        release.set()
+        data = _wait_for_status(manager, session_id, "failed")
+        assert data["error"] == "shared browser unavailable"
+        assert recorded == ["failed"]
+    finally:
+        release.set()
+        manager.shutdown()
+
+
+def test_prepare_leases_browser_context_when_pool_enabled(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    leases: list[str] = []
+    released: list[str] = []
+
+    class _Pool:
+        async def acquire(self):
+            leases.append("leased")
+            return SimpleNamespace(
+                endpoint="ws://shared", browser_context_id="ctx", target_id="page"
+            )
+
+        async def release(self, lease):
+            released.append(lease.browser_context_id)
+
+    def fake_create(self):  # type: ignore[override]
+        self._set_shared_browser_state("remote", "ws://shared")
+        return object()
+
+    monkeypatch.setenv("BROWSER_USE_CONTEXT_POOL", "1")
+    monkeypatch.setattr(BrowserUseSession, "_create_browser_session", fake_create)
+    monkeypatch.setattr(browser_use_runner, "get_browser_context_pool", lambda endpoint: _Pool())
+
+    session = BrowserUseSession(command="cmd", model_name="model", max_steps=1)
+
+    async def scenario() -> None:
+        await session.prepare()
+        assert session._context_lease.browser_context_id == "ctx"
+        await session._release_browser_context()
+
+    asyncio.run(scenario())
+    assert leases == ["leased"]
+    assert released == ["ctx"]
+    assert session._context_lease is None
+
+
+def test_run_releases_browser_context_when_llm_creation_fails(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    released: list[str] = []
+
+    class _Pool:
+        async def acquire(self):
+            return SimpleNamespace(
+                endpoint="ws://shared", browser_context_id="ctx", target_id="page"
+            )
+
+        async def release(self, lease):
+            released.append(lease.browser_context_id)
+
+    def fake_create(self):  # type: ignore[override]
+        self._set_shared_browser_state("remote", "ws://shared")
+        return object()
+
+    def fail_llm(self):  # type: ignore[override]
+        raise RuntimeError("missing api key")
+
+    monkeypatch.setenv("BROWSER_USE_CONTEXT_POOL", "1")
+    monkeypatch.setattr(BrowserUseSession, "_create_browser_session", fake_create)
+    monkeypatch.setattr(BrowserUseSession, "_create_llm", fail_llm)
+    monkeypatch.setattr(BrowserUseSession, "_record_history", lambda self: None)
+    monkeypatch.setattr(browser_use_runner, "get_browser_context_pool", lambda endpoint: _Pool())
+
+    session = BrowserUseSession(command="cmd", model_name="model", max_steps=1)
+    asyncio.run(session.prepare_and_run())
+
+    assert session.status == "failed"
+    assert released == ["ctx"]
+    assert session._context_lease is None
+
+
+def test_prepare_skips_context_pool_by_default(monkeypatch: pytest.MonkeyPatch) -> None:
+    def fake_create(self):  # type: ignore[override]
+        self._set_shared_browser_state("remote", "ws://shared")
+        return object()
+
+    def fail_pool(endpoint):
+        raise AssertionError("context pool should not be used")
+
+    monkeypatch.setattr(BrowserUseSession, "_create_browser_session", fake_create)
+    monkeypatch.setattr(browser_use_runner, "get_browser_context_pool", fail_pool)
+
+    session = BrowserUseSession(command="cmd", model_name="model", max_steps=1)
+    asyncio.run(session.prepare())
+    assert session._context_lease is None
+
+
+def test_browser_use_manager_sync_start_raises(monkeypatch: pytest.MonkeyPatch) -> None:
+    def fake_create(self):  # type: ignore[override]
+        raise RuntimeError("shared browser unavailable")
+
+    monkeypatch.setattr(BrowserUseSession, "_create_browser_session", fake_create)
+
+    manager = browser_use_runner.BrowserUseManager()
+    try:
+        with pytest.raises(RuntimeError):
+            manager.start_session("cmd", model="model", max_steps=1, async_start=False)
+        assert manager._sessions == {}
+    finally:
+        manager.shutdown()
+
+
+def test_browser_use_manager_queues_sessions_over_capacity(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    release = threading.Event()
+    recorded: list[str] = []
+
+    def fake_create(self):  # type: ignore[override]
+        assert release.wait(timeout=2)
+        raise RuntimeError("shared browser unavailable")
+
+    monkeypatch.setattr(browser_use_runner, "_MAX_CONCURRENT_SESSIONS", 1)
+    monkeypatch.setattr(BrowserUseSession, "_create_browser_session", fake_create)
+    monkeypatch.setattr(
+        browser_use_runner,
+        "append_history_entry",
+        lambda user, bot, url=None: recorded.append(bot["status"]),
+    )
+
+    manager = browser_use_runner.BrowserUseManager()
+    try:
+        first = manager.start_session("one", model="gemini", max_steps=1, async_start=True)
+        second = manager.start_session("two", model="gemini", max_steps=1, async_start=True)
+        third = manager.start_session("three", model="gemini", max_steps=1, async_start=True)
+
+        assert manager.get_status(second)["status"] == "queued"
+        assert manager.get_status(second)["queue_position"] == 1
+        assert manager.get_status(third)["queue_position"] == 2
+
+        assert manager.cancel_session(second) is True
+        assert manager.get_status(second)["status"] == "cancelled"
+        assert manager.get_status(third)["queue_position"] == 1
+
+        release.set()
+        _wait_for_status(manager, first, "failed")
+        data = _wait_for_status(manager, third, "failed")
+        assert data["queue_position"] is None
+        assert sorted(recorded) == ["cancelled", "failed", "failed"]
+    finally:
+        release.set()
+        manager.shutdown()
+
+
+def test_browser_use_manager_rejects_when_queue_full(monkeypatch: pytest.MonkeyPatch) -> None:
+    release = threading.Event()
+
+    def fake_create(self):  # type: ignore[override]
+        assert release.wait(timeout=2)
+        raise RuntimeError("shared browser unavailable")
+
+    monkeypatch.setattr(browser_use_runner, "_MAX_CONCURRENT_SESSIONS", 1)
+    monkeypatch.setattr(browser_use_runner, "_MAX_QUEUED_SESSIONS", 0)
+    monkeypatch.setattr(BrowserUseSession, "_create_browser_session", fake_create)
+    monkeypatch.setattr(browser_use_runner, "append_history_entry", lambda *a, **k: None)
+
+    manager = browser_use_runner.BrowserUseManager()
+    try:
+        manager.start_session("one", model="gemini", max_steps=1, async_start=True)
+        with pytest.raises(browser_use_runner.QueueFullError):
+            manager.start_session("two", model="gemini", max_steps=1, async_start=True)
+        assert len(manager._sessions) == 1
+    finally:
+        release.set()
+        manager.shutdown()
+
+
+def test_model_provider_matches_llm_selection() -> None:
+    assert browser_use_runner._model_provider("gemini") == "gemini"
+    assert browser_use_runner._model_provider("gemini-2.0-flash") == "gemini"
+    assert browser_use_runner._model_provider("groq") == "groq"
+    assert browser_use_runner._model_provider("meta-llama/llama-4") == "groq"
+
+
+def test_browser_use_manager_spills_finished_sessions(
+    tmp_path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from agent.utils import session_store
+
+    def fake_create(self):  # type: ignore[override]
+        self.steps.append({"index": 1, "url": "https://example.com"})
+        raise RuntimeError("shared browser unavailable")
+
+    monkeypatch.setattr(session_store, "SESSION_SPILL_DIR", str(tmp_path))
+    monkeypatch.setattr(browser_use_runner, "_MAX_FINISHED_SESSIONS", 1)
+    monkeypatch.setattr(BrowserUseSession, "_create_browser_session", fake_create)
+    monkeypatch.setattr(browser_use_runner, "append_history_entry", lambda *a, **k: None)
+
+    manager = browser_use_runner.BrowserUseManager()
+    try:
+        first = manager.start_session("one", model="gemini", max_steps=1, async_start=True)
+        _wait_for_status(manager, first, "failed")
+        second = manager.start_session("two", model="gemini", max_steps=1, async_start=True)
+        _wait_for_status(manager, second, "failed")
+
+        deadline = time.time() + 2
+        while first in manager._sessions and time.time() < deadline:
+            time.sleep(0.01)
+        assert first not in manager._sessions
+        assert second in manager._sessions
+
+        spilled = manager.get_status(first, since=1)
+        assert spilled["status"] == "failed"
+        assert spilled["steps"] == []
+        assert spilled["step_count"] == 1
+        assert manager.get_status(first)["steps"][0]["url"] == "https://example.com"
+        assert manager.add_instruction(first, "more") == "not_running"
+        events = list(manager.stream_events(first))
+        assert [event for event, _ in events] == ["snapshot"]
+
+        async def read_async() -> list[str]:
+            return [event async for event, _ in manager.stream_events_async(first)]
+
+        assert asyncio.run(read_async()) == ["snapshot"]
+        assert manager.stream_events_async("missing") is None
+
+        stats = manager.memory_stats()
+        assert stats["spilled"] == 1
+        assert set(stats["sessions"]) == {second}
+        assert stats["sessions"][second] == manager.get_status(second)["memory_bytes"]
+    finally:
+        manager.shutdown()
+
+
+def test_failed_spill_keeps_session_in_memory(monkeypatch: pytest.MonkeyPatch) -> None:
+    def fake_create(self):  # type: ignore[override]
+        raise RuntimeError("shared browser unavailable")
+
+    monkeypatch.setattr(browser_use_runner, "_MAX_FINISHED_SESSIONS", 0)
+    monkeypatch.setattr(browser_use_runner, "spill_session_record", lambda *a, **k: False)
+    monkeypatch.setattr(BrowserUseSession, "_create_browser_session", fake_create)
+    monkeypatch.setattr(browser_use_runner, "append_history_entry", lambda *a, **k: None)
+
+    manager = browser_use_runner.BrowserUseManager()
+    try:
+        session_id = manager.start_session("one", model="gemini", max_steps=1, async_start=True)
+        _wait_for_status(manager, session_id, "failed")
+        manager._evict_finished()
+
+        assert session_id in manager._sessions
+        assert session_id in manager._finished
+        assert manager.get_status(session_id)["status"] == "failed"
+        assert manager.memory_stats()["spilled"] == 0
+    finally:
+        manager.shutdown()
+
+
+def test_snapshot_tracks_memory_bytes() -> None:
+    session = BrowserUseSession(command="cmd", model_name="model", max_steps=1)
+    assert session.snapshot()["memory_bytes"] == 0
+
+    session._add_warning("注意")
+    session.add_instruction("次へ")
+    assert session.memory_bytes() > 0
+
+
 def test_get_browser_use_manager_remote(monkeypatch: pytest.MonkeyPatch) -> None:
     dummy_instance = object()
 
@@ -790,6 +1345,10 @@ def test_remote_manager_start_session_includes_context(
 
     assert session_id == "ctx123"
     assert captured["payload"]["conversation_context"] == "履歴要約"
+    assert "async_start" not in captured["payload"]
+
+    manager.start_session("command", model="m", max_steps=5, async_start=True)
+    assert captured["payload"]["async_start"] is True
 
 
 def test_remote_manager_start_session_validation_error(
@@ -832,6 +1391,27 @@ def test_remote_manager_start_session_shared_browser_error(
     assert "shared" in str(excinfo.value)
 
 
+def test_remote_manager_start_session_queue_full(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    manager = browser_use_runner.RemoteBrowserUseManager()
+
+    class _Response:
+        status_code = 429
+        headers = {"Retry-After": "12"}
+
+        @staticmethod
+        def json() -> dict[str, str]:
+            return {"error": "queue full", "code": "queue_full"}
+
+    monkeypatch.setattr(manager, "_request", lambda *_, **__: _Response())
+
+    with pytest.raises(browser_use_runner.QueueFullError) as excinfo:
+        manager.start_session("command", model="m", max_steps=5)
+
+    assert excinfo.value.retry_after == 12
+
+
 def test_remote_manager_get_status(monkeypatch: pytest.MonkeyPatch) -> None:
     manager = browser_use_runner.RemoteBrowserUseManager()
 
@@ -856,6 +1436,60 @@ def test_remote_manager_get_status(monkeypatch: pytest.MonkeyPatch) -> None:
     assert manager.get_status("abc") is None
 
 
+def test_remote_manager_get_status_forwards_cursor(monkeypatch: pytest.MonkeyPatch) -> None:
+    manager = browser_use_runner.RemoteBrowserUseManager()
+    captured: dict[str, object] = {}
+
+    class _Ok:
+        status_code = 200
+
+        @staticmethod
+        def json() -> dict[str, object]:
+            return {"status": "running", "steps": [], "steps_since": 4}
+
+    def fake_request(method, path, json_payload=None, params=None, timeout=None):  # type: ignore[override]
+        captured["path"] = path
+        captured["params"] = params
+        return _Ok()
+
+    monkeypatch.setattr(manager, "_request", fake_request)
+
+    assert manager.get_status("abc", since=4)["steps_since"] == 4
+    assert captured == {"path": "/session/abc", "params": {"since": 4}}
+
+
+def test_remote_manager_stream_events_relays_sse(monkeypatch: pytest.MonkeyPatch) -> None:
+    manager = browser_use_runner.RemoteBrowserUseManager()
+
+    class _Stream:
+        status_code = 200
+        encoding = "utf-8"
+        closed = False
+
+        @staticmethod
+        def iter_lines(decode_unicode: bool = False):
+            yield "event: snapshot"
+            yield 'data: {"status": "running", "steps": []}'
+            yield ""
+            yield ": keep-alive"
+            yield "event: status"
+            yield 'data: {"status": "completed"}'
+            yield ""
+
+        def close(self) -> None:
+            _Stream.closed = True
+
+    monkeypatch.setattr(manager, "_request", lambda *_, **__: _Stream())
+
+    events = manager.stream_events("abc")
+
+    assert list(events) == [
+        ("snapshot", {"status": "running", "steps": []}),
+        ("status", {"status": "completed"}),
+    ]
+    assert _Stream.closed is True
+
+
 def test_remote_manager_add_instruction(monkeypatch: pytest.MonkeyPatch) -> None:
     manager = browser_use_runner.RemoteBrowserUseManager()
 
@@ -927,16 +1561,53 @@ def test_remote_manager_request_failure(monkeypatch: pytest.MonkeyPatch) -> None
         "get_vnc_api_base",
         lambda refresh=False: "http://vnc:7000",
     )
+    unhealthy: list[str] = []
+    monkeypatch.setattr(
+        browser_use_runner, "mark_vnc_endpoint_unhealthy", unhealthy.append
+    )
 
     def fake_request(method, url, json=None, timeout=None):  # type: ignore[override]
         raise browser_use_runner.requests.RequestException("boom")
 
-    monkeypatch.setattr(browser_use_runner.requests, "request", fake_request)
+    monkeypatch.setattr(manager._http, "request", fake_request)
 
     with pytest.raises(RuntimeError) as excinfo:
         manager.start_session("command", model="m", max_steps=1)
 
     assert "boom" in str(excinfo.value)
+    assert unhealthy == ["http://vnc:7000", "http://vnc:7000"]
+    stats = manager.pool_stats()
+    assert stats["requests"] == 2
+    assert stats["failures"] == 2
+
+
+def test_remote_manager_reuses_pooled_session(monkeypatch: pytest.MonkeyPatch) -> None:
+    manager = browser_use_runner.RemoteBrowserUseManager(pool_size=3)
+    monkeypatch.setattr(
+        browser_use_runner, "get_vnc_api_base", lambda refresh=False: "http://vnc:7000"
+    )
+    calls: list[str] = []
+
+    class _Ok:
+        status_code = 200
+
+        @staticmethod
+        def json() -> dict[str, str]:
+            return {"status": "running"}
+
+    def fake_request(method, url, json=None, timeout=None, **kwargs):  # type: ignore[override]
+        calls.append(url)
+        return _Ok()
+
+    monkeypatch.setattr(manager._http, "request", fake_request)
+
+    manager.get_status("abc")
+    manager.get_status("abc")
+
+    assert calls == ["http://vnc:7000/browser-use/session/abc"] * 2
+    adapter = manager._http.get_adapter("http://vnc:7000")
+    assert adapter._pool_maxsize == 3
+    assert manager.pool_stats()["pool_size"] == 3
 
 
 def _dummy_selector_map() -> dict[int, SimpleNamespace]:
@@ -1048,3 +1719,210 @@ def test_stabilise_model_output_preserves_valid_actions() -> None:
     }
     assert warnings == []
     assert catalog.metadata["total"] == len(selector_map)
+
+
+def test_on_step_stores_screenshot_reference(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    from agent.utils import screenshots
+
+    monkeypatch.setattr(screenshots, "SCREENSHOT_DIR", str(tmp_path))
+    session = BrowserUseSession(command="cmd", model_name="model", max_steps=1)
+    browser_state = _build_browser_state(_dummy_selector_map())
+    browser_state.screenshot = "iVBORw0KGgoAAAANSUhEUg=="
+    model_output = SimpleNamespace(
+        thinking=None,
+        evaluation_previous_goal=None,
+        memory=None,
+        next_goal=None,
+        action=[],
+    )
+
+    asyncio.run(session._on_step(browser_state, model_output, 1))
+    asyncio.run(session._on_step(browser_state, model_output, 2))
+
+    first, second = session.steps
+    assert "screenshot" not in first
+    assert first["screenshot_hash"] == second["screenshot_hash"]
+    assert screenshots.screenshot_path(first["screenshot_hash"]) is not None
+
+
+def test_on_step_stores_compressed_preview_and_archive(
+    tmp_path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    import base64
+    import io
+
+    from PIL import Image
+
+    from agent.utils import screenshots
+
+    monkeypatch.setattr(screenshots, "SCREENSHOT_DIR", str(tmp_path))
+    buffer = io.BytesIO()
+    Image.effect_noise((1200, 900), 64).convert("RGB").save(buffer, format="PNG")
+    original = buffer.getvalue()
+    session = BrowserUseSession(command="cmd", model_name="model", max_steps=1)
+    browser_state = _build_browser_state(_dummy_selector_map())
+    browser_state.screenshot = base64.b64encode(original).decode("ascii")
+    model_output = SimpleNamespace(
+        thinking=None,
+        evaluation_previous_goal=None,
+        memory=None,
+        next_goal=None,
+        action=[],
+    )
+
+    asyncio.run(session._on_step(browser_state, model_output, 1))
+
+    step = session.steps[0]
+    archive_path = screenshots.screenshot_path(step["screenshot_hash"])
+    preview_path = screenshots.screenshot_path(step["screenshot_preview_hash"])
+    assert archive_path is not None and preview_path is not None
+    with open(preview_path, "rb") as fh:
+        preview = fh.read()
+    assert screenshots.sniff_image_mimetype(preview[:16]) == "image/webp"
+    assert max(Image.open(io.BytesIO(preview)).size) <= 800
+    assert len(preview) < len(original)
+
+
+def test_on_step_marks_identical_screenshots_unchanged(
+    tmp_path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    import base64
+    import io
+
+    from PIL import Image
+
+    from agent.utils import screenshots
+
+    monkeypatch.setattr(screenshots, "SCREENSHOT_DIR", str(tmp_path))
+
+    def _encoded(image) -> str:
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+    page = Image.effect_noise((400, 300), 64).convert("RGB")
+    same_page = _encoded(page)
+    other_page = _encoded(page.transpose(Image.Transpose.FLIP_LEFT_RIGHT))
+    session = BrowserUseSession(command="cmd", model_name="model", max_steps=3)
+    browser_state = _build_browser_state(_dummy_selector_map())
+    model_output = SimpleNamespace(
+        thinking=None,
+        evaluation_previous_goal=None,
+        memory=None,
+        next_goal=None,
+        action=[],
+    )
+
+    for index, screenshot in enumerate((same_page, same_page, other_page), start=1):
+        browser_state.screenshot = screenshot
+        asyncio.run(session._on_step(browser_state, model_output, index))
+
+    first, second, third = session.steps
+    assert first["screenshot_unchanged"] is False
+    assert second["screenshot_unchanged"] is True
+    assert second["screenshot_hash"] == first["screenshot_hash"]
+    assert second["screenshot_preview_hash"] == first["screenshot_preview_hash"]
+    assert third["screenshot_unchanged"] is False
+    assert third["screenshot_hash"] != first["screenshot_hash"]
+
+
+def test_compress_message_images_reencodes_png_screenshots() -> None:
+    import base64
+    import io
+
+    from browser_use.llm.messages import (
+        ContentPartImageParam,
+        ContentPartTextParam,
+        ImageURL,
+        UserMessage,
+    )
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.effect_noise((1600, 1000), 64).convert("RGB").save(buffer, format="PNG")
+    url = "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+    message = UserMessage(
+        content=[
+            ContentPartTextParam(text="state"),
+            ContentPartImageParam(image_url=ImageURL(url=url)),
+        ]
+    )
+
+    browser_use_runner._compress_message_images([message])
+
+    image_url = message.content[1].image_url
+    assert image_url.media_type == "image/jpeg"
+    assert image_url.url.startswith("data:image/jpeg;base64,")
+    assert len(image_url.url) < len(url)
+
+    from browser_use.llm.google.serializer import GoogleMessageSerializer
+
+    contents, _ = GoogleMessageSerializer.serialize_messages([message])
+    image_part = contents[0].parts[1]
+    assert image_part.inline_data.mime_type == "image/jpeg"
+    assert image_part.inline_data.data[:3] == b"\xff\xd8\xff"
+
+
+def test_on_step_records_phase_timings(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    from agent.utils import screenshots
+
+    monkeypatch.setattr(screenshots, "SCREENSHOT_DIR", str(tmp_path))
+    session = BrowserUseSession(command="cmd", model_name="model", max_steps=1)
+    browser_state = _build_browser_state(_dummy_selector_map())
+    model_output = SimpleNamespace(
+        thinking=None,
+        evaluation_previous_goal=None,
+        memory=None,
+        next_goal=None,
+        action=[],
+    )
+
+    class _Llm:
+        async def ainvoke(self, messages):
+            return "ok"
+
+    llm = _Llm()
+    session._instrument_llm(llm)
+
+    async def scenario() -> None:
+        await session._on_step_start(None)
+        await llm.ainvoke([])
+        await session._on_step(browser_state, model_output, 1)
+        await session._on_step_end(None)
+
+    asyncio.run(scenario())
+
+    timings = session.steps[0]["timings"]
+    assert {"browser_state", "llm", "dom_serialisation", "screenshot_store", "actions"} <= set(
+        timings
+    )
+    samples, llm_wait = session.timing_samples()
+    assert samples["actions"] == [timings["actions"]]
+    assert llm_wait >= timings["llm"]
+    assert session.memory_bytes() == browser_use_runner._estimate_size(session.steps[0])
+
+
+def test_summarise_timings_reports_percentiles() -> None:
+    summary = browser_use_runner.summarise_timings(
+        {"llm": [float(value) for value in range(1, 21)], "empty": []}
+    )
+
+    assert summary == {"llm": {"count": 20, "total": 210.0, "p50": 10.0, "p95": 19.0}}
+
+
+def test_remote_manager_get_screenshot(monkeypatch: pytest.MonkeyPatch) -> None:
+    manager = browser_use_runner.RemoteBrowserUseManager()
+
+    class _Ok:
+        status_code = 200
+        headers = {"Content-Type": "image/png"}
+        content = b"png"
+
+    class _Missing:
+        status_code = 404
+
+    monkeypatch.setattr(manager, "_request", lambda *_, **__: _Ok())
+    assert manager.get_screenshot("a" * 64) == (b"png", "image/png")
+
+    monkeypatch.setattr(manager, "_request", lambda *_, **__: _Missing())
+    assert manager.get_screenshot("a" * 64) is None
@@ -0,0 +1,143 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from agent.browser.context_pool import BrowserContextPool, BrowserContextPoolTimeout
+
+
+class _FakeTarget:
+    def __init__(self) -> None:
+        self.contexts: list[str] = []
+        self.disposed: list[str] = []
+        self._counter = 0
+
+    async def createBrowserContext(self, params=None):
+        self._counter += 1
+        context_id = f"ctx-{self._counter}"
+        self.contexts.append(context_id)
+        return {"browserContextId": context_id}
+
+    async def createTarget(self, params):
+        return {"targetId": f"page-{params['browserContextId']}"}
+
+    async def disposeBrowserContext(self, params):
+        self.disposed.append(params["browserContextId"])
+        return {}
+
+
+class _FakeClient:
+    def __init__(self, target: _FakeTarget) -> None:
+        self.send = SimpleNamespace(Target=target)
+        self.started = False
+
+    async def start(self) -> None:
+        self.started = True
+
+    async def stop(self) -> None:
+        self.started = False
+
+
+def _make_pool(**kwargs) -> tuple[BrowserContextPool, _FakeTarget]:
+    target = _FakeTarget()
+    pool = BrowserContextPool(
+        "ws://browser/devtools/browser/1",
+        client_factory=lambda endpoint: _FakeClient(target),
+        **kwargs,
+    )
+    return pool, target
+
+
+def test_acquire_creates_isolated_context_and_release_disposes_it() -> None:
+    async def scenario() -> None:
+        pool, target = _make_pool(size=2, warm=0)
+        first = await pool.acquire()
+        second = await pool.acquire()
+        assert first.browser_context_id != second.browser_context_id
+        assert first.target_id == f"page-{first.browser_context_id}"
+        assert pool.stats()["leased"] == 2
+
+        await pool.release(first)
+        assert target.disposed == [first.browser_context_id]
+        assert pool.stats()["leased"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_release_replenishes_warm_contexts() -> None:
+    async def scenario() -> None:
+        pool, target = _make_pool(size=2, warm=1)
+        await pool.warm()
+        assert pool.stats()["idle"] == 1
+
+        lease = await pool.acquire()
+        assert lease.browser_context_id == "ctx-1"
+        assert pool.stats()["idle"] == 0
+
+        await pool.release(lease)
+        stats = pool.stats()
+        assert stats["idle"] == 1
+        assert stats["leased"] == 0
+        assert target.contexts == ["ctx-1", "ctx-2"]
+
+    asyncio.run(scenario())
+
+
+def test_acquire_waits_in_fifo_order_when_pool_is_full() -> None:
+    async def scenario() -> None:
+        pool, _ = _make_pool(size=1, warm=0)
+        held = await pool.acquire()
+        order: list[str] = []
+
+        async def waiter(name: str):
+            lease = await pool.acquire()
+            order.append(name)
+            return lease
+
+        first = asyncio.create_task(waiter("first"))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(waiter("second"))
+        await asyncio.sleep(0)
+        assert pool.stats()["waiting"] == 2
+
+        await pool.release(held)
+        lease = await first
+        assert order == ["first"]
+        assert not second.done()
+
+        await pool.release(lease)
+        await second
+        assert order == ["first", "second"]
+
+    asyncio.run(scenario())
+
+
+def test_acquire_times_out_when_no_context_frees_up() -> None:
+    async def scenario() -> None:
+        pool, _ = _make_pool(size=1, warm=0)
+        await pool.acquire()
+        with pytest.raises(BrowserContextPoolTimeout):
+            await pool.acquire(timeout=0.01)
+        assert pool.stats()["waiting"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_freed_slot_is_reserved_for_the_oldest_waiter() -> None:
+    async def scenario() -> None:
+        pool, _ = _make_pool(size=1, warm=0)
+        held = await pool.acquire()
+        waiting = asyncio.create_task(pool.acquire())
+        await asyncio.sleep(0)
+
+        await pool.release(held)
+        # A newcomer arriving before the waiter resumes must queue behind it.
+        newcomer = asyncio.create_task(pool.acquire(timeout=0.05))
+        lease = await waiting
+        with pytest.raises(BrowserContextPoolTimeout):
+            await newcomer
+        assert pool.stats()["leased"] == 1
+        assert pool.stats()["pending"] == 0
+        await pool.release(lease)
+
+    asyncio.run(scenario())
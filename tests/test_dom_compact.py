@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from agent.browser.dom import DOMElementNode
+from agent.browser.dom_compact import CompactDOMTree
+from agent.controller.prompt import build_prompt
+
+
+def _snapshot():
+    return {
+        "tagName": "body",
+        "xpath": "/html/body",
+        "isVisible": True,
+        "children": [
+            {
+                "tagName": "nav",
+                "xpath": "/html[1]/body[1]/nav[1]",
+                "isVisible": True,
+                "annotations": ["SCROLL"],
+                "children": [
+                    {
+                        "tagName": "a",
+                        "attributes": {"href": "https://example.com/" + "x" * 60, "class": "link"},
+                        "xpath": "/html[1]/body[1]/nav[1]/a[1]",
+                        "isVisible": True,
+                        "isInteractive": True,
+                        "isTopElement": True,
+                        "highlightIndex": 2,
+                        "children": [{"nodeType": "text", "text": "  ホーム "}],
+                    },
+                    None,
+                    {
+                        "tagName": "a",
+                        "attributes": {"class": "link", "data-x": "ignored"},
+                        "xpath": "/html[1]/body[1]/nav[1]/a[2]",
+                        "isInteractive": True,
+                        "highlightIndex": 1,
+                        "nodeId": 9,
+                    },
+                ],
+            },
+            {"nodeType": "text", "text": "本文"},
+            {
+                "tagName": "div",
+                "xpath": "/html[1]/body[1]/div[1]",
+                "excludedByParent": True,
+                "children": [{"nodeType": "text", "text": "hidden"}],
+            },
+            {
+                "tagName": "form",
+                "xpath": "/html[1]/body[1]/form[1]",
+                "children": [
+                    {"tagName": "input", "attributes": {"type": "text", "name": "q"},
+                     "xpath": "/html[1]/body[1]/form[1]/input[1]", "isInteractive": True, "highlightIndex": 3},
+                    {"nodeType": "text", "text": "検索"},
+                ],
+            },
+        ],
+    }
+
+
+def test_compact_tree_renders_like_dom_element_node() -> None:
+    nodes = DOMElementNode.from_json(_snapshot())
+    compact = CompactDOMTree.from_json(_snapshot())
+
+    assert len(compact) == 11
+    assert compact.to_text() == nodes.to_text()
+    for max_lines in (1, 2, 4):
+        assert compact.to_text(max_lines=max_lines) == nodes.to_text(max_lines=max_lines)
+    nav = compact.root.children[0]
+    assert nav.to_lines(depth=1) == nodes.children[0].to_lines(depth=1)
+
+    compact.set_scroll_info(pixels_above=10, pixels_below=0)
+    nodes.set_scroll_info(pixels_above=10, pixels_below=0)
+    assert compact.to_text() == nodes.to_text()
+    assert compact.to_text().startswith("... 10 pixels above ...")
+
+
+def test_compact_nodes_expose_the_element_fields() -> None:
+    compact = CompactDOMTree.from_json(_snapshot())
+    root = compact.root
+    link = root.children[0].children[1]
+
+    assert root.xpath == "/html/body"
+    assert link.xpath == "/html[1]/body[1]/nav[1]/a[2]"
+    assert link.attributes == {"class": "link", "data-x": "ignored"}
+    assert (link.tagName, link.highlightIndex, link.nodeId, link.isVisible) == ("a", 1, 9, False)
+    assert link.parent == root.children[0]
+    assert root.children[1].text == "本文" and root.children[1].xpath == ""
+    assert root.children[0].annotations == ["SCROLL"]
+    assert [n.highlightIndex for n in compact.interactive()] == [1, 2, 3]
+    # Class values and XPath steps are interned once.
+    assert compact.strings.count("link") == 1
+    assert compact.xpaths()[4] == "/html[1]/body[1]/nav[1]/a[2]"
+
+
+def test_compact_tree_round_trips_and_marks_new_elements() -> None:
+    nodes = DOMElementNode.from_json(_snapshot())
+    compact = CompactDOMTree.from_node(nodes)
+
+    assert compact.to_node() == nodes
+    assert CompactDOMTree.from_json(None) is None
+
+    previous = _snapshot()
+    del previous["children"][3]
+    text = compact.to_text(previous_dom=CompactDOMTree.from_json(previous))
+    assert "[*3]<input" in text
+    assert "[*2]" not in text
+    assert not compact.root.children[3].isNewElement
+
+
+def test_build_prompt_accepts_compact_tree() -> None:
+    compact = CompactDOMTree.from_json(_snapshot())
+    nodes = DOMElementNode.from_json(_snapshot())
+
+    assert build_prompt("検索して", "", [], elements=compact) == build_prompt(
+        "検索して", "", [], elements=nodes
+    )
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import copy
+
+from agent.browser.dom import DOMElementNode
+from agent.browser.dom_compact import CompactDOMTree
+from agent.browser.dom_diff import added_elements, diff_trees, node_hashes, render_diff
+
+
+def _item(i, text):
+    return {
+        "tagName": "li",
+        "attributes": {"id": f"item-{i}"},
+        "xpath": f"/html[1]/body[1]/ul[1]/li[{i}]",
+        "children": [{"nodeType": "text", "text": text}],
+    }
+
+
+def _page():
+    return {
+        "tagName": "body",
+        "xpath": "/html/body",
+        "children": [
+            {"tagName": "ul", "xpath": "/html[1]/body[1]/ul[1]", "children": [_item(i, f"商品 {i}") for i in range(1, 6)]},
+            {
+                "tagName": "form",
+                "xpath": "/html[1]/body[1]/form[1]",
+                "children": [
+                    {"tagName": "input", "attributes": {"name": "q"}, "xpath": "/html[1]/body[1]/form[1]/input[1]",
+                     "isInteractive": True, "highlightIndex": 1},
+                ],
+            },
+            {"tagName": "aside", "xpath": "/html[1]/body[1]/aside[1]", "children": []},
+        ],
+    }
+
+
+def test_identical_trees_stop_at_the_root() -> None:
+    old = DOMElementNode.from_json(_page())
+    new = DOMElementNode.from_json(_page())
+
+    diff = diff_trees(old, new)
+    assert not diff
+    assert diff.compared == 1
+    assert render_diff(diff) == ["No changes since the previous step."]
+    # Hashes are memoised on the nodes.
+    assert node_hashes(new.children[0]) is new.children[0]._merkle
+
+
+def test_diff_reports_each_kind_of_change() -> None:
+    page = _page()
+    old = DOMElementNode.from_json(page)
+    changed = copy.deepcopy(page)
+    items = changed["children"][0]["children"]
+    items[1]["children"][0]["text"] = "商品 2 (在庫なし)"
+    items.insert(0, items.pop(3))  # item 4 to the front
+    changed["children"][2]["children"].append(items.pop(4))  # item 5 into the aside
+    changed["children"][1]["children"][0]["attributes"] = {"name": "q", "placeholder": "検索"}
+    changed["children"][1]["children"].append(
+        {"tagName": "button", "xpath": "/html[1]/body[1]/form[1]/button[1]", "isInteractive": True,
+         "highlightIndex": 2, "children": [{"nodeType": "text", "text": "送信"}]}
+    )
+    items[3]["attributes"] = {"id": "item-3", "class": "sold-out"}
+    items.pop(1)  # item 1 removed
+    new = DOMElementNode.from_json(changed)
+
+    diff = diff_trees(old, new)
+
+    assert diff.counts() == {"added": 1, "removed": 1, "changed": 3, "moved": 2}
+    assert diff.compared < 20
+    within, across = sorted(diff.moved, key=lambda change: change.parent.tagName, reverse=True)
+    assert within.new.attributes == {"id": "item-4"} and within.parent.tagName == "ul"
+    assert across.old.xpath == "/html[1]/body[1]/ul[1]/li[5]"
+    assert across.parent.tagName == "aside"
+    assert diff.removed[0].old.attributes == {"id": "item-1"}
+    assert diff.added[0].new.tagName == "button"
+
+    lines = render_diff(diff)
+    assert lines[0] == "Changes since the previous step: 1 added, 1 removed, 3 changed, 2 moved"
+    assert "+ /html[1]/body[1]/form[1]/button[1]" in lines
+    assert "  [2]<button /> 送信" in lines
+    assert '  [1]<input name="q" placeholder="検索" />' in lines
+    assert '  <li id="item-2" /> 商品 2 (在庫なし)' in lines
+    assert '  <li id="item-3" class="sold-out" /> 商品 3' in lines
+
+    # to_text also marks the added elements.
+    text = new.to_text(previous_dom=old, changes_only=True)
+    assert text == "\n".join(lines).replace("[2]<button", "[*2]<button")
+    assert new.to_text(previous_dom=old, changes_only=True, max_lines=2) == "\n".join(text.splitlines()[:2])
+    compact = CompactDOMTree.from_json(changed)
+    assert compact.to_text(previous_dom=CompactDOMTree.from_json(page), changes_only=True) == text
+
+
+def test_only_added_elements_are_marked_new() -> None:
+    page = _page()
+    old = DOMElementNode.from_json(page)
+    inserted = copy.deepcopy(page)
+    inserted["children"].insert(0, {"tagName": "ul", "xpath": "/html[1]/body[1]/ul[1]", "children": [_item(9, "新着")]})
+    for i, child in enumerate(inserted["children"][1]["children"], start=1):
+        child["xpath"] = f"/html[1]/body[1]/ul[2]/li[{i}]"
+    new = DOMElementNode.from_json(inserted)
+
+    text = new.to_text(previous_dom=old)
+
+    added = added_elements(diff_trees(old, new))
+    assert [n.tagName for n in new.children if n in added] == ["ul"]
+    assert new.children[0].children[0] in added
+    assert not any(n in added for n in new.children[1].children)
+    assert '[*' not in text and '<li id="item-9" /> 新着' in text
+    # Nodes are left untouched; only the rendering marks them.
+    assert not new.children[0].isNewElement
+
+
+def test_new_markers_do_not_outlive_their_step() -> None:
+    a = DOMElementNode.from_json({
+        "tagName": "body", "xpath": "/html/body", "nodeId": 1,
+        "children": [
+            {"tagName": "form", "xpath": "/html[1]/body[1]/form[1]", "nodeId": 2, "children": []},
+            {"tagName": "p", "xpath": "/html[1]/body[1]/p[1]", "nodeId": 3,
+             "children": [{"nodeType": "text", "text": "一"}]},
+        ],
+    })
+    b = a.apply_patches([{"nodeId": 2, "node": {
+        "tagName": "form", "xpath": "/html[1]/body[1]/form[1]", "nodeId": 2,
+        "children": [{"tagName": "button", "xpath": "/html[1]/body[1]/form[1]/button[1]", "nodeId": 4,
+                      "isInteractive": True, "children": []}],
+    }}])
+    c = b.apply_patches([{"nodeId": 3, "node": {
+        "tagName": "p", "xpath": "/html[1]/body[1]/p[1]", "nodeId": 3,
+        "children": [{"nodeType": "text", "text": "二"}],
+    }}])
+    assert c.children[0] is b.children[0]  # The form is shared
+
+    assert "[*1]<button />" in b.to_text(previous_dom=a)
+    text = c.to_text(previous_dom=b)
+    assert "[1]<button />" in text and "[*" not in text
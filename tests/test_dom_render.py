@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import sys
+
+from agent.browser.dom import DOMElementNode
+from agent.browser.dom_compact import CompactDOMTree
+from agent.browser.dom_render import CHARS_PER_TOKEN, budget_chars, render_budgeted
+
+
+def _text(text):
+    return {"nodeType": "text", "text": text}
+
+
+def _page():
+    articles = [
+        {"tagName": "p", "xpath": f"/html[1]/body[1]/main[1]/p[{i}]", "children": [_text(f"記事の本文 {i} " * 3)]}
+        for i in range(1, 31)
+    ]
+    return {
+        "tagName": "body",
+        "xpath": "/html/body",
+        "children": [
+            {
+                "tagName": "form",
+                "xpath": "/html[1]/body[1]/form[1]",
+                "children": [
+                    {"tagName": "label", "xpath": "/html[1]/body[1]/form[1]/label[1]", "children": [_text("キーワード")]},
+                    {"tagName": "input", "attributes": {"name": "q"}, "xpath": "/html[1]/body[1]/form[1]/input[1]",
+                     "isInteractive": True, "highlightIndex": 1},
+                    {"tagName": "button", "xpath": "/html[1]/body[1]/form[1]/button[1]",
+                     "isInteractive": True, "highlightIndex": 2, "children": [_text("検索")]},
+                ],
+            },
+            {"tagName": "main", "xpath": "/html[1]/body[1]/main[1]", "children": articles},
+            {"tagName": "a", "attributes": {"href": "/next"}, "xpath": "/html[1]/body[1]/a[1]",
+             "isInteractive": True, "highlightIndex": 3, "children": [_text("次へ")]},
+        ],
+    }
+
+
+def test_budget_keeps_interactive_elements_and_summarises_the_rest() -> None:
+    root = DOMElementNode.from_json(_page())
+    full = root.to_text()
+
+    assert root.to_text(max_chars=len(full)) == full
+    text = root.to_text(max_chars=400)
+
+    assert len(text) <= 400
+    lines = text.splitlines()
+    assert lines[0] == "<body>"
+    assert '  <form>' in lines
+    assert '    [1]<input name="q" />' in lines
+    assert "    [2]<button /> 検索" in lines
+    assert "  [3]<a /> 次へ" in lines
+    # The label next to the input is kept before the distant article text.
+    assert "    <label /> キーワード" in lines
+    summary = next(line for line in lines if "omitted" in line)
+    assert summary.startswith('    ... 25 lines omitted: "記事の本文 3 記事の本文 3')
+    # Articles nearest the form and the link are kept around the summary.
+    assert lines[lines.index(summary) - 1].endswith("記事の本文 2")
+    assert lines[lines.index(summary) + 1].startswith("    <p /> 記事の本文 28")
+
+    compact = CompactDOMTree.from_json(_page())
+    assert compact.to_text(max_chars=400) == text
+
+
+def test_token_budget_and_scroll_annotations_share_the_limit() -> None:
+    assert budget_chars(max_tokens=10) == 10 * CHARS_PER_TOKEN
+    assert budget_chars(max_chars=25, max_tokens=10) == 25
+    assert budget_chars() is None
+
+    root = DOMElementNode.from_json(_page())
+    root.set_scroll_info(pixels_above=0, pixels_below=1200)
+    text = root.to_text(max_tokens=50)
+    assert len(text) <= 50 * CHARS_PER_TOKEN
+    assert text.endswith("... 1200 pixels below ...")
+
+    # Annotations that do not fit are dropped rather than overrunning.
+    assert root.to_text(max_chars=10) == ""
+    assert render_budgeted(root, 0) == []
+
+
+def test_deeply_nested_pages_render_without_recursion() -> None:
+    depth = sys.getrecursionlimit() + 500
+    node = {"tagName": "div", "xpath": "/x", "children": [_text("奥")]}
+    for _ in range(depth):
+        node = {"tagName": "div", "xpath": "/x", "children": [node]}
+
+    root = DOMElementNode.from_json(node)
+    lines = root.to_lines()
+    assert len(lines) == depth + 1
+    assert lines[-1].strip() == "<div /> 奥"
+    assert len(root.to_text(max_chars=5000)) <= 5000
+    assert CompactDOMTree.from_json(node).to_lines() == lines
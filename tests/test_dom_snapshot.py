@@ -0,0 +1,310 @@
+from __future__ import annotations
+
+import pytest
+
+from agent.browser import dom_benchmark
+from agent.browser.dom import DOM_SNAPSHOT_SCRIPT, DOMElementNode, IncrementalDOMSnapshot
+
+
+def test_extract_snapshot_script_reads_module_literal() -> None:
+    source = dom_benchmark._ROOT.joinpath("agent/browser/dom.py").read_text(encoding="utf-8")
+    assert dom_benchmark.extract_snapshot_script(source) == DOM_SNAPSHOT_SCRIPT
+
+    with pytest.raises(ValueError):
+        dom_benchmark.extract_snapshot_script("OTHER = 1\n")
+
+
+def test_fixtures_are_available() -> None:
+    fixtures = dom_benchmark.load_fixtures()
+    assert "listing.html" in fixtures
+
+
+@pytest.fixture(scope="module")
+def page():
+    sync_api = pytest.importorskip("playwright.sync_api")
+    with sync_api.sync_playwright() as pw:
+        try:
+            browser = pw.chromium.launch()
+        except Exception as exc:
+            pytest.skip(f"Chromium unavailable: {exc}")
+        page = browser.new_page(viewport=dom_benchmark.VIEWPORT)
+        yield page
+        browser.close()
+
+
+def _walk(node: DOMElementNode):
+    yield node
+    for child in node.children:
+        yield from _walk(child)
+
+
+def test_snapshot_of_listing_fixture(page) -> None:
+    page.set_content(dom_benchmark.load_fixtures()["listing.html"])
+    root = DOMElementNode.from_page(page)
+    nodes = list(_walk(root))
+
+    assert root.xpath == "/html/body"
+    indices = [n.highlightIndex for n in nodes if n.highlightIndex is not None]
+    assert sorted(indices) == list(range(1, len(indices) + 1))
+
+    texts = {n.text for n in nodes if n.tagName == "#text"}
+    assert "非表示ボタン" not in texts
+    assert "隠しリンク" not in texts
+    # Spans inside a link merge into it rather than being listed separately.
+    search_link = next(n for n in nodes if n.attributes.get("href") == "/search")
+    assert all(child.tagName != "span" for child in search_link.children)
+    assert any(n.annotations == ["SCROLL"] for n in nodes)
+
+    xpaths = [n.xpath for n in nodes if n.tagName != "#text"]
+    assert len(xpaths) == len(set(xpaths))
+    for xpath in xpaths[1:]:
+        assert page.evaluate(
+            "xp => document.evaluate(xp, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue !== null",
+            xpath,
+        )
+
+
+def _element(node_id, xpath, children=(), interactive=False, **extra):
+    data = {
+        "tagName": extra.pop("tagName", "div"),
+        "attributes": extra.pop("attributes", {}),
+        "xpath": xpath,
+        "isVisible": True,
+        "isInteractive": interactive,
+        "isTopElement": interactive,
+        "children": list(children),
+        "nodeId": node_id,
+    }
+    data.update(extra)
+    return data
+
+
+def _tree():
+    body = _element(
+        1,
+        "/html/body",
+        [
+            _element(2, "/html[1]/body[1]/div[1]", [{"nodeType": "text", "text": "first"}]),
+            _element(3, "/html[1]/body[1]/div[2]", [
+                _element(4, "/html[1]/body[1]/div[2]/button[1]", interactive=True, tagName="button"),
+            ]),
+            _element(5, "/html[1]/body[1]/a[1]", interactive=True, tagName="a"),
+        ],
+    )
+    return DOMElementNode.from_json(body)
+
+
+def test_apply_patches_reuses_untouched_subtrees_and_renumbers() -> None:
+    tree = _tree()
+    assert [n.highlightIndex for n in _walk(tree) if n.isInteractive] == [None, None]
+
+    patched = tree.apply_patches([
+        {
+            "nodeId": 1,
+            "node": _element(1, "/html/body", [
+                _element(6, "/html[1]/body[1]/input[1]", interactive=True, tagName="input"),
+                {"ref": 2, "xpath": "/html[1]/body[1]/div[1]"},
+                {"ref": 3, "xpath": "/html[1]/body[1]/div[2]"},
+                {"ref": 5, "xpath": "/html[1]/body[1]/a[1]"},
+            ]),
+        }
+    ])
+
+    assert patched is not tree
+    assert patched.children[1] is tree.children[0]
+    assert [n.tagName for n in patched.children] == ["input", "div", "div", "a"]
+    # Indices follow the post-order numbering of a full snapshot.
+    assert [(n.tagName, n.highlightIndex) for n in _walk(patched) if n.isInteractive] == [
+        ("input", 1),
+        ("button", 2),
+        ("a", 3),
+    ]
+    assert tree.children[1].children[0].highlightIndex is None
+
+
+def test_apply_patches_moves_xpaths_and_removes_nodes() -> None:
+    tree = _tree()
+    patched = tree.apply_patches([
+        {
+            "nodeId": 1,
+            "node": _element(1, "/html/body", [
+                {"ref": 3, "xpath": "/html[1]/body[1]/div[1]"},
+                {"ref": 5, "xpath": "/html[1]/body[1]/a[1]"},
+            ]),
+        },
+        {"nodeId": 5, "node": None},
+    ])
+
+    assert [n.nodeId for n in patched.children] == [3]
+    assert patched.children[0].xpath == "/html[1]/body[1]/div[1]"
+    assert patched.children[0].children[0].xpath == "/html[1]/body[1]/div[1]/button[1]"
+    assert patched.children[0].children[0].highlightIndex == 1
+
+
+def test_apply_patches_rejects_unknown_references() -> None:
+    with pytest.raises(KeyError):
+        _tree().apply_patches([
+            {"nodeId": 2, "node": _element(2, "/html[1]/body[1]/div[1]", [{"ref": 99, "xpath": "/x"}])}
+        ])
+
+
+def test_apply_patches_shares_subtrees_whose_indices_do_not_shift() -> None:
+    tree = DOMElementNode.from_json(_element(1, "/html/body", [
+        _element(2, "/html[1]/body[1]/a[1]", interactive=True, tagName="a", highlightIndex=1),
+        _element(3, "/html[1]/body[1]/div[1]", [{"nodeType": "text", "text": "old"}]),
+        _element(4, "/html[1]/body[1]/a[2]", interactive=True, tagName="a", highlightIndex=2),
+    ]))
+
+    relabelled = tree.apply_patches([
+        {"nodeId": 3, "node": _element(3, "/html[1]/body[1]/div[1]", [{"nodeType": "text", "text": "new"}])},
+    ])
+    assert relabelled.children[0] is tree.children[0]
+    assert relabelled.children[2] is tree.children[2]
+
+    grown = relabelled.apply_patches([
+        {"nodeId": 3, "node": _element(3, "/html[1]/body[1]/div[1]", [
+            _element(5, "/html[1]/body[1]/div[1]/button[1]", interactive=True, tagName="button"),
+        ])},
+    ])
+    assert grown.children[0] is tree.children[0]
+    assert [(n.nodeId, n.highlightIndex) for n in _walk(grown) if n.isInteractive] == [
+        (2, 1),
+        (5, 2),
+        (4, 3),
+    ]
+
+
+def test_apply_patches_handles_deep_trees() -> None:
+    root = leaf = _element(0, "/html/body")
+    for node_id in range(1, 3000):
+        child = _element(node_id, leaf["xpath"] + "/div[1]", interactive=node_id % 3 == 0)
+        leaf["children"].append(child)
+        leaf = child
+    tree = DOMElementNode.from_json(root)
+
+    patched = tree.apply_patches([
+        {"nodeId": 2999, "node": _element(2999, leaf["xpath"], [{"nodeType": "text", "text": "x"}])},
+    ])
+    again = patched.apply_patches([
+        {"nodeId": 1500, "node": _element(1500, "/moved", [{"ref": 1501, "xpath": "/moved/div[1]"}])},
+    ])
+
+    node = again
+    while node.children and node.children[0].tagName != "#text":
+        node = node.children[0]
+    assert node.nodeId == 2999
+    assert node.xpath.startswith("/moved/div[1]/")
+    assert node.children[0].text == "x"
+
+
+def test_incremental_snapshot_can_be_switched_off(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("DOM_SNAPSHOT_INCREMENTAL", raising=False)
+    assert IncrementalDOMSnapshot().incremental
+
+    monkeypatch.setenv("DOM_SNAPSHOT_INCREMENTAL", "0")
+    calls = []
+
+    class _Page:
+        def evaluate(self, script, *args):
+            calls.append(script)
+            return _element(1, "/html/body")
+
+    snapshots = IncrementalDOMSnapshot()
+    snapshots.snapshot(_Page())
+    snapshots.snapshot(_Page())
+
+    assert calls == [DOM_SNAPSHOT_SCRIPT, DOM_SNAPSHOT_SCRIPT]
+    assert snapshots.last_stats == {"full": True}
+
+
+class _ScriptedPage:
+    def __init__(self, *results) -> None:
+        self.results = list(results)
+        self.calls = []
+
+    def evaluate(self, script, options):
+        self.calls.append(options)
+        return self.results.pop(0)
+
+
+def test_incremental_snapshot_patches_then_recovers_from_drift() -> None:
+    full = {"full": True, "generation": 1, "tree": _element(1, "/html/body", [
+        _element(2, "/html[1]/body[1]/div[1]", [{"nodeType": "text", "text": "old"}]),
+    ]), "stats": {"roots": 1, "serialized": 2}}
+    text_patch = {"full": False, "generation": 2, "patches": [
+        {"nodeId": 2, "node": _element(2, "/html[1]/body[1]/div[1]", [{"nodeType": "text", "text": "new"}])},
+    ], "stats": {"roots": 1, "serialized": 1}}
+    drifted = {"full": False, "generation": 3, "patches": [
+        {"nodeId": 1, "node": _element(1, "/html/body", [{"ref": 42, "xpath": "/x"}])},
+    ]}
+    refreshed = dict(full, generation=4)
+    page = _ScriptedPage(full, text_patch, drifted, refreshed)
+    snapshots = IncrementalDOMSnapshot(max_dirty=7, incremental=True)
+
+    first = snapshots.snapshot(page)
+    second = snapshots.snapshot(page)
+    third = snapshots.snapshot(page)
+
+    assert first.children[0].children[0].text == "old"
+    assert second.children[0].children[0].text == "new"
+    assert snapshots.last_stats == {"full": True, "roots": 1, "serialized": 2}
+    assert third.children[0].children[0].text == "old"
+    assert [call["generation"] for call in page.calls] == [None, 1, 2, None]
+    assert page.calls[0]["maxDirty"] == 7
+    assert snapshots.generation == 4
+
+
+def test_incremental_snapshot_matches_full_snapshot(page) -> None:
+    page.set_content(dom_benchmark.load_fixtures()["listing.html"])
+    snapshots = IncrementalDOMSnapshot(incremental=True)
+    snapshots.snapshot(page)
+
+    page.evaluate(
+        """() => {
+          const menu = document.createElement('ul');
+          menu.style.cssText = 'position:absolute; left:0; top:40px; width:300px; background:#fff';
+          menu.innerHTML = '<li><a href="/a">メニュー A</a></li><li><a href="/b">メニュー B</a></li>';
+          document.querySelector('nav').appendChild(menu);
+          document.querySelector('.card p').textContent = '更新済み';
+        }"""
+    )
+    incremental = snapshots.snapshot(page)
+
+    assert not snapshots.last_stats["full"]
+    assert incremental.to_text() == DOMElementNode.from_page(page).to_text()
+
+
+def test_to_json_matches_the_snapshot_script(page) -> None:
+    page.set_content(dom_benchmark.load_fixtures()["listing.html"])
+    data = page.evaluate(DOM_SNAPSHOT_SCRIPT)
+
+    assert DOMElementNode.from_json(data).to_json() == data
+
+
+def test_incremental_snapshot_follows_reflow_and_replaced_documents(page) -> None:
+    listing = dom_benchmark.load_fixtures()["listing.html"]
+    page.set_content(listing)
+    snapshots = IncrementalDOMSnapshot(incremental=True)
+    snapshots.snapshot(page)
+
+    changes = [
+        # Later cards slide into the scroll container's visible area.
+        "() => document.querySelectorAll('.card')[0].style.display = 'none'",
+        "() => document.querySelectorAll('.card')[1].querySelector('p').textContent = '長い説明 '.repeat(20)",
+        # The fixed overlay's button outgrows it and paints over the page.
+        "() => document.querySelector('.overlay button').style.cssText = 'display:block; width:1200px; height:700px; margin-left:-900px'",
+    ]
+    for change in changes:
+        page.evaluate(change)
+        incremental = snapshots.snapshot(page)
+        assert not snapshots.last_stats["full"]
+        assert incremental.to_json() == page.evaluate(DOM_SNAPSHOT_SCRIPT)
+
+    # set_content reuses the window, so the observer has to follow the new document.
+    page.set_content(listing)
+    snapshots.snapshot(page)
+    page.evaluate("() => document.querySelector('.card p').textContent = '更新済み'")
+    incremental = snapshots.snapshot(page)
+    assert not snapshots.last_stats["full"]
+    assert incremental.to_json() == page.evaluate(DOM_SNAPSHOT_SCRIPT)
+
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+from agent.browser.catalog import ElementCatalogCache, build_element_catalog
+
+
+def _node(backend_node_id: int, tag: str, text: str, xpath: str, **attributes: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        backend_node_id=backend_node_id,
+        tag_name=tag,
+        node_value=text,
+        attributes=attributes,
+        frame_id=None,
+        xpath=xpath,
+        is_visible=True,
+        ax_node=None,
+    )
+
+
+def _selector_map() -> dict[int, SimpleNamespace]:
+    return {
+        1: _node(10, "input", "", "html/body/form/input", name="q", type="text"),
+        2: _node(11, "button", "検索", "html/body/form/button"),
+        3: _node(12, "a", "次へ", "html/body/a"),
+    }
+
+
+def test_cache_reuses_unchanged_entries_across_steps() -> None:
+    cache = ElementCatalogCache()
+    first = build_element_catalog(_selector_map(), cache)
+    assert first.text == build_element_catalog(_selector_map()).text
+    assert (cache.hits, cache.misses) == (0, 3)
+
+    selector_map = _selector_map()
+    selector_map[2].node_value = "検索する"
+    selector_map[4] = selector_map.pop(3)  # Same node under a new index
+    second = build_element_catalog(selector_map, cache)
+
+    assert (cache.hits, cache.misses) == (2, 4)
+    assert second.entries[0] is first.entries[0]
+    assert second.entries[1] is not first.entries[1]
+    assert second.text == build_element_catalog(selector_map).text
+    assert second.text.splitlines()[2].startswith("[04] <a> | text=\"次へ\"")
+
+
+def test_snapshot_text_and_metadata_are_memoised() -> None:
+    snapshot = build_element_catalog(_selector_map())
+
+    assert snapshot.text is snapshot.text
+    assert snapshot.metadata is snapshot.metadata
+    assert snapshot.metadata == {"total": 3, "tags": {"input": 1, "button": 1, "a": 1}}
+    assert build_element_catalog({}, ElementCatalogCache()).text == ""
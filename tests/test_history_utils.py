@@ -1,3 +1,8 @@
+import json
+
+import pytest
+
+from agent.utils import history
 from agent.utils.history import format_history_for_prompt
 
 
@@ -59,3 +64,67 @@ def test_format_history_for_prompt_includes_errors() -> None:
 
     assert "完了状態: 失敗" in formatted
     assert "エラー: missing field" in formatted or "エラー: validation error" in formatted
+
+
+@pytest.fixture
+def history_paths(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    legacy = tmp_path / "conversation_history.json"
+    log_file = tmp_path / "conversation_history.jsonl"
+    monkeypatch.setattr(history, "HIST_FILE", str(legacy))
+    monkeypatch.setattr(history, "HIST_LOG_FILE", str(log_file))
+    return legacy, log_file
+
+
+def test_append_history_entry_appends_single_line(history_paths) -> None:
+    _, log_file = history_paths
+
+    history.append_history_entry("one", {"status": "completed"}, "https://a.example/")
+    history.append_history_entry("two", {"status": "failed"}, "https://b.example/")
+
+    lines = log_file.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 2
+    assert json.loads(lines[1])["user"] == "two"
+    assert [entry["user"] for entry in history.load_hist()] == ["one", "two"]
+
+
+def test_tail_hist_returns_recent_entries(history_paths, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(history, "_TAIL_BLOCK_SIZE", 16)
+    for index in range(10):
+        history.append_hist_record({"user": f"cmd-{index}"})
+
+    recent = history.tail_hist(3)
+
+    assert [entry["user"] for entry in recent] == ["cmd-7", "cmd-8", "cmd-9"]
+    assert len(history.tail_hist(50)) == 10
+
+
+def test_load_hist_migrates_legacy_file(history_paths) -> None:
+    legacy, log_file = history_paths
+    legacy.write_text(json.dumps([{"user": "old"}]), encoding="utf-8")
+
+    assert history.load_hist() == [{"user": "old"}]
+    assert log_file.exists()
+    assert not legacy.exists()
+
+    history.append_hist_record({"user": "new"})
+    assert [entry["user"] for entry in history.load_hist()] == ["old", "new"]
+
+
+def test_malformed_lines_are_skipped_and_compacted(history_paths) -> None:
+    _, log_file = history_paths
+    log_file.write_text('{"user": "a"}\n{"user": "b', encoding="utf-8")
+
+    history.append_hist_record({"user": "c"})
+    assert [entry["user"] for entry in history.load_hist()] == ["a", "c"]
+
+    assert history.compact_hist(max_entries=1) == 1
+    assert log_file.read_text(encoding="utf-8").splitlines() == ['{"user":"c"}']
+
+
+def test_save_hist_replaces_log(history_paths) -> None:
+    history.append_hist_record({"user": "a"})
+
+    history.save_hist([])
+
+    assert history.load_hist() == []
+    assert history.tail_hist(5) == []
@@ -0,0 +1,43 @@
+import pytest
+
+from agent.utils.metrics import MetricsRegistry
+
+
+def test_counter_and_gauge_render_with_labels() -> None:
+    registry = MetricsRegistry()
+    counter = registry.counter("jobs_total", "Jobs run.", ("result",))
+    counter.inc(result="ok")
+    counter.inc(2, result="ok")
+    registry.gauge("queue_depth", "Queued jobs.").set(4)
+
+    body = registry.render()
+
+    assert "# TYPE jobs_total counter" in body
+    assert 'jobs_total{result="ok"} 3.0' in body
+    assert "queue_depth 4.0" in body
+    assert registry.counter("jobs_total", "Jobs run.", ("result",)) is counter
+
+
+def test_histogram_renders_cumulative_buckets() -> None:
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value)
+
+    lines = registry.render().splitlines()
+
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in lines
+    assert "latency_seconds_count 3" in lines
+    assert histogram.count() == 3
+
+
+def test_collector_samples_and_label_validation() -> None:
+    registry = MetricsRegistry()
+    registry.collector("sessions", "gauge", "Sessions.", lambda: [({"state": 'a"b'}, 2)])
+    counter = registry.counter("events_total", "Events.", ("kind",))
+
+    assert 'sessions{state="a\\"b"} 2.0' in registry.render()
+    with pytest.raises(ValueError):
+        counter.inc(other="x")
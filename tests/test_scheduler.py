@@ -0,0 +1,71 @@
+import pytest
+
+from agent.utils.scheduler import AdmissionScheduler, QueueFullError
+
+
+def test_submit_queues_beyond_global_cap_and_admits_on_finish() -> None:
+    scheduler = AdmissionScheduler(max_active=1, max_queued=4)
+    admitted: list[str] = []
+
+    assert scheduler.submit("a", "gemini", lambda: admitted.append("a")) is True
+    assert scheduler.submit("b", "gemini", lambda: admitted.append("b")) is False
+    assert scheduler.position("b") == 1
+
+    scheduler.finish("a")
+    assert admitted == ["b"]
+    assert scheduler.position("b") is None
+    assert scheduler.stats()["active"] == 1
+
+
+def test_priority_orders_queue_and_keeps_fifo_within_priority() -> None:
+    scheduler = AdmissionScheduler(max_active=1, max_queued=4)
+    admitted: list[str] = []
+    scheduler.submit("running", "gemini", lambda: None)
+    for key, priority in (("low", 0), ("high-1", 5), ("high-2", 5)):
+        scheduler.submit(key, "gemini", lambda key=key: admitted.append(key), priority=priority)
+
+    assert scheduler.queued_keys() == ["high-1", "high-2", "low"]
+
+    scheduler.finish("running")
+    scheduler.finish("high-1")
+    scheduler.finish("high-2")
+    assert admitted == ["high-1", "high-2", "low"]
+
+
+def test_group_limit_does_not_block_other_groups() -> None:
+    scheduler = AdmissionScheduler(max_active=3, max_queued=4, group_limits={"groq": 1})
+    admitted: list[str] = []
+
+    assert scheduler.submit("groq-1", "groq", lambda: None) is True
+    assert scheduler.submit("groq-2", "groq", lambda: admitted.append("groq-2")) is False
+    assert scheduler.submit("gemini-1", "gemini", lambda: None) is True
+
+    scheduler.finish("gemini-1")
+    assert admitted == []
+    scheduler.finish("groq-1")
+    assert admitted == ["groq-2"]
+    assert scheduler.stats()["active_by_group"] == {"groq": 1}
+
+
+def test_submit_rejects_when_queue_is_full() -> None:
+    scheduler = AdmissionScheduler(max_active=1, max_queued=1)
+    scheduler.submit("a", "gemini", lambda: None)
+    scheduler.submit("b", "gemini", lambda: None)
+
+    with pytest.raises(QueueFullError) as excinfo:
+        scheduler.submit("c", "gemini", lambda: None)
+
+    assert excinfo.value.retry_after >= 1
+    assert scheduler.queued_keys() == ["b"]
+
+
+def test_cancel_removes_queued_entry() -> None:
+    scheduler = AdmissionScheduler(max_active=1, max_queued=2)
+    admitted: list[str] = []
+    scheduler.submit("a", "gemini", lambda: None)
+    scheduler.submit("b", "gemini", lambda: admitted.append("b"))
+
+    assert scheduler.cancel("b") is True
+    assert scheduler.cancel("a") is False
+    scheduler.finish("a")
+    assert admitted == []
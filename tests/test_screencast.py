@@ -0,0 +1,231 @@
+import asyncio
+import base64
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from vnc import screencast as screencast_module
+from vnc.screencast import Screencast, ScreencastError, ScreencastSettings, mjpeg_part
+
+
+class _FakeCDP:
+    def __init__(self, targets=None) -> None:
+        self.calls: list[tuple[str, object, object]] = []
+        self.handlers: dict[str, object] = {}
+        self.stopped = False
+        self._targets = targets if targets is not None else [
+            {"targetId": "devtools", "type": "page", "url": "devtools://devtools/inspector.html"},
+            {"targetId": "page-1", "type": "page", "url": "https://example.com/"},
+        ]
+
+        async def record(name, params=None, session_id=None, result=None):
+            self.calls.append((name, params, session_id))
+            return result or {}
+
+        self.send = SimpleNamespace(
+            Target=SimpleNamespace(
+                getTargets=lambda params=None: record(
+                    "getTargets", result={"targetInfos": self._targets}
+                ),
+                attachToTarget=lambda params: record(
+                    "attachToTarget", params, result={"sessionId": "S1"}
+                ),
+            ),
+            Page=SimpleNamespace(
+                startScreencast=lambda params, session_id=None: record(
+                    "startScreencast", params, session_id
+                ),
+                stopScreencast=lambda session_id=None: record("stopScreencast", None, session_id),
+                screencastFrameAck=lambda params, session_id=None: record(
+                    "screencastFrameAck", params, session_id
+                ),
+            ),
+        )
+        self.register = SimpleNamespace(
+            Page=SimpleNamespace(
+                screencastFrame=lambda cb: self.handlers.__setitem__("frame", cb)
+            ),
+            Target=SimpleNamespace(
+                detachedFromTarget=lambda cb: self.handlers.__setitem__("detached", cb)
+            ),
+        )
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        self.stopped = True
+
+    def names(self) -> list[str]:
+        return [name for name, _, _ in self.calls]
+
+
+def _emit(handler, payload) -> None:
+    loop = screencast_module._screencast_loop()
+    asyncio.run_coroutine_threadsafe(handler(payload, "S1"), loop).result(timeout=2)
+
+
+def _drain() -> None:
+    loop = screencast_module._screencast_loop()
+    asyncio.run_coroutine_threadsafe(asyncio.sleep(0.05), loop).result(timeout=2)
+
+
+def test_settings_from_params_validates_ranges() -> None:
+    settings = ScreencastSettings.from_params({"quality": "40", "fps": "2", "max_width": "640"})
+    assert settings.quality == 40
+    assert settings.max_fps == 2.0
+    assert settings.cdp_params()["maxWidth"] == 640
+    assert settings.cdp_params()["format"] == "jpeg"
+
+    for params in ({"quality": "0"}, {"fps": "0"}, {"fps": "abc"}, {"max_height": "-1"}):
+        with pytest.raises(ValueError):
+            ScreencastSettings.from_params(params)
+
+
+def test_frames_are_fanned_out_acked_and_stopped_with_last_viewer() -> None:
+    fake = _FakeCDP()
+    settings = ScreencastSettings(quality=50, max_fps=30, max_width=800, max_height=600)
+    cast = Screencast("ws://browser", settings, client_factory=lambda url: fake)
+
+    first = cast.subscribe()
+    assert fake.calls[1] == ("attachToTarget", {"targetId": "page-1", "flatten": True}, None)
+    assert fake.calls[2][0] == "startScreencast"
+    assert fake.calls[2][1] == {"format": "jpeg", "quality": 50, "maxWidth": 800, "maxHeight": 600}
+
+    frame = b"\xff\xd8jpeg"
+    _emit(fake.handlers["frame"], {"data": base64.b64encode(frame).decode(), "sessionId": 7})
+    _drain()
+    assert first.get(timeout=1) == frame
+    assert ("screencastFrameAck", {"sessionId": 7}, "S1") in fake.calls
+
+    # Late joiners receive the latest frame straight away.
+    second = cast.subscribe()
+    assert second.get(timeout=1) == frame
+    assert fake.names().count("startScreencast") == 1
+
+    first.close()
+    second.close()
+    _drain()
+    assert "stopScreencast" in fake.names()
+    assert fake.stopped
+
+
+def test_detached_target_ends_viewer_streams() -> None:
+    fake = _FakeCDP()
+    cast = Screencast("ws://browser", ScreencastSettings(), client_factory=lambda url: fake)
+    viewer = cast.subscribe()
+
+    _emit(fake.handlers["detached"], {"sessionId": "S1"})
+
+    assert viewer.get(timeout=1) is None
+    assert list(screencast_module.mjpeg_stream(viewer)) == []
+    assert cast.subscriber_count() == 0
+
+
+def test_viewer_stays_open_until_the_first_frame() -> None:
+    fake = _FakeCDP()
+    cast = Screencast("ws://browser", ScreencastSettings(), client_factory=lambda url: fake)
+    viewer = cast.subscribe()
+
+    assert viewer.get(timeout=0.01) == b""
+    assert not viewer.closed
+
+    frame = b"\xff\xd8jpeg"
+    _emit(fake.handlers["frame"], {"data": base64.b64encode(frame).decode(), "sessionId": 1})
+    _drain()
+    stream = screencast_module.mjpeg_stream(viewer)
+    assert next(stream) == mjpeg_part(frame)
+    stream.close()
+    assert viewer.closed
+
+
+def test_loop_viewer_awaits_frames_without_a_thread() -> None:
+    fake = _FakeCDP()
+    cast = Screencast("ws://browser", ScreencastSettings(), client_factory=lambda url: fake)
+    frame = b"\xff\xd8jpeg"
+
+    async def scenario() -> list[bytes | None]:
+        viewer = cast.subscribe(asyncio.get_running_loop())
+        received = [await viewer.get_async(timeout=0.01)]
+        # Frames arrive on the screencast's own loop thread.
+        _emit(fake.handlers["frame"], {"data": base64.b64encode(frame).decode(), "sessionId": 1})
+        received.append(await viewer.get_async(timeout=1))
+        received.append(await viewer.get_async(timeout=0.01))
+        _emit(fake.handlers["detached"], {"sessionId": "S1"})
+        received.append(await viewer.get_async(timeout=1))
+        viewer.close()
+        return received
+
+    assert asyncio.run(scenario()) == [b"", frame, frame, None]
+    assert cast.subscriber_count() == 0
+
+
+def test_subscribe_fails_without_a_page_target() -> None:
+    fake = _FakeCDP(targets=[])
+    cast = Screencast("ws://browser", ScreencastSettings(), client_factory=lambda url: fake)
+
+    with pytest.raises(ScreencastError):
+        cast.subscribe()
+    assert cast.subscriber_count() == 0
+    assert fake.stopped
+
+
+def test_viewers_joining_a_failing_start_all_fail() -> None:
+    release = threading.Event()
+
+    class _SlowFailingCDP(_FakeCDP):
+        async def start(self) -> None:
+            await asyncio.get_running_loop().run_in_executor(None, release.wait)
+            raise ConnectionError("browser went away")
+
+    settings = ScreencastSettings(quality=11)
+    cast = Screencast("ws://slow", settings, client_factory=lambda url: _SlowFailingCDP())
+    key = ("ws://slow", None, settings)
+    screencast_module._screencasts[key] = cast
+    errors: list[Exception] = []
+
+    def viewer() -> None:
+        try:
+            cast.subscribe()
+        except ScreencastError as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=viewer) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 2
+    while cast.subscriber_count() < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cast.subscriber_count() == 2
+    release.set()
+    for thread in threads:
+        thread.join(timeout=2)
+
+    assert len(errors) == 2
+    assert cast.subscriber_count() == 0
+    assert key not in screencast_module._screencasts
+
+
+def test_pending_acks_are_kept_until_done() -> None:
+    fake = _FakeCDP()
+    cast = Screencast("ws://browser", ScreencastSettings(max_fps=0.5), client_factory=lambda url: fake)
+    viewer = cast.subscribe()
+    frame = base64.b64encode(b"\xff\xd8jpeg").decode()
+
+    _emit(fake.handlers["frame"], {"data": frame, "sessionId": 1})
+    _drain()
+    _emit(fake.handlers["frame"], {"data": frame, "sessionId": 2})
+    # The second ack waits out the frame interval.
+    assert len(cast._acks) == 1
+
+    viewer.close()
+    _drain()
+    assert not cast._acks
+    assert ("screencastFrameAck", {"sessionId": 2}, "S1") not in fake.calls
+
+
+def test_mjpeg_part_framing() -> None:
+    part = mjpeg_part(b"abc")
+    assert part == b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: 3\r\n\r\nabc\r\n"
@@ -0,0 +1,98 @@
+import base64
+import io
+
+import pytest
+from PIL import Image
+
+from agent.utils.screenshot_pipeline import (
+    ScreenshotVariant,
+    encode_data_uri,
+    render_variants,
+)
+
+
+def _png(width: int = 1600, height: int = 1000) -> bytes:
+    image = Image.new("RGB", (width, height), "white")
+    pixels = image.load()
+    for x in range(0, width, 4):
+        for y in range(0, height, 4):
+            pixels[x, y] = (x % 256, y % 256, (x * y) % 256)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_variants_are_downscaled_and_reencoded() -> None:
+    original = _png()
+    variants = (
+        ScreenshotVariant("preview", "webp", 60, 800, 800),
+        ScreenshotVariant("model", "jpeg", 75, 1280, 1280),
+    )
+
+    rendered = render_variants(base64.b64encode(original).decode("ascii"), variants)
+
+    preview, preview_type = rendered["preview"]
+    model, model_type = rendered["model"]
+    assert preview_type == "image/webp"
+    assert model_type == "image/jpeg"
+    assert Image.open(io.BytesIO(preview)).size == (800, 500)
+    assert Image.open(io.BytesIO(model)).size == (1280, 800)
+    assert len(preview) < len(original)
+
+
+def test_original_format_and_undecodable_images_pass_through() -> None:
+    original = _png(200, 100)
+    keep = ScreenshotVariant("archive", "original", 80, 0, 0)
+    assert render_variants(original, (keep,))["archive"] == (original, "image/png")
+
+    broken = b"\x89PNG\r\n\x1a\nnot-really"
+    webp = ScreenshotVariant("archive", "webp", 80, 0, 0)
+    assert render_variants(broken, (webp,))["archive"] == (broken, "image/png")
+    assert render_variants("", (webp,)) == {}
+
+
+def test_encode_data_uri_leaves_small_images_alone() -> None:
+    original = _png(40, 20)
+    uri = "data:image/png;base64," + base64.b64encode(original).decode("ascii")
+
+    same, mimetype = encode_data_uri(uri, ScreenshotVariant("model", "png", 75, 1280, 1280))
+    assert same is uri
+    assert mimetype == "image/png"
+
+    jpeg, mimetype = encode_data_uri(uri, ScreenshotVariant("model", "jpeg", 75, 20, 20))
+    assert jpeg.startswith("data:image/jpeg;base64,")
+    assert mimetype == "image/jpeg"
+
+
+@pytest.mark.parametrize("value", ["jpg", "JPEG"])
+def test_variant_from_env(monkeypatch: pytest.MonkeyPatch, value: str) -> None:
+    monkeypatch.setenv("SCREENSHOT_TEST_FORMAT", value)
+    monkeypatch.setenv("SCREENSHOT_TEST_QUALITY", "500")
+
+    variant = ScreenshotVariant.from_env(
+        "test", format="webp", quality=60, max_width=10, max_height=10
+    )
+
+    assert variant.format == "jpeg"
+    assert variant.quality == 100
+
+
+def test_difference_hash_ignores_reencoding_but_not_content_changes() -> None:
+    from PIL import ImageDraw
+
+    from agent.utils.screenshot_pipeline import difference_hash, hash_distance, open_screenshot
+
+    buffer = io.BytesIO()
+    Image.effect_noise((640, 400), 64).convert("RGB").save(buffer, format="PNG")
+    original = buffer.getvalue()
+    reencoded = render_variants(original, (ScreenshotVariant("x", "jpeg", 90, 0, 0),))["x"][0]
+    changed_image = Image.open(io.BytesIO(original)).convert("RGB")
+    ImageDraw.Draw(changed_image).rectangle((0, 0, 320, 200), fill="black")
+    buffer = io.BytesIO()
+    changed_image.save(buffer, format="PNG")
+
+    base = difference_hash(open_screenshot(original))
+    assert base is not None
+    assert hash_distance(base, difference_hash(open_screenshot(reencoded))) <= 4
+    assert hash_distance(base, difference_hash(open_screenshot(buffer.getvalue()))) > 16
+    assert difference_hash(open_screenshot(b"\x89PNG\r\n\x1a\nbroken")) is None
@@ -0,0 +1,46 @@
+import base64
+import hashlib
+
+import pytest
+
+from agent.utils import screenshots
+
+
+@pytest.fixture(autouse=True)
+def _screenshot_dir(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(screenshots, "SCREENSHOT_DIR", str(tmp_path / "screenshots"))
+    return tmp_path / "screenshots"
+
+
+_PNG_BYTES = b"\x89PNG\r\n\x1a\nfake-image-data"
+
+
+def test_store_screenshot_is_content_addressed(_screenshot_dir) -> None:
+    encoded = base64.b64encode(_PNG_BYTES).decode("ascii")
+
+    first = screenshots.store_screenshot(encoded)
+    second = screenshots.store_screenshot(f"data:image/png;base64,{encoded}")
+
+    assert first == second == hashlib.sha256(_PNG_BYTES).hexdigest()
+    stored = list(_screenshot_dir.rglob("*"))
+    assert [path.name for path in stored if path.is_file()] == [first]
+    path = screenshots.screenshot_path(first)
+    assert path is not None
+    with open(path, "rb") as fh:
+        assert fh.read() == _PNG_BYTES
+
+
+def test_store_screenshot_ignores_empty_values() -> None:
+    assert screenshots.store_screenshot(None) is None
+    assert screenshots.store_screenshot("") is None
+
+
+def test_screenshot_path_rejects_invalid_digest() -> None:
+    assert screenshots.screenshot_path("../../etc/passwd") is None
+    assert screenshots.screenshot_path("0" * 64) is None
+
+
+def test_sniff_image_mimetype() -> None:
+    assert screenshots.sniff_image_mimetype(_PNG_BYTES[:16]) == "image/png"
+    assert screenshots.sniff_image_mimetype(b"\xff\xd8\xff\xe0") == "image/jpeg"
+    assert screenshots.sniff_image_mimetype(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == "image/webp"
@@ -0,0 +1,56 @@
+import os
+import time
+
+from agent.utils import session_store
+
+
+def test_spill_and_load_session_record(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(session_store, "SESSION_SPILL_DIR", str(tmp_path))
+    session_id = "a" * 32
+    record = {"session_id": session_id, "status": "completed", "steps": [{"index": 1}]}
+
+    assert session_store.spill_session_record(session_id, record) is True
+    assert (tmp_path / f"{session_id}.json.gz").exists()
+    assert session_store.load_session_record(session_id) == record
+
+
+def test_load_session_record_rejects_unsafe_ids(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(session_store, "SESSION_SPILL_DIR", str(tmp_path))
+
+    assert session_store.spill_session_record("../escape", {"status": "x"}) is False
+    assert session_store.load_session_record("../escape") is None
+    assert session_store.load_session_record("b" * 32) is None
+
+
+def test_spilling_prunes_records_past_the_retention_limits(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(session_store, "SESSION_SPILL_DIR", str(tmp_path))
+    monkeypatch.setattr(session_store, "_SPILLED_SESSION_TTL", 3600.0)
+    monkeypatch.setattr(session_store, "_MAX_SPILLED_SESSIONS", 2)
+    now = time.time()
+    ages = {"a": 7200, "b": 30, "c": 20, "d": 10}
+    for name, age in ages.items():
+        session_store.spill_session_record(name * 32, {"status": "completed"})
+        os.utime(tmp_path / f"{name * 32}.json.gz", (now - age, now - age))
+    (tmp_path / "notes.txt").write_text("kept")
+
+    assert session_store.spill_session_record("e" * 32, {"status": "completed"}) is True
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        f"{'d' * 32}.json.gz",
+        f"{'e' * 32}.json.gz",
+        "notes.txt",
+    ]
+
+
+def test_pruning_by_age_alone(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(session_store, "SESSION_SPILL_DIR", str(tmp_path))
+    monkeypatch.setattr(session_store, "_SPILLED_SESSION_TTL", 60.0)
+    monkeypatch.setattr(session_store, "_MAX_SPILLED_SESSIONS", 0)
+    session_store.spill_session_record("a" * 32, {"status": "completed"})
+    session_store.spill_session_record("b" * 32, {"status": "completed"})
+    old = time.time() - 120
+    os.utime(tmp_path / f"{'a' * 32}.json.gz", (old, old))
+
+    assert session_store.prune_session_records() == 1
+    assert session_store.load_session_record("a" * 32) is None
+    assert session_store.load_session_record("b" * 32) is not None
@@ -0,0 +1,26 @@
+from agent.utils.sse import encode_sse_stream, format_sse_event, parse_sse_lines
+
+
+def test_format_sse_event() -> None:
+    frame = format_sse_event("status", {"status": "running"}, event_id=3)
+
+    assert frame == 'id: 3\nevent: status\ndata: {"status": "running"}\n\n'
+
+
+def test_encode_sse_stream_tags_steps_with_cursor() -> None:
+    frames = list(
+        encode_sse_stream(
+            [("step", {"position": 4, "step": {}}), ("warning", {"warning": "w"})]
+        )
+    )
+
+    assert frames[0].startswith("id: 5\nevent: step\n")
+    assert frames[1].startswith("event: warning\n")
+
+
+def test_parse_sse_lines_round_trip() -> None:
+    frames = format_sse_event("step", {"text": "日本語"}) + ": ping\n\n"
+
+    events = list(parse_sse_lines(frames.split("\n")))
+
+    assert events == [("step", {"text": "日本語"})]
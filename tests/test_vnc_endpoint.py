@@ -0,0 +1,75 @@
+import pytest
+
+from agent.browser import vnc
+
+
+@pytest.fixture(autouse=True)
+def _reset_endpoint_state(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("VNC_API", raising=False)
+    monkeypatch.setattr(vnc, "_VNC_ENDPOINT", None)
+    monkeypatch.setattr(vnc, "_ENDPOINT_HEALTH", {})
+
+
+def test_probe_results_are_cached(monkeypatch: pytest.MonkeyPatch) -> None:
+    probes: list[str] = []
+
+    class _Response:
+        status_code = 200
+
+    def fake_get(url: str, timeout: float) -> _Response:
+        probes.append(url)
+        return _Response()
+
+    monkeypatch.setattr(vnc.requests, "get", fake_get)
+
+    assert vnc._probe_endpoint("http://vnc:7000") is True
+    assert vnc._probe_endpoint("http://vnc:7000") is True
+    assert probes == ["http://vnc:7000/healthz"]
+
+
+def test_unhealthy_endpoint_is_skipped(monkeypatch: pytest.MonkeyPatch) -> None:
+    probes: list[str] = []
+
+    class _Response:
+        status_code = 200
+
+    def fake_get(url: str, timeout: float) -> _Response:
+        probes.append(url)
+        return _Response()
+
+    monkeypatch.setattr(vnc.requests, "get", fake_get)
+
+    assert vnc.get_vnc_api_base() == "http://vnc:7000"
+    vnc.mark_vnc_endpoint_unhealthy("http://vnc:7000/")
+
+    assert vnc.get_vnc_api_base() == "http://localhost:7000"
+    assert probes == ["http://vnc:7000/healthz", "http://localhost:7000/healthz"]
+    assert vnc.get_endpoint_health()["http://vnc:7000"]["healthy"] is False
+
+
+def test_get_html_revalidates_with_etag(monkeypatch: pytest.MonkeyPatch) -> None:
+    sent: list[dict] = []
+
+    class _Response:
+        def __init__(self, status_code: int, text: str = "") -> None:
+            self.status_code = status_code
+            self.text = text
+            self.headers = {"ETag": '"abc"'}
+
+        def raise_for_status(self) -> None:
+            return None
+
+    responses = [_Response(200, "<html></html>"), _Response(304)]
+
+    def fake_get(url: str, headers: dict, timeout) -> _Response:
+        sent.append(headers)
+        return responses.pop(0)
+
+    monkeypatch.setenv("VNC_API", "http://vnc:7000")
+    monkeypatch.setattr(vnc, "_HTML_CACHE", {})
+    monkeypatch.setattr(vnc, "_probe_endpoint", lambda endpoint, timeout=1.0: True)
+    monkeypatch.setattr(vnc.requests, "get", fake_get)
+
+    assert vnc.get_html() == "<html></html>"
+    assert vnc.get_html() == "<html></html>"
+    assert sent == [{}, {"If-None-Match": '"abc"'}]
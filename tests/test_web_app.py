@@ -136,3 +136,116 @@ def test_add_instruction_endpoint_requires_text() -> None:
 
     response = client.post("/session/demo/instruction", json={})
     assert response.status_code == 400
+
+
+def test_screenshot_endpoint_serves_stored_blob(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    from agent.utils import screenshots
+
+    monkeypatch.setattr(screenshots, "SCREENSHOT_DIR", str(tmp_path))
+    digest = screenshots.store_screenshot(b"\x89PNG\r\n\x1a\nimage")
+    client = flask_app.test_client()
+
+    response = client.get(f"/screenshots/{digest}")
+
+    assert response.status_code == 200
+    assert response.mimetype == "image/png"
+    assert response.data == b"\x89PNG\r\n\x1a\nimage"
+    response.close()
+
+
+def test_screenshot_endpoint_falls_back_to_remote(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    from agent.utils import screenshots
+
+    monkeypatch.setattr(screenshots, "SCREENSHOT_DIR", str(tmp_path))
+    digest = "a" * 64
+
+    class DummyManager:
+        def get_screenshot(self, value: str):
+            assert value == digest
+            return b"jpeg-bytes", "image/jpeg"
+
+    monkeypatch.setattr("web.app.get_browser_use_manager", lambda: DummyManager())
+    client = flask_app.test_client()
+
+    response = client.get(f"/screenshots/{digest}")
+
+    assert response.status_code == 200
+    assert response.mimetype == "image/jpeg"
+    assert response.data == b"jpeg-bytes"
+
+
+def test_status_endpoint_forwards_since(monkeypatch: pytest.MonkeyPatch) -> None:
+    captured: dict[str, object] = {}
+
+    class DummyManager:
+        def get_status(self, session_id: str, since: int | None = None):
+            captured["session_id"] = session_id
+            captured["since"] = since
+            return {"status": "running", "steps": [], "steps_since": since or 0}
+
+    monkeypatch.setattr("web.app.get_browser_use_manager", lambda: DummyManager())
+    client = flask_app.test_client()
+
+    response = client.get("/status/demo?since=3")
+
+    assert response.status_code == 200
+    assert captured == {"session_id": "demo", "since": 3}
+
+
+def test_status_stream_endpoint_emits_events(monkeypatch: pytest.MonkeyPatch) -> None:
+    class DummyManager:
+        def stream_events(self, session_id: str, since: int | None = None):
+            if session_id != "demo":
+                return None
+            return iter(
+                [
+                    ("snapshot", {"status": "running", "steps": []}),
+                    ("status", {"status": "completed"}),
+                ]
+            )
+
+    monkeypatch.setattr("web.app.get_browser_use_manager", lambda: DummyManager())
+    client = flask_app.test_client()
+
+    response = client.get("/status/demo/stream")
+    body = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    assert "event: snapshot" in body
+    assert 'data: {"status": "completed"}' in body
+    assert client.get("/status/missing/stream").status_code == 404
+
+
+def test_execute_returns_retry_after_when_queue_full(monkeypatch: pytest.MonkeyPatch) -> None:
+    from agent.utils.scheduler import QueueFullError
+
+    class DummyManager:
+        def start_session(self, command: str, **kwargs: object) -> str:
+            raise QueueFullError("queue full", retry_after=30)
+
+    monkeypatch.setattr("web.app.get_browser_use_manager", lambda: DummyManager())
+    monkeypatch.setattr("web.app.tail_hist", lambda limit: [])
+    client = flask_app.test_client()
+
+    response = client.post("/execute", json={"command": "検索"})
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "30"
+    assert response.get_json()["code"] == "queue_full"
+
+    invalid = client.post("/execute", json={"command": "検索", "priority": "high"})
+    assert invalid.status_code == 400
+
+
+def test_metrics_endpoint_returns_manager_metrics(monkeypatch: pytest.MonkeyPatch) -> None:
+    class DummyManager:
+        def metrics(self) -> dict[str, object]:
+            return {"step_timings": {"llm": {"count": 1, "total": 1.0, "p50": 1.0, "p95": 1.0}}}
+
+    monkeypatch.setattr("web.app.get_browser_use_manager", lambda: DummyManager())
+
+    response = flask_app.test_client().get("/metrics")
+
+    assert response.status_code == 200
+    assert response.get_json()["step_timings"]["llm"]["p95"] == 1.0
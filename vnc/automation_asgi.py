@@ -0,0 +1,328 @@
+"""ASGI variant of the automation server.
+
+Serves the same routes and JSON contracts as :mod:`vnc.automation_server`, but
+Playwright runs natively on the server's event loop instead of being driven
+through ``LOOP.run_until_complete`` behind a lock, so a slow ``PAGE.content()``
+no longer holds up health checks or other page requests.  Blocking
+browser-use manager calls run in the worker thread pool; progress and
+screencast streams wait for their next event on the loop, so open viewers
+do not tie up pool threads.
+
+Run with ``uvicorn vnc.automation_asgi:app --port 7000`` or set
+``AUTOMATION_SERVER_ASGI=1`` for ``python vnc/automation_server.py``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, Dict
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from agent.utils.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY
+from agent.utils.screenshots import (
+    SCREENSHOT_MAX_AGE,
+    screenshot_path,
+    sniff_image_mimetype,
+)
+from agent.utils.sse import encode_sse_stream_async
+from vnc import automation_server as server
+from vnc.screencast import (
+    MJPEG_CONTENT_TYPE,
+    ScreencastSettings,
+    ScreencastSubscriber,
+    mjpeg_part,
+    open_screencast,
+)
+
+log = server.log
+
+# Concurrent requests must not race each other into connect_over_cdp.
+_INIT_LOCK = asyncio.Lock()
+
+
+async def _ensure_browser() -> None:
+    async with _INIT_LOCK:
+        await server._init_browser()
+
+
+async def _json_body(request: Request) -> Dict[str, Any]:
+    # Mirrors Flask's ``get_json(force=True) or {}``.
+    try:
+        data = await request.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _int_param(value: str | None) -> int | None:
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class _RequestTimer:
+    """Record request latency in the shared Prometheus histogram."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+
+        async def send_wrapper(message) -> None:
+            if message["type"] == "http.response.start":
+                route = scope.get("route")
+                server._REQUEST_SECONDS.observe(
+                    time.perf_counter() - started,
+                    route=getattr(route, "path", "unmatched"),
+                    method=scope["method"],
+                    status=str(message["status"]),
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+# ---------------------------------------------------------------------------
+# Browser-use API
+
+
+async def start_browser_use_session(request: Request) -> Response:
+    data = await _json_body(request)
+    payload, status, headers = await run_in_threadpool(server._start_session, data)
+    return JSONResponse(payload, status_code=status, headers=headers)
+
+
+async def browser_use_metrics(request: Request) -> Response:
+    manager = server._get_browser_use_manager()
+    return JSONResponse(await run_in_threadpool(manager.metrics))
+
+
+async def prometheus_metrics(request: Request) -> Response:
+    return Response(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+async def get_browser_use_session(request: Request) -> Response:
+    since = _int_param(request.query_params.get("since"))
+    manager = server._get_browser_use_manager()
+    info = await run_in_threadpool(manager.get_status, request.path_params["session_id"], since=since)
+    if info is None:
+        return JSONResponse({"error": "session not found"}, status_code=404)
+    return JSONResponse(info)
+
+
+async def stream_browser_use_session(request: Request) -> Response:
+    since = _int_param(request.query_params.get("since"))
+    if since is None:
+        # EventSource reconnects resume from the last delivered step.
+        since = _int_param(request.headers.get("Last-Event-ID"))
+    manager = server._get_browser_use_manager()
+    # Spilled sessions are read back from disk under the manager's lock.
+    events = await run_in_threadpool(
+        manager.stream_events_async, request.path_params["session_id"], since=since
+    )
+    if events is None:
+        return JSONResponse({"error": "session not found"}, status_code=404)
+    # Events are awaited on this loop, so an idle stream holds no worker thread.
+    return StreamingResponse(
+        encode_sse_stream_async(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def add_browser_use_instruction(request: Request) -> Response:
+    data = await _json_body(request)
+    payload, status = await run_in_threadpool(
+        server._add_instruction, request.path_params["session_id"], data
+    )
+    return JSONResponse(payload, status_code=status)
+
+
+async def cancel_browser_use_session(request: Request) -> Response:
+    manager = server._get_browser_use_manager()
+    if not await run_in_threadpool(manager.cancel_session, request.path_params["session_id"]):
+        return JSONResponse({"error": "session not found"}, status_code=404)
+    return JSONResponse({"status": "cancelled"})
+
+
+async def stored_screenshot(request: Request) -> Response:
+    path = screenshot_path(request.path_params["digest"])
+    if path is None:
+        return JSONResponse({"error": "screenshot not found"}, status_code=404)
+    with open(path, "rb") as fh:
+        mimetype = sniff_image_mimetype(fh.read(16))
+    return FileResponse(
+        path,
+        media_type=mimetype,
+        headers={"Cache-Control": f"public, max-age={SCREENSHOT_MAX_AGE}"},
+    )
+
+
+# ---------------------------------------------------------------------------
+# Shared browser and page introspection
+
+
+async def ensure_shared_browser(request: Request) -> Response:
+    async with _INIT_LOCK:
+        payload, status = await server._ensure_shared_browser()
+    return JSONResponse(payload, status_code=status)
+
+
+async def _page_state_response(request: Request, kind: str, media_type: str = "text/plain") -> Response:
+    value, etag = await server._page_state(kind)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if server._etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(value, media_type=media_type, headers=headers)
+
+
+async def source(request: Request) -> Response:
+    try:
+        await _ensure_browser()
+        return await _page_state_response(request, "html")
+    except Exception as exc:
+        log.error("source error: %s", exc)
+        return PlainTextResponse(str(exc), status_code=500)
+
+
+async def dom_snapshot(request: Request) -> Response:
+    try:
+        await _ensure_browser()
+        return await _page_state_response(request, "dom", media_type="application/json")
+    except Exception as exc:
+        log.error("dom error: %s", exc)
+        return PlainTextResponse(str(exc), status_code=500)
+
+
+async def current_url(request: Request) -> Response:
+    try:
+        await _ensure_browser()
+        url = await server._get_page_url_value()
+        return JSONResponse({"url": url})
+    except Exception as exc:
+        log.error("url error: %s", exc)
+        return JSONResponse({"url": "", "error": str(exc)})
+
+
+async def screenshot(request: Request) -> Response:
+    try:
+        await _ensure_browser()
+        return await _page_state_response(request, "screenshot")
+    except Exception as exc:
+        log.error("screenshot error: %s", exc)
+        return PlainTextResponse(str(exc), status_code=500)
+
+
+async def _mjpeg_stream(subscriber: ScreencastSubscriber):
+    try:
+        while True:
+            frame = await subscriber.get_async()
+            if frame is None:
+                return
+            if frame:
+                yield mjpeg_part(frame)
+    finally:
+        subscriber.close()
+
+
+async def screencast_stream(request: Request) -> Response:
+    try:
+        settings = ScreencastSettings.from_params(request.query_params)
+    except ValueError as exc:
+        return JSONResponse({"error": str(exc)}, status_code=400)
+    try:
+        async with _INIT_LOCK:
+            websocket_url = await server._screencast_websocket()
+        subscriber = await run_in_threadpool(
+            open_screencast,
+            websocket_url,
+            settings,
+            target_id=request.query_params.get("target_id") or None,
+            loop=asyncio.get_running_loop(),
+        )
+    except Exception as exc:
+        log.error("screencast error: %s", exc)
+        return JSONResponse({"error": str(exc)}, status_code=503)
+    return StreamingResponse(
+        _mjpeg_stream(subscriber),
+        media_type=MJPEG_CONTENT_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def health(request: Request) -> Response:
+    return PlainTextResponse("ok")
+
+
+async def handle_exception(request: Request, error: Exception) -> Response:  # pragma: no cover
+    correlation_id = str(uuid.uuid4())[:8]
+    log.exception("[%s] Uncaught exception: %s", correlation_id, error)
+    return JSONResponse(
+        {
+            "html": "",
+            "warnings": [f"ERROR:auto:[{correlation_id}] Internal failure - {error}"],
+            "correlation_id": correlation_id,
+        }
+    )
+
+
+@asynccontextmanager
+async def _lifespan(app: Starlette):
+    yield
+    # Playwright objects belong to this loop, so close them here rather than
+    # in the Flask module's atexit hook.  The browser-use manager runs its own
+    # loop and is still shut down by that module's atexit hook.
+    try:
+        await server._close_browser()
+    except Exception as exc:  # pragma: no cover - shutdown path
+        log.debug("Error during Playwright shutdown: %s", exc)
+
+
+routes = [
+    Route("/browser-use/session", start_browser_use_session, methods=["POST"]),
+    Route("/browser-use/metrics", browser_use_metrics, methods=["GET"]),
+    Route("/metrics", prometheus_metrics, methods=["GET"]),
+    Route("/browser-use/session/{session_id}", get_browser_use_session, methods=["GET"]),
+    Route("/browser-use/session/{session_id}/stream", stream_browser_use_session, methods=["GET"]),
+    Route(
+        "/browser-use/session/{session_id}/instruction",
+        add_browser_use_instruction,
+        methods=["POST"],
+    ),
+    Route("/browser-use/session/{session_id}/cancel", cancel_browser_use_session, methods=["POST"]),
+    Route("/screenshots/{digest}", stored_screenshot, methods=["GET"]),
+    Route("/browser-use/screenshots/{digest}", stored_screenshot, methods=["GET"]),
+    Route("/shared-browser/ensure", ensure_shared_browser, methods=["POST"]),
+    Route("/source", source, methods=["GET"]),
+    Route("/dom", dom_snapshot, methods=["GET"]),
+    Route("/url", current_url, methods=["GET"]),
+    Route("/screenshot", screenshot, methods=["GET"]),
+    Route("/screencast", screencast_stream, methods=["GET"]),
+    Route("/healthz", health, methods=["GET"]),
+]
+
+app = Starlette(
+    routes=routes,
+    exception_handlers={Exception: handle_exception},
+    lifespan=_lifespan,
+)
+app.add_middleware(_RequestTimer)
+
+
+if __name__ == "__main__":  # pragma: no cover - manual run helper
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=7000)
@@ -3,22 +3,41 @@ from __future__ import annotations
 import asyncio
 import atexit
 import base64
+import hashlib
 import inspect
+import json
 import logging
 import os
+import threading
 import time
 import uuid
 from typing import Any, Dict, Iterable, List, Optional
 from urllib.parse import urlsplit, urlunsplit
 
 import httpx
-from flask import Flask, Response, jsonify, request
+from flask import Flask, Response, g, jsonify, request, send_file, stream_with_context
 from playwright.async_api import Error as PwError, async_playwright
 
+from agent.browser.dom import IncrementalDOMSnapshot
 from agent.browser_use_runner import BrowserUseManager
-from agent.utils.history import format_history_for_prompt, load_hist
-from agent.utils.shared_browser import format_shared_browser_error, normalise_cdp_websocket
+from agent.utils import history as history_utils
+from agent.utils.history import PROMPT_HISTORY_LIMIT, format_history_for_prompt, tail_hist
+from agent.utils.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY
+from agent.utils.scheduler import QueueFullError
+from agent.utils.screenshots import (
+    SCREENSHOT_BYTES,
+    SCREENSHOT_MAX_AGE,
+    screenshot_path,
+    sniff_image_mimetype,
+)
+from agent.utils.shared_browser import (
+    env_flag,
+    format_shared_browser_error,
+    normalise_cdp_websocket,
+)
+from agent.utils.sse import encode_sse_stream
 from vnc.dependency_check import ensure_component_dependencies
+from vnc.screencast import MJPEG_CONTENT_TYPE, ScreencastSettings, mjpeg_stream, open_screencast
 
 app = Flask(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -40,6 +59,38 @@ _CDP_DEFAULT_ENDPOINTS = (
     "http://vnc:9222",
 )
 _LOOPBACK_HOSTS = {"127.0.0.1", "localhost", "::1", "0.0.0.0"}
+# Seconds a cached page state (HTML, DOM JSON, screenshot) may be served
+# while the page reports no change; 0 disables the cache.  Bounds staleness
+# from changes the epoch cannot see, such as canvas or video frames.
+_PAGE_CACHE_TTL = max(0.0, float(os.getenv("PAGE_CACHE_TTL", "30")))
+# Screenshots also change with video, canvas and running animations, none of
+# which move the epoch, so they are only reused for a short while.
+_SCREENSHOT_CACHE_TTL = max(0.0, float(os.getenv("PAGE_SCREENSHOT_CACHE_TTL", "2")))
+
+_REQUEST_SECONDS = REGISTRY.histogram(
+    "automation_http_request_duration_seconds",
+    "Automation server request latency by route, method and status.",
+    ("route", "method", "status"),
+)
+_CDP_PROBE_SECONDS = REGISTRY.histogram(
+    "cdp_probe_duration_seconds",
+    "Latency of CDP /json/version probes by caller and outcome.",
+    ("source", "result"),
+)
+_PLAYWRIGHT_CONNECTS = REGISTRY.counter(
+    "automation_playwright_connects_total",
+    "Playwright connection attempts to the shared browser by outcome.",
+    ("result",),
+)
+_PLAYWRIGHT_RECONNECTS = REGISTRY.counter(
+    "automation_playwright_reconnects_total",
+    "Successful Playwright connections after the initial one.",
+)
+_PAGE_CACHE_REQUESTS = REGISTRY.counter(
+    "automation_page_cache_requests_total",
+    "Page state requests by kind and cache outcome (hit, miss or bypass).",
+    ("kind", "result"),
+)
 
 
 def _get_browser_use_manager() -> BrowserUseManager:
@@ -49,6 +100,61 @@ def _get_browser_use_manager() -> BrowserUseManager:
     return _browser_use_manager
 
 
+def _session_samples():
+    manager = _browser_use_manager
+    if manager is None:
+        return [({"state": state}, 0) for state in ("active", "queued", "in_memory", "spilled")]
+    scheduler = manager.scheduler_stats()
+    memory = manager.memory_stats()
+    return [
+        ({"state": "active"}, scheduler["active"]),
+        ({"state": "queued"}, scheduler["queued"]),
+        ({"state": "in_memory"}, memory["in_memory"]),
+        ({"state": "spilled"}, memory["spilled"]),
+    ]
+
+
+def _history_file_samples():
+    try:
+        size = os.path.getsize(history_utils.HIST_LOG_FILE)
+    except OSError:
+        size = 0
+    return [({}, size)]
+
+
+REGISTRY.collector(
+    "automation_browser_use_sessions",
+    "gauge",
+    "Browser-use sessions by state.",
+    _session_samples,
+)
+REGISTRY.collector(
+    "automation_history_file_bytes",
+    "gauge",
+    "Size of the conversation history log.",
+    _history_file_samples,
+)
+
+
+@app.before_request
+def _start_request_timer() -> None:
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def _record_request_latency(response: Response) -> Response:
+    started = g.pop("request_started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        _REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            route=route,
+            method=request.method,
+            status=str(response.status_code),
+        )
+    return response
+
+
 @atexit.register
 def _shutdown_browser_use_manager() -> None:  # pragma: no cover - shutdown path
     manager = _browser_use_manager
@@ -167,15 +273,22 @@ async def _wait_cdp(endpoint: str, *, timeout: float = 6.0, poll_interval: float
         return False
     poll_interval = max(poll_interval, 0.25)
     deadline = time.time() + max(timeout, 1.0)
+    started = time.perf_counter()
     async with httpx.AsyncClient(timeout=2.0) as client:
         while time.time() < deadline:
             try:
                 response = await client.get(version_url)
                 if response.status_code == 200:
+                    _CDP_PROBE_SECONDS.observe(
+                        time.perf_counter() - started, source="playwright", result="success"
+                    )
                     return True
             except httpx.HTTPError as exc:
                 log.debug("CDP endpoint %s not ready: %s", version_url, exc)
             await asyncio.sleep(poll_interval)
+    _CDP_PROBE_SECONDS.observe(
+        time.perf_counter() - started, source="playwright", result="failure"
+    )
     log.warning("Timed out waiting for CDP endpoint %s", version_url)
     return False
 
@@ -220,16 +333,24 @@ CDP_URL: str | None = os.getenv("CDP_URL")
 _BROWSER_FIRST_INIT = True
 
 
+# The server is threaded so long-lived event streams do not block other
+# requests; Playwright calls are still serialised on the single loop.
+_LOOP_LOCK = threading.Lock()
+
+
 def _run(coro):
-    return LOOP.run_until_complete(coro)
+    with _LOOP_LOCK:
+        return LOOP.run_until_complete(coro)
 
 
 async def _close_browser() -> None:
-    global PW, BROWSER, PAGE
+    global PW, BROWSER, PAGE, _PAGE_TARGET
     page = PAGE
     browser = BROWSER
     PAGE = None
     BROWSER = None
+    _PAGE_TARGET = None
+    _PAGE_CACHE.clear()
     try:
         if page is not None:
             await page.close()
@@ -326,9 +447,13 @@ async def _init_browser() -> None:
         )
         message = format_shared_browser_error(reason, candidates=candidates)
         log.error("Automation server could not connect to a shared browser: %s", message)
+        _PLAYWRIGHT_CONNECTS.inc(result="failure")
         await _close_browser()
         raise RuntimeError(message)
 
+    _PLAYWRIGHT_CONNECTS.inc(result="success")
+    if not _BROWSER_FIRST_INIT:
+        _PLAYWRIGHT_RECONNECTS.inc()
     CDP_URL = connected_endpoint or CDP_URL
     if connected_endpoint:
         log.info("Connected to shared browser via %s", connected_endpoint)
@@ -384,14 +509,14 @@ async def _get_page_url_value() -> str:
 # Browser-use API
 
 
-@app.post("/browser-use/session")
-def start_browser_use_session():
+def _start_session(data: Dict[str, Any]) -> tuple[Dict[str, Any], int, Dict[str, str]]:
+    """Validate a session request and start it; returns (payload, status, headers)."""
+
     correlation_id = str(uuid.uuid4())[:8]
-    data = request.get_json(force=True) or {}
 
     command = str(data.get("command", "")).strip()
     if not command:
-        return jsonify({"error": "command empty"}), 400
+        return {"error": "command empty"}, 400, {}
 
     model_value = data.get("model")
     model = str(model_value).strip() if model_value is not None else _DEFAULT_MODEL
@@ -404,9 +529,17 @@ def start_browser_use_session():
         try:
             max_steps = int(requested_steps)
         except (TypeError, ValueError):
-            return jsonify({"error": "max_steps must be an integer"}), 400
+            return {"error": "max_steps must be an integer"}, 400, {}
         if max_steps <= 0:
-            return jsonify({"error": "max_steps must be positive"}), 400
+            return {"error": "max_steps must be positive"}, 400, {}
+
+    async_start = data.get("async_start")
+    if async_start is not None and not isinstance(async_start, bool):
+        return {"error": "async_start must be a boolean"}, 400, {}
+
+    priority = data.get("priority", 0)
+    if isinstance(priority, bool) or not isinstance(priority, int):
+        return {"error": "priority must be an integer"}, 400, {}
 
     context_value = data.get("conversation_context")
     if isinstance(context_value, str):
@@ -416,7 +549,7 @@ def start_browser_use_session():
 
     if not conversation_context:
         try:
-            conversation_context = format_history_for_prompt(load_hist())
+            conversation_context = format_history_for_prompt(tail_hist(PROMPT_HISTORY_LIMIT))
         except Exception as exc:  # pragma: no cover - best effort only
             log.debug("[%s] Failed to prepare conversation history: %s", correlation_id, exc)
             conversation_context = ""
@@ -428,9 +561,18 @@ def start_browser_use_session():
             model=model,
             max_steps=max_steps,
             conversation_context=conversation_context or None,
+            async_start=async_start,
+            priority=priority,
         )
     except ValueError as exc:
-        return jsonify({"error": str(exc)}), 400
+        return {"error": str(exc)}, 400, {}
+    except QueueFullError as exc:
+        log.warning("[%s] Rejected browser-use session: %s", correlation_id, exc)
+        return (
+            {"error": str(exc), "code": "queue_full"},
+            429,
+            {"Retry-After": str(exc.retry_after)},
+        )
     except RuntimeError as exc:
         message = str(exc)
         payload = {"error": message}
@@ -441,55 +583,92 @@ def start_browser_use_session():
             log.error("[%s] Failed to start browser-use session: %s", correlation_id, message)
         else:
             log.exception("[%s] Browser-use session start failed", correlation_id)
-        return jsonify(payload), status
+        return payload, status, {}
     except Exception as exc:  # pragma: no cover - defensive fallback
         log.exception("[%s] Browser-use session start failed unexpectedly", correlation_id)
-        return jsonify({"error": "failed to start automation"}), 500
+        return {"error": "failed to start automation"}, 500, {}
 
-    return jsonify({"session_id": session_id})
+    return {"session_id": session_id}, 200, {}
 
 
-@app.get("/browser-use/session/<session_id>")
-def get_browser_use_session(session_id: str):
-    info = _get_browser_use_manager().get_status(session_id)
-    if info is None:
-        return jsonify({"error": "session not found"}), 404
-    return jsonify(info)
-
-
-@app.post("/browser-use/session/<session_id>/instruction")
-def add_browser_use_instruction(session_id: str):
-    data = request.get_json(force=True) or {}
+def _add_instruction(session_id: str, data: Dict[str, Any]) -> tuple[Dict[str, Any], int]:
     raw_instruction = data.get("instruction")
     if raw_instruction is None:
         raw_instruction = data.get("command")
 
     instruction = str(raw_instruction or "").strip()
     if not instruction:
-        return jsonify({"error": "instruction empty"}), 400
+        return {"error": "instruction empty"}, 400
 
     manager = _get_browser_use_manager()
     status = manager.add_instruction(session_id, instruction)
 
     if status == "accepted":
-        return jsonify({"status": "accepted"})
+        return {"status": "accepted"}, 200
     if status == "not_found":
-        return jsonify({"error": "session not found"}), 404
+        return {"error": "session not found"}, 404
     if status == "not_running":
         return (
-            jsonify(
-                {
-                    "error": "セッションは既に完了または停止しています。",
-                    "status": "not_running",
-                }
-            ),
+            {
+                "error": "セッションは既に完了または停止しています。",
+                "status": "not_running",
+            },
             409,
         )
     if status == "invalid":
-        return jsonify({"error": "instruction empty"}), 400
+        return {"error": "instruction empty"}, 400
 
     log.warning("[%s] Unexpected add_instruction status: %s", session_id, status)
-    return jsonify({"error": "failed to queue instruction"}), 500
+    return {"error": "failed to queue instruction"}, 500
+
+
+@app.post("/browser-use/session")
+def start_browser_use_session():
+    payload, status, headers = _start_session(request.get_json(force=True) or {})
+    response = jsonify(payload)
+    response.headers.update(headers)
+    return response, status
+
+
+@app.get("/browser-use/metrics")
+def browser_use_metrics():
+    return jsonify(_get_browser_use_manager().metrics())
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return Response(REGISTRY.render(), mimetype=METRICS_CONTENT_TYPE)
+
+
+@app.get("/browser-use/session/<session_id>")
+def get_browser_use_session(session_id: str):
+    since = request.args.get("since", type=int)
+    info = _get_browser_use_manager().get_status(session_id, since=since)
+    if info is None:
+        return jsonify({"error": "session not found"}), 404
+    return jsonify(info)
+
+
+@app.get("/browser-use/session/<session_id>/stream")
+def stream_browser_use_session(session_id: str):
+    since = request.args.get("since", type=int)
+    if since is None:
+        # EventSource reconnects resume from the last delivered step.
+        since = request.headers.get("Last-Event-ID", type=int)
+    events = _get_browser_use_manager().stream_events(session_id, since=since)
+    if events is None:
+        return jsonify({"error": "session not found"}), 404
+    return Response(
+        stream_with_context(encode_sse_stream(events)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/browser-use/session/<session_id>/instruction")
+def add_browser_use_instruction(session_id: str):
+    payload, status = _add_instruction(session_id, request.get_json(force=True) or {})
+    return jsonify(payload), status
 
 
 @app.post("/browser-use/session/<session_id>/cancel")
@@ -499,12 +678,22 @@ def cancel_browser_use_session(session_id: str):
     return jsonify({"status": "cancelled"})
 
 
+@app.get("/screenshots/<digest>")
+@app.get("/browser-use/screenshots/<digest>")
+def stored_screenshot(digest: str):
+    path = screenshot_path(digest)
+    if path is None:
+        return jsonify({"error": "screenshot not found"}), 404
+    with open(path, "rb") as fh:
+        mimetype = sniff_image_mimetype(fh.read(16))
+    return send_file(path, mimetype=mimetype, max_age=SCREENSHOT_MAX_AGE)
+
+
 # ---------------------------------------------------------------------------
 # Shared browser helpers
 
 
-@app.post("/shared-browser/ensure")
-def ensure_shared_browser():
+async def _ensure_shared_browser() -> tuple[Dict[str, Any], int]:
     correlation_id = str(uuid.uuid4())[:8]
     candidates = _candidate_cdp_endpoints()
     deduped = _dedupe_candidates(candidates)
@@ -514,8 +703,8 @@ def ensure_shared_browser():
     }
 
     try:
-        _run(_init_browser())
-        ready = bool(_run(_check_browser_health()))
+        await _init_browser()
+        ready = bool(await _check_browser_health())
     except Exception as exc:
         log.error("[%s] Shared browser warmup failed: %s", correlation_id, exc)
         payload.update(
@@ -526,7 +715,7 @@ def ensure_shared_browser():
                 "error": str(exc),
             }
         )
-        return jsonify(payload), 503
+        return payload, 503
 
     active_endpoint = CDP_URL or (deduped[0] if deduped else "")
 
@@ -542,7 +731,7 @@ def ensure_shared_browser():
     metadata: Dict[str, Any] = {}
     if public_endpoint:
         try:
-            metadata = _run(_fetch_cdp_metadata(public_endpoint))
+            metadata = await _fetch_cdp_metadata(public_endpoint)
         except Exception as exc:
             log.debug("[%s] Failed to retrieve CDP metadata from %s: %s", correlation_id, public_endpoint, exc)
             metadata = {}
@@ -569,24 +758,247 @@ def ensure_shared_browser():
     if metadata:
         payload["metadata"] = metadata
 
-    return jsonify(payload)
+    return payload, 200
+
+
+@app.post("/shared-browser/ensure")
+def ensure_shared_browser():
+    payload, status = _run(_ensure_shared_browser())
+    return jsonify(payload), status
 
 
 # ---------------------------------------------------------------------------
 # Basic page introspection endpoints
 
 
+async def _page_screenshot() -> bytes:
+    if PAGE is None:
+        raise RuntimeError("browser not ready")
+    image = await PAGE.screenshot(type="png")
+    SCREENSHOT_BYTES.observe(len(image))
+    return image
+
+
+# Installed on first use; the page bumps the epoch on every DOM mutation,
+# scroll, resize, input and focus change, and on events that repaint without
+# touching the DOM: images and frames finishing loading, CSS transitions and
+# animations, and pointer moves that change hover styles.  Each document
+# draws a random token, so a reloaded page that reaches the same epoch never
+# matches.
+_PAGE_EPOCH_SCRIPT = """
+() => {
+  let state = window.__webAgentEpoch;
+  if (!state) {
+    state = {epoch: 0, token: Math.random().toString(36).slice(2)};
+    const bump = () => { state.epoch += 1; };
+    const observer = new MutationObserver(bump);
+    observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+    // Records not yet delivered to the observer still count.
+    state.flush = () => { if (observer.takeRecords().length) bump(); };
+    // Capture phase on the document, since load, error and scroll do not
+    // bubble and element load events never reach the window.
+    for (const type of [
+      'scroll', 'input', 'change', 'focusin', 'focusout', 'load', 'error',
+      'transitionstart', 'transitionend', 'transitioncancel',
+      'animationstart', 'animationiteration', 'animationend',
+      'pointerover', 'pointerout', 'pointerdown', 'pointerup',
+    ]) {
+      document.addEventListener(type, bump, {capture: true, passive: true});
+    }
+    addEventListener('resize', bump, {passive: true});
+    window.__webAgentEpoch = state;
+  }
+  state.flush();
+  return {
+    token: state.token,
+    epoch: state.epoch,
+    url: location.href,
+    viewport: [innerWidth, innerHeight, devicePixelRatio],
+  };
+}
+"""
+
+_PAGE_TARGET: tuple[Any, str] | None = None
+# The page whose DOM snapshots are being kept current, and their state.
+_DOM_SNAPSHOTS: tuple[Any, IncrementalDOMSnapshot] | None = None
+
+
+class _PageStateCache:
+    """Latest HTML, DOM JSON and screenshot of the page, keyed by page state.
+
+    One entry per kind is enough: any change to the page moves the key on,
+    so an older entry can never be served again.
+    """
+
+    def __init__(self, ttl: float, kind_ttls: Optional[Dict[str, float]] = None) -> None:
+        self.ttl = ttl
+        self.kind_ttls = dict(kind_ttls or {})
+        self._entries: Dict[str, tuple[tuple, float, Any, str]] = {}
+
+    def get(self, kind: str, key: tuple) -> Optional[tuple[Any, str]]:
+        entry = self._entries.get(kind)
+        ttl = min(self.ttl, self.kind_ttls.get(kind, self.ttl))
+        if entry is None or entry[0] != key or time.monotonic() - entry[1] > ttl:
+            return None
+        return entry[2], entry[3]
+
+    def put(self, kind: str, key: tuple, value: Any, etag: str) -> None:
+        self._entries[kind] = (key, time.monotonic(), value, etag)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+_PAGE_CACHE = _PageStateCache(_PAGE_CACHE_TTL, {"screenshot": _SCREENSHOT_CACHE_TTL})
+
+
+def _etag(data: bytes) -> str:
+    return f'"{hashlib.sha256(data).hexdigest()[:32]}"'
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    """Whether an ``If-None-Match`` header matches *etag* (weak comparison)."""
+
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+async def _page_target_id(page: Any) -> str:
+    """CDP target id of *page*, looked up once per page object."""
+
+    global _PAGE_TARGET
+    if _PAGE_TARGET is not None and _PAGE_TARGET[0] is page:
+        return _PAGE_TARGET[1]
+    target_id = ""
+    try:
+        session = await page.context.new_cdp_session(page)
+        try:
+            info = await session.send("Target.getTargetInfo")
+            target_id = str(info["targetInfo"]["targetId"])
+        finally:
+            await session.detach()
+    except Exception as exc:
+        log.debug("Failed to resolve the page target id: %s", exc)
+    target_id = target_id or f"page-{id(page)}"
+    _PAGE_TARGET = (page, target_id)
+    return target_id
+
+
+async def _page_state_key() -> Optional[tuple]:
+    """``(target id, URL, document token, epoch, viewport)`` of the page.
+
+    ``None`` when there is no page, the cache is disabled or the page could
+    not be asked, in which case nothing is cached.
+    """
+
+    page = PAGE
+    if page is None or _PAGE_CACHE.ttl <= 0:
+        return None
+    try:
+        state = await page.evaluate(_PAGE_EPOCH_SCRIPT)
+    except Exception as exc:
+        log.debug("Failed to read the page epoch: %s", exc)
+        return None
+    return (
+        await _page_target_id(page),
+        state.get("url"),
+        state.get("token"),
+        state.get("epoch"),
+        tuple(state.get("viewport") or ()),
+    )
+
+
+async def _dom_snapshot() -> Optional[dict]:
+    """The page's DOM snapshot, patched from the previous one when possible."""
+
+    global _DOM_SNAPSHOTS
+    page = PAGE
+    if page is None:
+        raise RuntimeError("browser not ready")
+    if _DOM_SNAPSHOTS is None or _DOM_SNAPSHOTS[0] is not page:
+        _DOM_SNAPSHOTS = (page, IncrementalDOMSnapshot())
+    root = await _DOM_SNAPSHOTS[1].snapshot_async(page)
+    return root.to_json() if root is not None else None
+
+
+async def _read_page_state(kind: str) -> Any:
+    if kind == "html":
+        return await _safe_get_page_content()
+    if kind == "dom":
+        return json.dumps(await _dom_snapshot(), ensure_ascii=False)
+    return base64.b64encode(await _page_screenshot())
+
+
+async def _page_state(kind: str) -> tuple[Any, str]:
+    """The page's ``html``, ``dom`` JSON or base64 ``screenshot`` and its ETag.
+
+    Served from :data:`_PAGE_CACHE` while :func:`_page_state_key` is
+    unchanged.  The ETag is a digest of the content, so it stays valid for
+    revalidation even after the entry expires.
+    """
+
+    key = await _page_state_key()
+    if key is not None:
+        cached = _PAGE_CACHE.get(kind, key)
+        if cached is not None:
+            _PAGE_CACHE_REQUESTS.inc(kind=kind, result="hit")
+            return cached
+    value = await _read_page_state(kind)
+    etag = _etag(value.encode("utf-8") if isinstance(value, str) else value)
+    # Empty HTML means the page could not be read; retry next time.
+    if key is not None and value:
+        _PAGE_CACHE.put(kind, key, value, etag)
+        _PAGE_CACHE_REQUESTS.inc(kind=kind, result="miss")
+    else:
+        _PAGE_CACHE_REQUESTS.inc(kind=kind, result="bypass")
+    return value, etag
+
+
+def _page_state_response(kind: str, mimetype: str = "text/plain") -> Response:
+    value, etag = _run(_page_state(kind))
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status=304, headers=headers)
+    return Response(value, mimetype=mimetype, headers=headers)
+
+
+async def _screencast_websocket() -> str:
+    """Return the browser-level DevTools websocket of the shared browser."""
+
+    await _init_browser()
+    endpoint = CDP_URL or _candidate_cdp_endpoints()[0]
+    if endpoint.lower().startswith(("ws://", "wss://")):
+        return endpoint
+    metadata = await _fetch_cdp_metadata(endpoint)
+    raw_ws = metadata.get("webSocketDebuggerUrl")
+    if not isinstance(raw_ws, str) or not raw_ws.strip():
+        raise RuntimeError(f"共有ブラウザ {endpoint} の DevTools WebSocket を取得できませんでした")
+    return normalise_cdp_websocket(endpoint, raw_ws)
+
+
 @app.get("/source")
 def source():
     try:
         _run(_init_browser())
-        html = _run(_safe_get_page_content())
-        return Response(html, mimetype="text/plain")
+        return _page_state_response("html")
     except Exception as exc:
         log.error("source error: %s", exc)
         return Response(str(exc), mimetype="text/plain", status=500)
 
 
+@app.get("/dom")
+def dom_snapshot():
+    try:
+        _run(_init_browser())
+        return _page_state_response("dom", mimetype="application/json")
+    except Exception as exc:
+        log.error("dom error: %s", exc)
+        return Response(str(exc), mimetype="text/plain", status=500)
+
+
 @app.get("/url")
 def current_url():
     try:
@@ -602,19 +1014,42 @@ def current_url():
 def screenshot():
     try:
         _run(_init_browser())
-        if PAGE is None:
-            raise RuntimeError("browser not ready")
-        image = _run(PAGE.screenshot(type="png"))
-        return Response(base64.b64encode(image), mimetype="text/plain")
+        return _page_state_response("screenshot")
     except Exception as exc:
         log.error("screenshot error: %s", exc)
         return Response(str(exc), mimetype="text/plain", status=500)
 
 
+@app.get("/screencast")
+def screencast_stream():
+    try:
+        settings = ScreencastSettings.from_params(request.args)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    try:
+        websocket_url = _run(_screencast_websocket())
+        subscriber = open_screencast(
+            websocket_url, settings, target_id=request.args.get("target_id") or None
+        )
+    except Exception as exc:
+        log.error("screencast error: %s", exc)
+        return jsonify({"error": str(exc)}), 503
+    return Response(
+        mjpeg_stream(subscriber),
+        content_type=MJPEG_CONTENT_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.get("/healthz")
 def health():  # pragma: no cover - trivial endpoint
     return "ok", 200
 
 
 if __name__ == "__main__":  # pragma: no cover - manual run helper
-    app.run("0.0.0.0", 7000, threaded=False)
+    if env_flag("AUTOMATION_SERVER_ASGI", default=False):
+        import uvicorn
+
+        uvicorn.run("vnc.automation_asgi:app", host="0.0.0.0", port=7000)
+    else:
+        app.run("0.0.0.0", 7000, threaded=True)
@@ -0,0 +1,418 @@
+"""Live JPEG frames from the shared browser via CDP ``Page.startScreencast``.
+
+Chromium encodes a frame only when the page repaints, so viewers get a
+near-live preview without the automation server taking and base64-encoding a
+full PNG per request.  Each :class:`Screencast` holds one CDP connection on a
+background loop and fans frames out to every subscriber with the same
+settings; it starts with the first subscriber and stops with the last.
+Frames are acknowledged no faster than ``max_fps``, which throttles encoding
+in the browser itself.
+
+The connection is independent of the Playwright page the server drives, so
+streaming never holds the automation server's loop lock.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import concurrent.futures
+import logging
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, Mapping
+
+from cdp_use.client import CDPClient
+
+from agent.utils.metrics import REGISTRY
+
+log = logging.getLogger(__name__)
+
+_DEFAULT_QUALITY = min(100, max(1, int(os.getenv("SCREENCAST_QUALITY", "60"))))
+_DEFAULT_MAX_FPS = max(0.5, float(os.getenv("SCREENCAST_MAX_FPS", "5")))
+_DEFAULT_MAX_WIDTH = max(0, int(os.getenv("SCREENCAST_MAX_WIDTH", "1280")))
+_DEFAULT_MAX_HEIGHT = max(0, int(os.getenv("SCREENCAST_MAX_HEIGHT", "800")))
+_MAX_FPS_LIMIT = 30.0
+_START_TIMEOUT = 10.0
+# A static page produces no frames; resend the last one this often so dead
+# viewers are noticed and proxies keep the connection open.
+_KEEPALIVE_SECONDS = max(1.0, float(os.getenv("SCREENCAST_KEEPALIVE", "10")))
+
+MJPEG_BOUNDARY = "frame"
+MJPEG_CONTENT_TYPE = f"multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}"
+
+_FRAMES = REGISTRY.counter(
+    "automation_screencast_frames_total",
+    "Screencast frames received from the browser.",
+)
+
+
+class ScreencastError(RuntimeError):
+    """Raised when a screencast could not be started."""
+
+
+@dataclass(frozen=True)
+class ScreencastSettings:
+    quality: int = _DEFAULT_QUALITY
+    max_fps: float = _DEFAULT_MAX_FPS
+    max_width: int = _DEFAULT_MAX_WIDTH
+    max_height: int = _DEFAULT_MAX_HEIGHT
+
+    @classmethod
+    def from_params(cls, params: Mapping[str, Any]) -> "ScreencastSettings":
+        """Build settings from query parameters; raises ``ValueError``."""
+
+        def _read(name: str, cast: Callable[[str], Any], default: Any) -> Any:
+            value = params.get(name)
+            if value is None or value == "":
+                return default
+            try:
+                return cast(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"{name} must be a number") from None
+
+        quality = _read("quality", int, _DEFAULT_QUALITY)
+        max_fps = _read("fps", float, _DEFAULT_MAX_FPS)
+        max_width = _read("max_width", int, _DEFAULT_MAX_WIDTH)
+        max_height = _read("max_height", int, _DEFAULT_MAX_HEIGHT)
+        if not 1 <= quality <= 100:
+            raise ValueError("quality must be between 1 and 100")
+        if not 0 < max_fps <= _MAX_FPS_LIMIT:
+            raise ValueError(f"fps must be between 0 and {_MAX_FPS_LIMIT:g}")
+        if max_width < 0 or max_height < 0:
+            raise ValueError("max_width and max_height must not be negative")
+        return cls(quality=quality, max_fps=max_fps, max_width=max_width, max_height=max_height)
+
+    def cdp_params(self) -> Dict[str, Any]:
+        params: Dict[str, Any] = {"format": "jpeg", "quality": self.quality}
+        if self.max_width:
+            params["maxWidth"] = self.max_width
+        if self.max_height:
+            params["maxHeight"] = self.max_height
+        return params
+
+
+class ScreencastSubscriber:
+    """A viewer's handle; only the newest undelivered frame is kept.
+
+    Viewers served from an event loop pass that *loop* and read with
+    :meth:`get_async`: frames are then handed over with
+    ``call_soon_threadsafe`` instead of a thread blocking on a queue.
+    """
+
+    def __init__(
+        self, screencast: "Screencast", loop: asyncio.AbstractEventLoop | None = None
+    ) -> None:
+        self._screencast = screencast
+        self._loop = loop
+        self._frames: queue.Queue[bytes | None] = queue.Queue(maxsize=1)
+        self._async_frames: asyncio.Queue[bytes | None] = asyncio.Queue(maxsize=1)
+        self._last: bytes | None = None
+        self.closed = False
+
+    def offer(self, frame: bytes | None) -> None:
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._offer_async, frame)
+            except RuntimeError:
+                # The viewer's loop is closed; nobody is reading.
+                pass
+            return
+        # Slow viewers skip frames rather than fall behind.
+        while True:
+            try:
+                self._frames.put_nowait(frame)
+                return
+            except queue.Full:
+                try:
+                    self._frames.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def _offer_async(self, frame: bytes | None) -> None:
+        if self._async_frames.full():
+            self._async_frames.get_nowait()
+        self._async_frames.put_nowait(frame)
+
+    def get(self, timeout: float = _KEEPALIVE_SECONDS) -> bytes | None:
+        """Return the next frame, the previous one on timeout, or ``None`` once closed.
+
+        A timeout before the first frame returns ``b""``: the viewer is still
+        open, there is just nothing to show yet.
+        """
+
+        if self.closed:
+            return None
+        try:
+            frame = self._frames.get(timeout=timeout)
+        except queue.Empty:
+            return self._last if self._last is not None else b""
+        return self._received(frame)
+
+    async def get_async(self, timeout: float = _KEEPALIVE_SECONDS) -> bytes | None:
+        """:meth:`get` for a subscriber opened with a *loop*, awaited on it."""
+
+        if self.closed:
+            return None
+        try:
+            frame = await asyncio.wait_for(self._async_frames.get(), timeout)
+        except asyncio.TimeoutError:
+            return self._last if self._last is not None else b""
+        return self._received(frame)
+
+    def _received(self, frame: bytes | None) -> bytes | None:
+        if frame is None:
+            self.closed = True
+            return None
+        self._last = frame
+        return frame
+
+    def close(self) -> None:
+        # Also after the end-of-stream None, which sets closed but leaves
+        # the viewer registered.
+        self.closed = True
+        self._screencast.unsubscribe(self)
+
+
+class Screencast:
+    def __init__(
+        self,
+        websocket_url: str,
+        settings: ScreencastSettings,
+        *,
+        target_id: str | None = None,
+        client_factory: Callable[[str], Any] = CDPClient,
+    ) -> None:
+        self.websocket_url = websocket_url
+        self.settings = settings
+        self.target_id = target_id
+        self._client_factory = client_factory
+        self._client: Any = None
+        self._session_id: str | None = None
+        self._subscribers: list[ScreencastSubscriber] = []
+        self._latest: bytes | None = None
+        self._last_ack = 0.0
+        self._starting: concurrent.futures.Future | None = None
+        # The loop keeps only weak references to tasks.
+        self._acks: set[asyncio.Task] = set()
+        self._lock = threading.Lock()
+
+    # -- subscriber API -------------------------------------------------
+
+    def subscribe(self, loop: asyncio.AbstractEventLoop | None = None) -> ScreencastSubscriber:
+        """Register a viewer, starting the screencast for the first one.
+
+        Viewers that arrive while the start is still running wait for it, so
+        a failed start fails every one of them.  *loop* is passed on to the
+        :class:`ScreencastSubscriber`.
+        """
+
+        subscriber = ScreencastSubscriber(self, loop)
+        with self._lock:
+            first = self._starting is None
+            if first:
+                self._starting = asyncio.run_coroutine_threadsafe(self._start(), _screencast_loop())
+            starting = self._starting
+            self._subscribers.append(subscriber)
+        try:
+            starting.result(timeout=_START_TIMEOUT)
+        except Exception as exc:
+            starting.cancel()
+            # New viewers get a fresh screencast rather than this failed one.
+            _forget(self)
+            self.unsubscribe(subscriber)
+            raise ScreencastError(f"スクリーンキャストを開始できませんでした: {exc}") from exc
+        with self._lock:
+            latest = self._latest
+        if not first and latest is not None:
+            # Late joiners see the current page immediately.
+            subscriber.offer(latest)
+        return subscriber
+
+    def unsubscribe(self, subscriber: ScreencastSubscriber) -> None:
+        with self._lock:
+            try:
+                self._subscribers.remove(subscriber)
+            except ValueError:
+                return
+            last = not self._subscribers
+            if last:
+                self._starting = None
+        if last:
+            _forget(self)
+            asyncio.run_coroutine_threadsafe(self._stop(), _screencast_loop())
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    # -- CDP side -------------------------------------------------------
+
+    async def _start(self) -> None:
+        client = self._client_factory(self.websocket_url)
+        await client.start()
+        try:
+            target_id = self.target_id or await self._default_target(client)
+            attached = await client.send.Target.attachToTarget(
+                params={"targetId": target_id, "flatten": True}
+            )
+            session_id = attached["sessionId"]
+            client.register.Page.screencastFrame(self._on_frame)
+            client.register.Target.detachedFromTarget(self._on_detached)
+            await client.send.Page.startScreencast(
+                params=self.settings.cdp_params(), session_id=session_id
+            )
+        except BaseException:
+            await client.stop()
+            raise
+        self._client = client
+        self._session_id = session_id
+        log.info("Started screencast of %s (%s)", target_id, self.settings)
+
+    async def _default_target(self, client: Any) -> str:
+        result = await client.send.Target.getTargets()
+        for info in result.get("targetInfos", []):
+            if info.get("type") == "page" and not str(info.get("url", "")).startswith("devtools://"):
+                return info["targetId"]
+        raise ScreencastError("no page target to screencast")
+
+    async def _stop(self) -> None:
+        client, self._client = self._client, None
+        session_id, self._session_id = self._session_id, None
+        for task in list(self._acks):
+            task.cancel()
+        if client is None:
+            return
+        try:
+            await client.send.Page.stopScreencast(session_id=session_id)
+        except Exception as exc:
+            log.debug("Failed to stop screencast cleanly: %s", exc)
+        try:
+            await client.stop()
+        except Exception:  # pragma: no cover - best effort
+            pass
+
+    async def _on_frame(self, event: Dict[str, Any], session_id: str | None) -> None:
+        try:
+            frame = base64.b64decode(event["data"])
+        except (KeyError, ValueError):
+            return
+        _FRAMES.inc()
+        with self._lock:
+            self._latest = frame
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.offer(frame)
+        # The browser sends the next frame only after the ack, so delaying
+        # it caps the frame rate at the source.
+        delay = self._last_ack + 1.0 / self.settings.max_fps - time.monotonic()
+        task = asyncio.get_running_loop().create_task(
+            self._ack(event.get("sessionId"), session_id, max(0.0, delay))
+        )
+        self._acks.add(task)
+        task.add_done_callback(self._acks.discard)
+
+    async def _ack(self, frame_session: Any, session_id: str | None, delay: float) -> None:
+        if delay:
+            await asyncio.sleep(delay)
+        self._last_ack = time.monotonic()
+        client = self._client
+        if client is None:
+            return
+        try:
+            await client.send.Page.screencastFrameAck(
+                params={"sessionId": frame_session}, session_id=session_id
+            )
+        except Exception as exc:
+            log.debug("Screencast frame ack failed: %s", exc)
+
+    async def _on_detached(self, event: Dict[str, Any], session_id: str | None) -> None:
+        if event.get("sessionId") != self._session_id:
+            return
+        log.info("Screencast target detached; closing %d viewer(s)", self.subscriber_count())
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.offer(None)
+
+
+def mjpeg_part(frame: bytes) -> bytes:
+    header = (
+        f"--{MJPEG_BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+        f"Content-Length: {len(frame)}\r\n\r\n"
+    ).encode("ascii")
+    return header + frame + b"\r\n"
+
+
+def mjpeg_stream(subscriber: ScreencastSubscriber) -> Iterator[bytes]:
+    """Yield ``multipart/x-mixed-replace`` parts until the viewer goes away."""
+
+    try:
+        while True:
+            frame = subscriber.get()
+            if frame is None:
+                return
+            if frame:
+                yield mjpeg_part(frame)
+    finally:
+        subscriber.close()
+
+
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_lock = threading.Lock()
+_screencasts: Dict[tuple[str, str | None, ScreencastSettings], Screencast] = {}
+_screencasts_lock = threading.Lock()
+
+
+def _screencast_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="screencast", daemon=True).start()
+            _loop = loop
+        return _loop
+
+
+def _forget(screencast: Screencast) -> None:
+    key = (screencast.websocket_url, screencast.target_id, screencast.settings)
+    with _screencasts_lock:
+        if _screencasts.get(key) is screencast:
+            del _screencasts[key]
+
+
+def open_screencast(
+    websocket_url: str,
+    settings: ScreencastSettings,
+    *,
+    target_id: str | None = None,
+    loop: asyncio.AbstractEventLoop | None = None,
+) -> ScreencastSubscriber:
+    """Subscribe to the shared screencast for *websocket_url* and *settings*.
+
+    Blocks until the screencast has started; pass *loop* to read frames with
+    :meth:`ScreencastSubscriber.get_async` on it.
+    """
+
+    key = (websocket_url, target_id, settings)
+    with _screencasts_lock:
+        screencast = _screencasts.get(key)
+        if screencast is None:
+            screencast = Screencast(websocket_url, settings, target_id=target_id)
+            _screencasts[key] = screencast
+    return screencast.subscribe(loop)
+
+
+__all__ = [
+    "MJPEG_CONTENT_TYPE",
+    "Screencast",
+    "ScreencastError",
+    "ScreencastSettings",
+    "ScreencastSubscriber",
+    "mjpeg_part",
+    "mjpeg_stream",
+    "open_screencast",
+]
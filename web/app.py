@@ -6,11 +6,32 @@ import os
 from typing import Any
 from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
-from flask import Flask, jsonify, render_template, request, send_from_directory
+from flask import (
+    Flask,
+    Response,
+    jsonify,
+    render_template,
+    request,
+    send_file,
+    stream_with_context,
+)
 
 from agent.browser_use_runner import get_browser_use_manager
+from agent.utils.scheduler import QueueFullError
 from agent.utils import history as history_utils
-from agent.utils.history import load_hist, save_hist, format_history_for_prompt
+from agent.utils.history import (
+    PROMPT_HISTORY_LIMIT,
+    format_history_for_prompt,
+    load_hist,
+    save_hist,
+    tail_hist,
+)
+from agent.utils.screenshots import (
+    SCREENSHOT_MAX_AGE,
+    screenshot_path,
+    sniff_image_mimetype,
+)
+from agent.utils.sse import encode_sse_stream
 from vnc.dependency_check import ensure_component_dependencies
 
 app = Flask(__name__)
@@ -28,6 +49,7 @@ MAX_STEPS = max(1, int(os.getenv("MAX_STEPS", "15")))
 DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "gemini")
 START_URL = os.getenv("START_URL", "https://www.yahoo.co.jp/")
 HIST_FILE = history_utils.HIST_FILE
+HIST_LOG_FILE = history_utils.HIST_LOG_FILE
 
 _NOVNC_DEFAULTS = (
     ("autoconnect", "1"),
@@ -234,7 +256,15 @@ def execute():
         if max_steps <= 0:
             return jsonify({"error": "max_steps must be positive"}), 400
 
-    history_snapshot = load_hist()
+    async_start = data.get("async_start")
+    if async_start is not None and not isinstance(async_start, bool):
+        return jsonify({"error": "async_start must be a boolean"}), 400
+
+    priority = data.get("priority", 0)
+    if isinstance(priority, bool) or not isinstance(priority, int):
+        return jsonify({"error": "priority must be an integer"}), 400
+
+    history_snapshot = tail_hist(PROMPT_HISTORY_LIMIT)
     conversation_context = (format_history_for_prompt(history_snapshot) or "").strip()
     manager = get_browser_use_manager()
     try:
@@ -243,9 +273,16 @@ def execute():
             model=model,
             max_steps=max_steps,
             conversation_context=conversation_context or None,
+            async_start=async_start,
+            priority=priority,
         )
     except ValueError as exc:
         return jsonify({"error": str(exc)}), 400
+    except QueueFullError as exc:
+        log.warning("Rejected automation run: %s", exc)
+        response = jsonify({"error": str(exc), "code": "queue_full"})
+        response.headers["Retry-After"] = str(exc.retry_after)
+        return response, 429
     except RuntimeError as exc:
         message = str(exc)
         if "ライブビューのブラウザに接続できないため実行できません" in message:
@@ -268,14 +305,61 @@ def execute():
     return jsonify({"session_id": session_id})
 
 
+@app.get("/metrics")
+def metrics():
+    return jsonify(get_browser_use_manager().metrics())
+
+
 @app.get("/status/<session_id>")
 def get_status(session_id: str):
-    info = get_browser_use_manager().get_status(session_id)
+    since = request.args.get("since", type=int)
+    info = get_browser_use_manager().get_status(session_id, since=since)
     if info is None:
         return jsonify({"error": "session not found"}), 404
     return jsonify(info)
 
 
+@app.get("/status/<session_id>/stream")
+def stream_status(session_id: str):
+    since = request.args.get("since", type=int)
+    if since is None:
+        # EventSource reconnects resume from the last delivered step.
+        since = request.headers.get("Last-Event-ID", type=int)
+    events = get_browser_use_manager().stream_events(session_id, since=since)
+    if events is None:
+        return jsonify({"error": "session not found"}), 404
+    return Response(
+        stream_with_context(encode_sse_stream(events)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/screenshots/<digest>")
+def get_screenshot(digest: str):
+    path = screenshot_path(digest)
+    if path is not None:
+        with open(path, "rb") as fh:
+            mimetype = sniff_image_mimetype(fh.read(16))
+        return send_file(path, mimetype=mimetype, max_age=SCREENSHOT_MAX_AGE)
+
+    fetch_remote = getattr(get_browser_use_manager(), "get_screenshot", None)
+    if fetch_remote is not None:
+        try:
+            stored = fetch_remote(digest)
+        except RuntimeError as exc:
+            log.error("Failed to fetch screenshot %s: %s", digest, exc)
+            stored = None
+        if stored is not None:
+            image, mimetype = stored
+            response = Response(image, mimetype=mimetype)
+            response.cache_control.public = True
+            response.cache_control.max_age = SCREENSHOT_MAX_AGE
+            return response
+
+    return jsonify({"error": "screenshot not found"}), 404
+
+
 @app.post("/session/<session_id>/instruction")
 def add_instruction(session_id: str):
     data: dict[str, Any] = request.get_json(force=True) or {}
@@ -327,12 +411,8 @@ def history():
 
 @app.get("/history.json")
 def history_file():
-    if os.path.exists(HIST_FILE):
-        return send_from_directory(
-            directory=os.path.dirname(HIST_FILE),
-            path=os.path.basename(HIST_FILE),
-            mimetype="application/json",
-        )
+    if os.path.exists(HIST_LOG_FILE) or os.path.exists(HIST_FILE):
+        return jsonify(load_hist())
     return jsonify({"error": "history file not found"}), 404
 
 
@@ -1,6 +1,7 @@
 const state = {
   activeSession: null,
   pollTimer: null,
+  eventSource: null,
   renderedSteps: 0,
   previewMode: 'live',
   liveViewInitialised: false,
@@ -14,6 +15,7 @@ const state = {
   latestStep: null,
   lastPreviewImage: null,
   displayedWarnings: new Set(),
+  queuePosition: null,
   sharedBrowserMode: 'unknown',
   liveViewDisabled: false,
   liveViewDisabledMessage: '',
@@ -89,6 +91,16 @@ function normaliseScreenshot(data) {
   return `data:image/png;base64,${data}`;
 }
 
+function stepScreenshotSource(step) {
+  const preview =
+    typeof step.screenshot_preview_hash === 'string' ? step.screenshot_preview_hash.trim() : '';
+  const hash = preview || (typeof step.screenshot_hash === 'string' ? step.screenshot_hash.trim() : '');
+  if (hash) {
+    return `/screenshots/${encodeURIComponent(hash)}`;
+  }
+  return normaliseScreenshot(step.screenshot);
+}
+
 function applyLiveViewportDimensions(width, height) {
   const resolvedWidth = Math.round(Number(width) || 0);
   const resolvedHeight = Math.round(Number(height) || 0);
@@ -657,8 +669,11 @@ function updatePreview(step) {
   if (liveFrame) {
     screenshot = liveFrame;
     step.screenshot = liveFrame;
+  } else if (step.screenshot_unchanged && state.lastPreviewImage) {
+    // Same frame as the previous step; keep the decoded image on screen.
+    return;
   } else {
-    const fromStep = normaliseScreenshot(step.screenshot);
+    const fromStep = stepScreenshotSource(step);
     if (fromStep) {
       screenshot = fromStep;
     } else if (state.lastPreviewImage) {
@@ -826,84 +841,174 @@ function clearPolling() {
     clearTimeout(state.pollTimer);
     state.pollTimer = null;
   }
+  if (state.eventSource) {
+    state.eventSource.close();
+    state.eventSource = null;
+  }
 }
 
-async function pollSession() {
-  if (!state.activeSession) return;
+function isTerminalStatus(status) {
+  return status === 'completed' || status === 'failed' || status === 'cancelled';
+}
 
-  try {
-    const response = await fetch(`/status/${state.activeSession.id}`);
-    if (!response.ok) {
-      throw new Error(`status ${response.status}`);
-    }
-    const data = await response.json();
-    const warnings = Array.isArray(data.warnings) ? data.warnings : [];
-    for (const warning of warnings) {
-      const text = typeof warning === 'string' ? warning.trim() : String(warning || '').trim();
-      if (!text || state.displayedWarnings.has(text)) {
-        continue;
-      }
-      state.displayedWarnings.add(text);
-      appendMessage('system', `⚠️ ${escapeHtml(text)}`);
-    }
+function applyWarning(warning) {
+  const text = typeof warning === 'string' ? warning.trim() : String(warning || '').trim();
+  if (!text || state.displayedWarnings.has(text)) {
+    return;
+  }
+  state.displayedWarnings.add(text);
+  appendMessage('system', `⚠️ ${escapeHtml(text)}`);
+}
 
-    const sharedMode =
-      typeof data.shared_browser_mode === 'string' ? data.shared_browser_mode.trim().toLowerCase() : 'unknown';
-    if (sharedMode === 'remote' && state.sharedBrowserMode !== 'remote') {
-      state.sharedBrowserMode = 'remote';
-      state.liveViewDisabled = false;
-      state.liveViewDisabledMessage = '';
-      if (state.previewMode === 'live') {
-        initialiseLiveView(true);
-      }
-    } else if (sharedMode !== 'remote' && sharedMode !== state.sharedBrowserMode) {
-      state.sharedBrowserMode = sharedMode;
-      state.liveViewDisabled = true;
-      const serverMessage = (() => {
-        for (let i = warnings.length - 1; i >= 0; i -= 1) {
-          const warning = warnings[i];
-          if (typeof warning === 'string') {
-            const trimmed = warning.trim();
-            if (trimmed.length) {
-              return trimmed;
-            }
-          }
-        }
-        if (typeof data.error === 'string') {
-          const trimmed = data.error.trim();
+function applyStep(position, step) {
+  if (position < state.renderedSteps || !step || typeof step !== 'object') {
+    return;
+  }
+  renderStep(step);
+  state.renderedSteps = position + 1;
+}
+
+function applyStatusPayload(data) {
+  const warnings = Array.isArray(data.warnings) ? data.warnings : [];
+  warnings.forEach(applyWarning);
+
+  const sharedMode =
+    typeof data.shared_browser_mode === 'string' ? data.shared_browser_mode.trim().toLowerCase() : 'unknown';
+  if (sharedMode === 'remote' && state.sharedBrowserMode !== 'remote') {
+    state.sharedBrowserMode = 'remote';
+    state.liveViewDisabled = false;
+    state.liveViewDisabledMessage = '';
+    if (state.previewMode === 'live') {
+      initialiseLiveView(true);
+    }
+  } else if (sharedMode !== 'remote' && sharedMode !== state.sharedBrowserMode) {
+    state.sharedBrowserMode = sharedMode;
+    state.liveViewDisabled = true;
+    const serverMessage = (() => {
+      for (let i = warnings.length - 1; i >= 0; i -= 1) {
+        const warning = warnings[i];
+        if (typeof warning === 'string') {
+          const trimmed = warning.trim();
           if (trimmed.length) {
             return trimmed;
           }
         }
-        return '';
-      })();
-      const message =
-        typeof serverMessage === 'string' && serverMessage.length
-          ? serverMessage
-          : 'ライブビューのブラウザに接続できないため実行を開始できません。';
-      state.liveViewDisabledMessage = message;
-      if (state.previewMode === 'live') {
-        showSharedBrowserError(message);
       }
+      if (typeof data.error === 'string') {
+        const trimmed = data.error.trim();
+        if (trimmed.length) {
+          return trimmed;
+        }
+      }
+      return '';
+    })();
+    const message =
+      typeof serverMessage === 'string' && serverMessage.length
+        ? serverMessage
+        : 'ライブビューのブラウザに接続できないため実行を開始できません。';
+    state.liveViewDisabledMessage = message;
+    if (state.previewMode === 'live') {
+      showSharedBrowserError(message);
     }
+  }
 
-    const steps = Array.isArray(data.steps) ? data.steps : [];
+  const queuePosition = Number.isInteger(data.queue_position) ? data.queue_position : null;
+  if (queuePosition !== null && queuePosition !== state.queuePosition) {
+    appendMessage('system', `⏳ 実行待ちです（${queuePosition}番目）。順番が来ると自動的に開始します。`);
+  }
+  state.queuePosition = queuePosition;
 
-    while (state.renderedSteps < steps.length) {
-      renderStep(steps[state.renderedSteps]);
-      state.renderedSteps += 1;
+  const steps = Array.isArray(data.steps) ? data.steps : [];
+  const stepsSince = Number.isInteger(data.steps_since) ? data.steps_since : 0;
+  steps.forEach((step, offset) => applyStep(stepsSince + offset, step));
+
+  if (isTerminalStatus(data.status)) {
+    handleCompletion(data);
+    return true;
+  }
+  return false;
+}
+
+function handleSessionError(err) {
+  appendMessage('system', `❌ 状態取得に失敗しました: ${escapeHtml(err.message || String(err))}`);
+  setExecuting(false);
+  clearPolling();
+  state.activeSession = null;
+}
+
+function parseEventData(event) {
+  try {
+    return JSON.parse(event.data);
+  } catch (err) {
+    return null;
+  }
+}
+
+function streamSession() {
+  if (!state.activeSession || typeof window.EventSource !== 'function') {
+    return false;
+  }
+
+  const sessionId = state.activeSession.id;
+  const source = new EventSource(`/status/${sessionId}/stream?since=${state.renderedSteps}`);
+  state.eventSource = source;
+  let receivedSnapshot = false;
+
+  const isCurrent = () =>
+    state.eventSource === source && state.activeSession && state.activeSession.id === sessionId;
+
+  source.addEventListener('snapshot', (event) => {
+    const data = parseEventData(event);
+    if (!data || !isCurrent()) return;
+    receivedSnapshot = true;
+    applyStatusPayload(data);
+  });
+  source.addEventListener('step', (event) => {
+    const data = parseEventData(event);
+    if (!data || !isCurrent()) return;
+    applyStep(data.position, data.step);
+  });
+  source.addEventListener('warning', (event) => {
+    const data = parseEventData(event);
+    if (!data || !isCurrent()) return;
+    applyWarning(data.warning);
+  });
+  source.addEventListener('status', (event) => {
+    const data = parseEventData(event);
+    if (!data || !isCurrent()) return;
+    applyStatusPayload(data);
+  });
+  source.onerror = () => {
+    if (!isCurrent()) {
+      source.close();
+      return;
+    }
+    if (source.readyState === EventSource.CLOSED || !receivedSnapshot) {
+      // The stream is unavailable; fall back to polling.
+      source.close();
+      state.eventSource = null;
+      pollSession();
     }
+  };
+  return true;
+}
 
-    if (data.status === 'completed' || data.status === 'failed' || data.status === 'cancelled') {
-      handleCompletion(data);
-    } else {
+async function pollSession() {
+  if (!state.activeSession) return;
+
+  try {
+    const response = await fetch(
+      `/status/${state.activeSession.id}?since=${state.renderedSteps}`,
+    );
+    if (!response.ok) {
+      throw new Error(`status ${response.status}`);
+    }
+    const data = await response.json();
+    if (!applyStatusPayload(data)) {
       state.pollTimer = setTimeout(pollSession, 1200);
     }
   } catch (err) {
-    appendMessage('system', `❌ 状態取得に失敗しました: ${escapeHtml(err.message || String(err))}`);
-    setExecuting(false);
-    clearPolling();
-    state.activeSession = null;
+    handleSessionError(err);
   }
 }
 
@@ -1007,6 +1112,7 @@ async function startSession(command) {
   setExecuting(true);
   state.renderedSteps = 0;
   state.displayedWarnings = new Set();
+  state.queuePosition = null;
   state.sharedBrowserMode = 'unknown';
   state.liveViewDisabled = false;
   state.liveViewDisabledMessage = '';
@@ -1022,6 +1128,7 @@ async function startSession(command) {
         command,
         model: window.DEFAULT_MODEL || 'gemini',
         max_steps: window.MAX_STEPS || undefined,
+        async_start: true,
       }),
     });
 
@@ -1040,7 +1147,9 @@ async function startSession(command) {
     placeholder.remove();
     state.activeSession = { id: data.session_id };
     setExecuting(true);
-    pollSession();
+    if (!streamSession()) {
+      pollSession();
+    }
   } catch (err) {
     placeholder.remove();
     const message = err && typeof err.message === 'string' ? err.message : String(err);